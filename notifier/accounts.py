@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Accounts - Where each Epic Games account keeps its cookies and state
+- default: claimer/data/cookies.json (the original single-account layout)
+- others:  claimer/data/accounts/<name>/cookies.json
+- manually marked owned games: notifier/owned_games.json for default,
+  next to the cookies for the others
+"""
+import json
+import base64
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+DATA_DIR = PROJECT_DIR / 'claimer' / 'data'
+ACCOUNTS_DIR = DATA_DIR / 'accounts'
+DEFAULT_ACCOUNT = 'default'
+
+
+class Account:
+    """One Epic Games account: a name and the files that belong to it"""
+
+    def __init__(self, name=DEFAULT_ACCOUNT):
+        self.name = name
+        if name == DEFAULT_ACCOUNT:
+            self.data_dir = DATA_DIR
+        else:
+            self.data_dir = ACCOUNTS_DIR / name
+        self.cookies_file = self.data_dir / 'cookies.json'
+        if name == DEFAULT_ACCOUNT:
+            self.owned_games_file = Path(__file__).parent / 'owned_games.json'
+        else:
+            self.owned_games_file = self.data_dir / 'owned_games.json'
+
+    def __repr__(self):
+        return f"Account({self.name!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, Account) and other.name == self.name
+
+    def __hash__(self):
+        return hash(self.name)
+
+
+def list_accounts():
+    """All accounts that have a cookies file"""
+    accounts = []
+    if (DATA_DIR / 'cookies.json').exists():
+        accounts.append(Account(DEFAULT_ACCOUNT))
+
+    if ACCOUNTS_DIR.exists():
+        for cookies_file in sorted(ACCOUNTS_DIR.glob('*/cookies.json')):
+            accounts.append(Account(cookies_file.parent.name))
+
+    return accounts
+
+
+def account_id_from_token(token):
+    """Epic account id (JWT `sub`) from an EPIC_EG1 token ("eg1~<jwt>")"""
+    if not token:
+        return None
+
+    parts = token.split('~')
+    if len(parts) < 2:
+        return None
+
+    jwt_parts = parts[1].split('.')
+    if len(jwt_parts) < 2:
+        return None
+
+    payload_b64 = jwt_parts[1]
+    padding = 4 - len(payload_b64) % 4
+    if padding != 4:
+        payload_b64 += '=' * padding
+
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(payload_b64))
+        return payload.get('sub')
+    except Exception:
+        return None
+
+
+def account_id_from_cookies(cookies):
+    """Epic account id from a cookies.json list, if it carries an EPIC_EG1 token"""
+    for cookie in cookies or []:
+        if cookie.get('name') == 'EPIC_EG1':
+            return account_id_from_token(cookie.get('value'))
+    return None
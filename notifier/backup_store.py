@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Cookie Backup Store - Content-addressed, deduplicated cookie backups
+- Each distinct cookie jar is stored once, gzip-compressed, named by its SHA-256
+- A small per-account manifest maps backup time -> content hash
+- Backing up an unchanged jar only hashes it and compares with the last entry
+- backup() and gc() hold one lock file, so gc never deletes an object a
+  concurrent backup has just written but not yet referenced
+"""
+import gzip
+import json
+import time
+import hashlib
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import serialization
+from serialization import atomic_write
+
+
+def normalize(cookies):
+    """Canonical bytes for a cookie jar (order- and formatting-independent)"""
+    ordered = sorted(cookies, key=lambda c: (c.get('domain', ''), c.get('name', ''), c.get('path', '/')))
+    return json.dumps(ordered, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+class CookieBackupStore:
+    """objects/<hash[:2]>/<hash>.json.gz + manifests/<account>.json"""
+
+    def __init__(self, root, keep=50):
+        self.root = Path(root)
+        self.objects_dir = self.root / 'objects'
+        self.manifests_dir = self.root / 'manifests'
+        self.lock_file = self.root / 'store.lock'
+        self.keep = keep
+
+    @contextmanager
+    def locked(self):
+        """Exclusive advisory lock shared by every process using this store"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_file, 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _object_path(self, digest):
+        return self.objects_dir / digest[:2] / f"{digest}.json.gz"
+
+    def _manifest_path(self, account):
+        return self.manifests_dir / f"{account}.json"
+
+    def manifest(self, account):
+        """List of [timestamp, hash] entries, oldest first"""
+        path = self._manifest_path(account)
+        if not path.exists():
+            return []
+        return serialization.load(path)
+
+    def backup(self, account, cookies, timestamp=None):
+        """Record a backup; returns (hash, stored) where stored=False means unchanged"""
+        data = normalize(cookies)
+        digest = hashlib.sha256(data).hexdigest()
+        with self.locked():
+            return self._backup(account, data, digest, timestamp)
+
+    def _backup(self, account, data, digest, timestamp):
+        entries = self.manifest(account)
+        if entries and entries[-1][1] == digest:
+            return digest, False
+
+        object_path = self._object_path(digest)
+        if not object_path.exists():
+            atomic_write(object_path, gzip.compress(data))
+
+        entries.append([int(timestamp or time.time()), digest])
+        pruned = entries[:-self.keep] if len(entries) > self.keep else []
+        entries = entries[-self.keep:]
+        serialization.dump(self._manifest_path(account), entries)
+
+        if pruned:
+            self._gc()
+
+        return digest, True
+
+    def load(self, digest):
+        with open(self._object_path(digest), 'rb') as f:
+            return serialization.loads(gzip.decompress(f.read()))
+
+    def resolve(self, account, at=None):
+        """Hash of the backup in effect at time `at` (latest if None), or a hash prefix"""
+        entries = self.manifest(account)
+        if not entries:
+            return None
+
+        if isinstance(at, str):
+            matches = {digest for _, digest in entries if digest.startswith(at)}
+            return matches.pop() if len(matches) == 1 else None
+
+        if at is None:
+            return entries[-1][1]
+
+        candidates = [digest for ts, digest in entries if ts <= at]
+        return candidates[-1] if candidates else None
+
+    def restore(self, account, at=None):
+        """Cookies as they were at time `at` (epoch seconds) or for a hash prefix"""
+        digest = self.resolve(account, at)
+        if not digest:
+            return None
+        return self.load(digest)
+
+    def gc(self):
+        """Delete objects no manifest references any more"""
+        with self.locked():
+            return self._gc()
+
+    def _gc(self):
+        referenced = set()
+        for manifest_file in self.manifests_dir.glob('*.json'):
+            referenced.update(digest for _, digest in serialization.load(manifest_file))
+
+        removed = 0
+        for object_path in self.objects_dir.glob('*/*.json.gz'):
+            if object_path.name[:-len('.json.gz')] not in referenced:
+                object_path.unlink()
+                removed += 1
+        return removed
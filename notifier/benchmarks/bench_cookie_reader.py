@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark: native cookie reader vs copy-and-decrypt-everything extraction
+- Builds a synthetic Chromium `Cookies` database with N rows (a few are Epic's)
+- "legacy" copies the whole file and decrypts every row before filtering,
+  like the browser_cookie3 path used by CookieManager
+- "native" reads in place with the host filter pushed into SQL
+
+Usage: python3 benchmarks/bench_cookie_reader.py [rows] [repeat]
+"""
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import cookie_reader
+from cookie_reader import ChromiumDecryptor, AES_AVAILABLE
+
+if AES_AVAILABLE:
+    from cookie_reader import AES
+
+EPIC_COOKIES = ['EPIC_SSO', 'EPIC_BEARER_TOKEN', 'EPIC_EG1', 'EPIC_DEVICE', 'eg-auth',
+                'EPIC_SESSION_AP', 'EPIC_LOCALE_COOKIE', 'epic_country']
+
+
+def encrypt(decryptor, plaintext):
+    """Encrypt a value the way Chromium does (v10 prefix, AES-128-CBC)"""
+    data = plaintext.encode('utf-8')
+    padding = 16 - len(data) % 16
+    data += bytes([padding]) * padding
+    cipher = AES.new(decryptor._key(b'v10'), AES.MODE_CBC, IV=b' ' * 16)
+    return b'v10' + cipher.encrypt(data)
+
+
+def build_database(path, rows, decryptor):
+    """Create a Chromium-shaped cookie DB with `rows` cookies"""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        INSERT INTO meta VALUES ('version', '21');
+        CREATE TABLE cookies (
+            host_key TEXT, name TEXT, value TEXT, encrypted_value BLOB, path TEXT,
+            expires_utc INTEGER, is_secure INTEGER, is_httponly INTEGER, samesite INTEGER
+        );
+    """)
+
+    expires_utc = int((time.time() + 30 * 86400 + cookie_reader.CHROMIUM_EPOCH_OFFSET) * 1_000_000)
+    records = []
+    for i in range(rows):
+        if i < len(EPIC_COOKIES):
+            host, name = '.epicgames.com', EPIC_COOKIES[i]
+        else:
+            host, name = f'.site{i % 5000}.example', f'cookie_{i}'
+
+        secret = f'{name}-value-{i:08d}'
+        if AES_AVAILABLE:
+            records.append((host, name, '', encrypt(decryptor, secret), '/', expires_utc, 1, 1, 0))
+        else:
+            records.append((host, name, secret, b'', '/', expires_utc, 1, 1, 0))
+
+    conn.executemany("INSERT INTO cookies VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", records)
+    conn.commit()
+    conn.close()
+
+
+def legacy_extract(db_path, decryptor):
+    """Copy the DB, decrypt every row, then filter on the domain"""
+    with tempfile.TemporaryDirectory() as tmp:
+        copy_path = os.path.join(tmp, 'Cookies')
+        shutil.copy2(db_path, copy_path)
+
+        conn = sqlite3.connect(copy_path)
+        rows = conn.execute(
+            "SELECT host_key, name, value, encrypted_value, path, expires_utc, is_secure FROM cookies"
+        ).fetchall()
+        conn.close()
+
+    cookies = []
+    for host_key, name, value, encrypted_value, path, expires_utc, is_secure in rows:
+        if not value and encrypted_value:
+            value = decryptor.decrypt(encrypted_value, host_key)
+        if host_key.endswith('epicgames.com'):
+            cookies.append({'name': name, 'value': value, 'domain': host_key})
+    return cookies
+
+
+def native_extract(db_path, decryptor):
+    return cookie_reader.read_chromium_cookies(db_path, decryptor=decryptor)
+
+
+def timed(func, repeat, *args):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    decryptor = ChromiumDecryptor('chrome', password='peanuts')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'Cookies')
+        build_database(db_path, rows, decryptor)
+        size_mb = os.path.getsize(db_path) / 1024 / 1024
+
+        print("=" * 60)
+        print(f"Cookie extraction benchmark: {rows} rows ({size_mb:.1f} MB), best of {repeat}")
+        print(f"Encrypted values: {'yes' if AES_AVAILABLE else 'no (pycryptodome not installed)'}")
+        print("=" * 60)
+
+        legacy_time, legacy = timed(legacy_extract, repeat, db_path, decryptor)
+        native_time, native = timed(native_extract, repeat, db_path, decryptor)
+
+        assert sorted(c['value'] for c in legacy) == sorted(c['value'] for c in native)
+
+        print(f"legacy (copy + decrypt all): {legacy_time * 1000:9.2f} ms  ({len(legacy)} cookies)")
+        print(f"native (in place, filtered): {native_time * 1000:9.2f} ms  ({len(native)} cookies)")
+        print(f"speedup: {legacy_time / native_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Benchmark: fleet runner scaling with worker count
+- Synthetic accounts whose "run" is a fixed amount of CPU work
+  (a few are 5x slower, so shards finish unevenly and stealing kicks in)
+- Runs the same account list with 1, 2, 4, ... workers up to the core count
+  and reports speedup and per-shard throughput
+
+Usage: python3 benchmarks/bench_fleet.py [accounts] [work]
+"""
+import os
+import sys
+import time
+import hashlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fleet import Fleet
+
+
+def synthetic_run(name, work):
+    """Hash a buffer `work` times (5x for every 10th account)"""
+    rounds = work * (5 if name.endswith('0') else 1)
+    digest = name.encode('utf-8')
+    for _ in range(rounds):
+        digest = hashlib.sha256(digest * 64).digest()
+    return True
+
+
+def main():
+    accounts = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    work = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    names = [f"account{i:05d}" for i in range(accounts)]
+    cores = os.cpu_count() or 1
+
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+
+    print(f"{accounts} accounts, {work} rounds each, {cores} core(s)")
+    baseline = None
+    for workers in counts:
+        start = time.perf_counter()
+        report = Fleet(workers=workers, job=synthetic_run, job_args=(work,)).run(names)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        stolen = sum(s['stolen'] for s in report['shards'])
+        rates = ', '.join(f"{s['per_min']:.0f}" for s in report['shards'])
+        print(f"  {workers:3d} worker(s): {elapsed:6.2f}s  speedup {baseline / elapsed:4.1f}x  "
+              f"stolen {stolen:3d}  per-shard/min [{rates}]")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark: requests (HTTP/1.1) vs the HTTP/2 session on the local mock server
+- Fires N GraphQL ownership POSTs and entitlements GETs from W threads, the
+  way pipelined claims and ownership checks overlap in a run
+- Reports connections the server accepted, wall time and p50/p95 latency
+- The HTTP/2 run needs httpx[http2] (client) and h2 (mock server)
+
+Usage: python3 benchmarks/bench_http2.py [requests] [threads] [latency ms]
+"""
+import sys
+import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import requests
+
+import http2_session
+from http_client import percentile
+from mock_epic_server import start_servers
+
+OWNED_QUERY = 'query { Catalog { catalogOffer { ownedInformation { owned } } } }'
+
+
+def run(session, base_url, count, threads):
+    def call(i):
+        start = time.perf_counter()
+        if i % 2:
+            response = session.post(f"{base_url}/graphql", json={'query': OWNED_QUERY}, timeout=30)
+        else:
+            response = session.get(f"{base_url}/entitlement/api/account/mock/entitlements",
+                                   params={'start': 0, 'count': 5000}, timeout=30)
+        response.raise_for_status()
+        len(response.content)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(call, range(count)))
+    return time.perf_counter() - start, latencies
+
+
+def report(name, server, elapsed, latencies):
+    print(f"{name}: {server.counters.connections} connection(s), {server.counters.requests} request(s), "
+          f"{elapsed:.2f}s wall, p50 {percentile(latencies, 50) * 1000:.0f}ms, "
+          f"p95 {percentile(latencies, 95) * 1000:.0f}ms")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.05
+
+    http1, h2_server = start_servers(latency)
+    print(f"{count} requests from {threads} threads, {latency * 1000:.0f}ms server latency")
+
+    session = requests.Session()
+    report('requests (HTTP/1.1)', http1, *run(session, http1.url, count, threads))
+
+    if not (h2_server and http2_session.HTTP2_AVAILABLE):
+        print("⚠️  Skipping HTTP/2: needs httpx[http2] and h2")
+        return
+    session = http2_session.HTTP2Session(http1=False)
+    try:
+        report('httpx (HTTP/2)     ', h2_server, *run(session, h2_server.url, count, threads))
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    main()
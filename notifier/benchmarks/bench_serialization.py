@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark: JSON encode/decode throughput per serialization backend
+- Uses the synthetic promotions and entitlements payloads from
+  bench_streaming_json, projected to the fields we keep (what state files
+  and caches actually hold)
+- Runs every backend that is installed (stdlib json, orjson, msgspec)
+- Also times schema validation of the decoded items
+
+Usage: python3 benchmarks/bench_serialization.py [elements] [entitlements] [rounds]
+"""
+import os
+import sys
+import time
+import importlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import serialization
+import streaming_json
+from bench_streaming_json import build_promotions, build_entitlements
+
+
+def timed(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = fn()
+    return result, (time.perf_counter() - start) / rounds
+
+
+def run_backend(name, payloads, rounds):
+    os.environ['JSON_BACKEND'] = name
+    backend = importlib.reload(serialization)
+    if backend.BACKEND != name:
+        return
+    print(f"{name}:")
+    for label, obj, schema in payloads:
+        data, encode_time = timed(lambda: backend.dumps(obj), rounds)
+        decoded, decode_time = timed(lambda: backend.loads(data), rounds)
+        assert decoded == obj
+        size = len(data) / 1e6
+        _, check_time = timed(lambda: [backend.validate(item, schema) for item in decoded], rounds)
+        print(f"   {label:<13} {size:5.1f} MB  encode {size / encode_time:7.1f} MB/s  "
+              f"decode {size / decode_time:7.1f} MB/s  validate {check_time * 1000:7.1f} ms")
+
+
+def main():
+    elements = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    entitlements = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    promotions = build_promotions(elements)['data']['Catalog']['searchStore']['elements']
+    payloads = [
+        ('promotions', [streaming_json.project(e, streaming_json.ELEMENT_FIELDS) for e in promotions], 'promotion'),
+        ('entitlements', [streaming_json.project(e, streaming_json.ENTITLEMENT_FIELDS)
+                          for e in build_entitlements(entitlements)], 'entitlement'),
+    ]
+    for name in ('json', 'orjson', 'msgspec'):
+        run_backend(name, payloads, rounds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark: peak memory of full json decoding vs streaming projection
+- Writes a synthetic promotions payload (N elements padded with the fields
+  Epic sends but we never read) and an entitlements list (M items) to disk
+- "full" reads the whole body and json.loads it, like response.json()
+- "stream" reads 64 KB chunks through streaming_json (ijson if installed)
+- Peak memory is measured with tracemalloc
+
+Usage: python3 benchmarks/bench_streaming_json.py [elements] [entitlements]
+"""
+import sys
+import json
+import time
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import streaming_json
+from streaming_json import PROMOTIONS_PATH, ELEMENT_FIELDS, ENTITLEMENT_FIELDS
+
+
+def build_promotions(count):
+    elements = []
+    for i in range(count):
+        elements.append({
+            'title': f'Game {i}',
+            'id': f'offer{i:06d}',
+            'namespace': f'ns{i:06d}',
+            'description': 'A game. ' * 20,
+            'offerType': 'BASE_GAME',
+            'keyImages': [{'type': t, 'url': f'https://cdn.example/{i}/{t}.jpg'} for t in
+                          ('OfferImageWide', 'OfferImageTall', 'Thumbnail', 'DieselStoreFrontWide')],
+            'seller': {'id': f'seller{i}', 'name': 'Publisher'},
+            'items': [{'id': f'item{i:06d}', 'namespace': f'ns{i:06d}'}],
+            'customAttributes': [{'key': f'attr{k}', 'value': 'x' * 40} for k in range(10)],
+            'categories': [{'path': p} for p in ('freegames', 'games', 'games/edition/base')],
+            'tags': [{'id': str(k)} for k in range(15)],
+            'catalogNs': {'mappings': [{'pageSlug': f'game-{i}', 'pageType': 'productHome'}]},
+            'offerMappings': [{'pageSlug': f'game-{i}', 'pageType': 'productHome'}],
+            'price': {'totalPrice': {'discountPrice': 0, 'originalPrice': 1999, 'currencyCode': 'CNY',
+                                     'fmtPrice': {'originalPrice': '¥19.99', 'discountPrice': '0'}},
+                      'lineOffers': [{'appliedRules': []}]},
+            'promotions': {'promotionalOffers': [{'promotionalOffers': [
+                {'startDate': '2026-02-19T16:00:00.000Z', 'endDate': '2026-02-26T16:00:00.000Z'}]}]},
+        })
+    return {'data': {'Catalog': {'searchStore': {'elements': elements, 'paging': {'count': count}}}},
+            'extensions': {}}
+
+
+def build_entitlements(count):
+    return [{
+        'id': f'ent{i:08d}', 'entitlementName': f'name{i}', 'namespace': f'ns{i % 5000:06d}',
+        'catalogItemId': f'item{i:08d}', 'entitlementType': 'EXECUTABLE', 'grantDate': '2020-01-01T00:00:00Z',
+        'consumable': False, 'status': 'ACTIVE', 'active': True, 'useCount': 0, 'created': '2020-01-01',
+        'updated': '2020-01-01', 'groupEntitlement': False, 'country': 'CN', 'operatorId': None,
+    } for i in range(count)]
+
+
+def chunks_of(path):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(streaming_json.CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, peak, elapsed
+
+
+def full_promotions(path):
+    data = json.loads(Path(path).read_bytes())
+    elements = data['data']['Catalog']['searchStore']['elements']
+    return [streaming_json.project(e, ELEMENT_FIELDS) for e in elements]
+
+
+def full_entitlements(path):
+    return [(e.get('namespace'), e.get('catalogItemId')) for e in json.loads(Path(path).read_bytes())]
+
+
+def stream_promotions(path):
+    return list(streaming_json.iter_items(chunks_of(path), PROMOTIONS_PATH, ELEMENT_FIELDS))
+
+
+def stream_entitlements(path):
+    return [(e.get('namespace'), e.get('catalogItemId'))
+            for e in streaming_json.iter_items(chunks_of(path), [], ENTITLEMENT_FIELDS)]
+
+
+def main():
+    elements = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    entitlements = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+
+    tmp = Path(tempfile.mkdtemp())
+    promotions_file = tmp / 'promotions.json'
+    entitlements_file = tmp / 'entitlements.json'
+    promotions_file.write_text(json.dumps(build_promotions(elements)))
+    entitlements_file.write_text(json.dumps(build_entitlements(entitlements)))
+
+    backend = 'ijson' if streaming_json.IJSON_AVAILABLE else 'stdlib scanner'
+    print(f"Streaming backend: {backend}")
+    for name, path, full, stream in (
+        (f'promotions ({elements} elements)', promotions_file, full_promotions, stream_promotions),
+        (f'entitlements ({entitlements} items)', entitlements_file, full_entitlements, stream_entitlements),
+    ):
+        size = path.stat().st_size / 1e6
+        full_result, full_peak, full_time = measure(lambda: full(path))
+        stream_result, stream_peak, stream_time = measure(lambda: stream(path))
+        assert full_result == stream_result
+        print(f"{name}, {size:.1f} MB body")
+        print(f"   full   : peak {full_peak / 1e6:7.1f} MB  {full_time:6.2f}s")
+        print(f"   stream : peak {stream_peak / 1e6:7.1f} MB  {stream_time:6.2f}s  "
+              f"({full_peak / stream_peak:.1f}x less memory)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Mock Epic server - Local stand-in for the Epic endpoints the benchmarks hit
+- HTTP/1.1 (stdlib, keep-alive) and, when h2 is installed, cleartext HTTP/2
+  with prior knowledge (h2c) on a second port
+- Serves freeGamesPromotions, entitlements pages and GraphQL with a fixed
+  artificial latency per request
+- Counts connections and requests, so benchmarks can compare how many
+  sockets each client backend opens
+
+Usage: python3 benchmarks/mock_epic_server.py [http1 port] [h2 port] [latency ms]
+"""
+import sys
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import h2.config
+    import h2.events
+    import h2.connection
+    H2_AVAILABLE = True
+except ImportError:
+    H2_AVAILABLE = False
+
+PROMOTIONS = {'data': {'Catalog': {'searchStore': {'elements': [{
+    'id': f'offer{i}', 'namespace': f'ns{i}', 'title': f'Game {i}', 'offerType': 'BASE_GAME',
+    'items': [{'id': f'item{i}', 'namespace': f'ns{i}'}],
+    'price': {'totalPrice': {'discountPrice': 0, 'originalPrice': 1999, 'currencyCode': 'CNY'}},
+    'promotions': {'promotionalOffers': [{'promotionalOffers': [
+        {'startDate': '2026-02-19T16:00:00.000Z', 'endDate': '2026-02-26T16:00:00.000Z'}]}]},
+    'offerMappings': [{'pageSlug': f'game-{i}'}],
+} for i in range(4)]}}}}
+
+ENTITLEMENTS = [{'namespace': f'ns{i}', 'catalogItemId': f'item{i}'} for i in range(200)]
+
+
+def route(method, path, body):
+    """(status, JSON bytes) for one request"""
+    if path.startswith('/freeGamesPromotions'):
+        return 200, json.dumps(PROMOTIONS).encode('utf-8')
+    if path.startswith('/entitlement/api/account/'):
+        return 200, json.dumps(ENTITLEMENTS).encode('utf-8')
+    if path.startswith('/graphql') and method == 'POST':
+        query = json.loads(body or b'{}').get('query', '')
+        if 'ownedInformation' in query:
+            data = {'Catalog': {'catalogOffer': {'ownedInformation': {'owned': False, 'quantity': 0}}}}
+        elif 'userInfo' in query:
+            data = {'Launcher': {'userInfo': {'accountId': 'mock', 'displayName': 'mock'}}}
+        else:
+            data = {}
+        return 200, json.dumps({'data': data}).encode('utf-8')
+    return 404, b'{}'
+
+
+class Counters:
+    def __init__(self):
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def add(self, connections=0, requests=0):
+        with self.lock:
+            self.connections += connections
+            self.requests += requests
+
+    def reset(self):
+        with self.lock:
+            self.connections = self.requests = 0
+
+
+# ---- HTTP/1.1 ----------------------------------------------------------------
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _serve(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        time.sleep(self.server.latency)
+        status, payload = route(self.command, self.path, body)
+        self.server.counters.add(requests=1)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = _serve
+    do_POST = _serve
+
+    def log_message(self, *args):
+        pass
+
+
+class HTTP1Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.05):
+        super().__init__(('127.0.0.1', port), _Handler)
+        self.latency = latency
+        self.counters = Counters()
+
+    def get_request(self):
+        self.counters.add(connections=1)
+        return super().get_request()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+# ---- HTTP/2 (h2c, prior knowledge) --------------------------------------------
+
+class H2Server:
+    """asyncio h2c server on its own thread"""
+
+    def __init__(self, port=0, latency=0.05):
+        self.port = port
+        self.latency = latency
+        self.counters = Counters()
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        self.ready.wait()
+        return self
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        server = self.loop.run_until_complete(asyncio.start_server(self._connection, '127.0.0.1', self.port))
+        self.port = server.sockets[0].getsockname()[1]
+        self.ready.set()
+        self.loop.run_forever()
+
+    async def _connection(self, reader, writer):
+        self.counters.add(connections=1)
+        conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False, header_encoding='utf-8'))
+        conn.initiate_connection()
+        writer.write(conn.data_to_send())
+        streams = {}
+        window_open = asyncio.Event()
+
+        async def respond(stream_id):
+            request = streams.pop(stream_id)
+            await asyncio.sleep(self.latency)
+            status, payload = route(request['headers'][':method'], request['headers'][':path'], request['body'])
+            self.counters.add(requests=1)
+            conn.send_headers(stream_id, [(':status', str(status)), ('content-type', 'application/json'),
+                                          ('content-length', str(len(payload)))])
+            while payload:
+                size = min(conn.local_flow_control_window(stream_id), conn.max_outbound_frame_size, len(payload))
+                if size <= 0:
+                    window_open.clear()
+                    writer.write(conn.data_to_send())
+                    await window_open.wait()
+                    continue
+                conn.send_data(stream_id, payload[:size])
+                payload = payload[size:]
+            conn.end_stream(stream_id)
+            writer.write(conn.data_to_send())
+
+        while True:
+            data = await reader.read(65535)
+            if not data:
+                break
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    streams[event.stream_id] = {'headers': dict(event.headers), 'body': b''}
+                elif isinstance(event, h2.events.DataReceived):
+                    streams[event.stream_id]['body'] += event.data
+                    conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                elif isinstance(event, h2.events.StreamEnded):
+                    asyncio.ensure_future(respond(event.stream_id))
+                elif isinstance(event, h2.events.WindowUpdated):
+                    window_open.set()
+                elif isinstance(event, h2.events.ConnectionTerminated):
+                    writer.close()
+                    return
+            writer.write(conn.data_to_send())
+        writer.close()
+
+
+def start_servers(latency=0.05, http1_port=0, h2_port=0):
+    """(HTTP1Server, H2Server or None), both serving in background threads"""
+    http1 = HTTP1Server(http1_port, latency)
+    threading.Thread(target=http1.serve_forever, daemon=True).start()
+    h2_server = H2Server(h2_port, latency).start() if H2_AVAILABLE else None
+    return http1, h2_server
+
+
+def main():
+    http1_port = int(sys.argv[1]) if len(sys.argv) > 1 else 8081
+    h2_port = int(sys.argv[2]) if len(sys.argv) > 2 else 8082
+    latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.05
+
+    http1, h2_server = start_servers(latency, http1_port, h2_port)
+    print(f"🧪 HTTP/1.1 mock on {http1.url}")
+    if h2_server:
+        print(f"🧪 HTTP/2 (h2c) mock on {h2_server.url}")
+    else:
+        print("⚠️  h2 not installed, no HTTP/2 listener")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
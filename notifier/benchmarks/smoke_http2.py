@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Smoke check: the HTTP/2 session against the local h2c mock server
+- Exercises what the API classes rely on: GET with params, POST json=,
+  streamed bodies through the streaming JSON parser, raise_for_status,
+  close() on an unread stream, hedged_get and many threads sharing one
+  multiplexed connection
+- Run it before enabling HTTP_BACKEND=http2 (with HTTP2_EXPERIMENTAL=1);
+  exit code 1 if any check fails or httpx[http2]/h2 are missing
+
+Usage: python3 benchmarks/smoke_http2.py
+"""
+import sys
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import http2_session
+import http_client
+import serialization
+from streaming_json import iter_items, response_chunks, ENTITLEMENT_FIELDS
+from mock_epic_server import start_servers, ENTITLEMENTS
+
+OWNED_QUERY = 'query { Catalog { catalogOffer { ownedInformation { owned } } } }'
+
+
+def check_get(session, url):
+    response = session.get(f"{url}/freeGamesPromotions", params={'locale': 'en-US'}, timeout=10)
+    response.raise_for_status()
+    assert response.http_version == 'HTTP/2', response.http_version
+    elements = serialization.loads(response.content)['data']['Catalog']['searchStore']['elements']
+    assert len(elements) == 4, len(elements)
+
+
+def check_post(session, url):
+    response = session.post(f"{url}/graphql", json={'query': OWNED_QUERY}, timeout=10)
+    response.raise_for_status()
+    owned = serialization.loads(response.content)['data']['Catalog']['catalogOffer']['ownedInformation']
+    assert owned['owned'] is False, owned
+
+
+def check_stream(session, url):
+    response = session.get(f"{url}/entitlement/api/account/mock/entitlements",
+                           params={'start': 0, 'count': 5000}, timeout=10, stream=True)
+    items = list(iter_items(response_chunks(response), [], ENTITLEMENT_FIELDS, 'entitlement'))
+    assert len(items) == len(ENTITLEMENTS), len(items)
+
+
+def check_close(session, url):
+    response = session.get(f"{url}/freeGamesPromotions", timeout=10, stream=True)
+    response.close()
+    response.close()
+
+
+def check_error(session, url):
+    response = session.get(f"{url}/missing", timeout=10)
+    assert response.status_code == 404, response.status_code
+    try:
+        response.raise_for_status()
+    except Exception:
+        return
+    raise AssertionError("raise_for_status() did not raise on 404")
+
+
+def check_hedged(session, url):
+    response = http_client.hedged_get(session, [f"{url}/freeGamesPromotions"] * 2, timeout=10, stream=True)
+    assert response.status_code == 200, response.status_code
+    assert serialization.loads(response.content)['data']
+
+
+def check_multiplexed(session, url, server):
+    before = server.counters.connections
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        statuses = list(pool.map(lambda _: session.post(f"{url}/graphql", json={'query': OWNED_QUERY},
+                                                        timeout=10).status_code, range(40)))
+    assert statuses == [200] * 40, statuses
+    assert server.counters.connections == before, f"{server.counters.connections - before} new connection(s)"
+
+
+def main():
+    _, h2_server = start_servers(latency=0.01)
+    if not (h2_server and http2_session.HTTP2_AVAILABLE):
+        print("❌ Needs httpx[http2] (client) and h2 (mock server)")
+        sys.exit(1)
+
+    url = h2_server.url
+    session = http2_session.HTTP2Session(http1=False)
+    checks = [
+        ('GET + params', lambda: check_get(session, url)),
+        ('POST json=', lambda: check_post(session, url)),
+        ('streamed entitlements', lambda: check_stream(session, url)),
+        ('close() unread stream', lambda: check_close(session, url)),
+        ('raise_for_status', lambda: check_error(session, url)),
+        ('hedged_get', lambda: check_hedged(session, url)),
+        ('one connection, many threads', lambda: check_multiplexed(session, url, h2_server)),
+    ]
+    failed = 0
+    try:
+        for name, check in checks:
+            try:
+                check()
+                print(f"✅ {name}")
+            except Exception as e:
+                failed += 1
+                print(f"❌ {name}: {type(e).__name__}: {e}")
+    finally:
+        session.close()
+
+    print(f"\n{len(checks) - failed}/{len(checks)} checks passed")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Claim Journal - Write-ahead log of claim progress per account
+- Every claim step is appended (and fsynced) before and after it runs
+- Replaying the log tells a restarted run where each game stopped
+- A confirm that was sent but never answered is never blindly resent
+"""
+import os
+import time
+import threading
+from pathlib import Path
+
+from accounts import DATA_DIR
+import serialization
+
+JOURNAL_DIR = DATA_DIR / 'journal'
+
+# Steps in claim order
+OWNERSHIP = 'ownership'
+FREE_ORDER = 'free_order'
+PREVIEW = 'preview'
+CONFIRM = 'confirm'
+DONE = 'done'
+
+# Statuses
+SENT = 'sent'      # request about to go out, outcome unknown until the next record
+OK = 'ok'
+FAILED = 'failed'
+
+# Compact once the log holds this many records
+COMPACT_THRESHOLD = 2000
+
+
+class ClaimJournal:
+    """Append-only JSONL journal: one record per step transition"""
+
+    def __init__(self, account='default', journal_dir=JOURNAL_DIR):
+        self.path = Path(journal_dir) / f"{account}.jsonl"
+        self._states = None
+        self._lock = threading.Lock()
+
+    def _replay(self):
+        """{offer_id: {step: record}} from the log (latest record per step wins)"""
+        states = {}
+        if not self.path.exists():
+            return states
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = serialization.loads(line)
+                except ValueError:
+                    # Torn last line from a crash mid-write
+                    continue
+                states.setdefault(record['offer_id'], {})[record['step']] = record
+        return states
+
+    def reload(self):
+        """Forget the replayed state; the next lookup replays the log (other processes' records included)"""
+        with self._lock:
+            self._states = None
+
+    @property
+    def states(self):
+        if self._states is None:
+            self._states = self._replay()
+        return self._states
+
+    def state(self, offer_id):
+        """{step: latest record} for one offer"""
+        return self.states.get(offer_id, {})
+
+    def record(self, offer_id, step, status, **extra):
+        """Durably append one step transition"""
+        entry = {'ts': time.time(), 'offer_id': offer_id, 'step': step, 'status': status}
+        entry.update(extra)
+
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(serialization.dumps(entry).decode('utf-8') + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.states.setdefault(offer_id, {})[step] = entry
+        return entry
+
+    def attempt(self, offer_id):
+        """Steps of the current, unfinished attempt (recorded after the last DONE)"""
+        state = self.state(offer_id)
+        done_ts = state.get(DONE, {}).get('ts', 0)
+        return {step: r for step, r in state.items() if step != DONE and r['ts'] > done_ts}
+
+    def is_done(self, offer_id):
+        return self.state(offer_id).get(DONE, {}).get('status') == OK
+
+    def in_doubt(self, offer_id):
+        """Step whose request went out with no recorded outcome (free_order/confirm)"""
+        attempt = self.attempt(offer_id)
+        for step in (CONFIRM, FREE_ORDER):
+            if attempt.get(step, {}).get('status') == SENT:
+                return step
+        return None
+
+    def failed(self, offer_id, step):
+        return self.attempt(offer_id).get(step, {}).get('status') == FAILED
+
+    def preview_order_id(self, offer_id):
+        """Order id of this attempt's successful preview, if its confirm is still to do"""
+        attempt = self.attempt(offer_id)
+        preview = attempt.get(PREVIEW, {})
+        if preview.get('status') == OK and attempt.get(CONFIRM, {}).get('status') != OK:
+            return preview.get('order_id') or ''
+        return None
+
+    def compact(self):
+        """Rewrite the log keeping only the latest record per (offer, step)"""
+        records = [r for steps in self.states.values() for r in steps.values()]
+        records.sort(key=lambda r: r['ts'])
+
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(serialization.dumps(record).decode('utf-8') + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def maybe_compact(self):
+        if not self.path.exists():
+            return
+        with open(self.path, 'rb') as f:
+            lines = sum(1 for _ in f)
+        if lines > COMPACT_THRESHOLD:
+            self.compact()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Claim Method Stats - Remember which claim method works, with decay
+- Success/failure counts per (account, namespace, offer type, method)
+- Counts decay with a half-life so old outcomes fade out
+- Methods are tried best-first; a method that keeps failing is skipped
+  (with an occasional probe so a fixed endpoint is noticed again)
+- One file for all accounts: save() re-reads it under an flock and merges
+  in only this process's new outcomes, so concurrent writers keep each
+  other's samples
+"""
+import time
+import random
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from accounts import DATA_DIR
+import serialization
+
+STATS_FILE = DATA_DIR / 'claim_methods.json'
+
+HALF_LIFE = 14 * 86400
+# Skip a method once it has this much (decayed) failure and almost no success
+BROKEN_FAILURES = 3.0
+BROKEN_SUCCESS_RATE = 0.1
+# Chance of trying a "broken" method anyway to detect recovery
+PROBE_RATE = 0.1
+# Evidence needed before a more specific level overrides a broader one
+MIN_EVIDENCE = 1.0
+
+
+class ClaimMethodStats:
+    """Decayed per-method success memory, most specific level first"""
+
+    def __init__(self, account='default', stats_file=STATS_FILE):
+        self.account = account
+        self.stats_file = stats_file
+        self.lock_file = stats_file.with_name(stats_file.name + '.lock')
+        self.lock = threading.Lock()
+        # Outcomes recorded since the last save: key -> [(success, time)]
+        self.pending = {}
+        self.stats = self._load()
+
+    def _load(self):
+        if not self.stats_file.exists():
+            return {}
+        try:
+            return serialization.load(self.stats_file)
+        except Exception:
+            return {}
+
+    @contextmanager
+    def _file_lock(self):
+        self.lock_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_file, 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _merged(self, stats):
+        """`stats` (from disk) with this process's unsaved outcomes added"""
+        for key, outcomes in self.pending.items():
+            for success, now in outcomes:
+                stats[key] = self._added(stats.get(key), success, now)
+        return stats
+
+    def reload(self):
+        """Pick up outcomes other processes saved since this one loaded the file"""
+        with self.lock:
+            self.stats = self._merged(self._load())
+
+    def save(self):
+        """Merge this process's new outcomes into the file (other writers' samples are kept)"""
+        with self.lock, self._file_lock():
+            self.stats = self._merged(self._load())
+            serialization.dump(self.stats_file, self.stats)
+            self.pending = {}
+
+    def _keys(self, method, namespace, offer_type):
+        """Most specific first: namespace, offer type, whole account"""
+        return [
+            f"{self.account}|ns:{namespace}|{method}",
+            f"{self.account}|type:{offer_type or '?'}|{method}",
+            f"{self.account}|*|{method}",
+        ]
+
+    @staticmethod
+    def _decayed(entry, now):
+        factor = 0.5 ** ((now - entry['t']) / HALF_LIFE)
+        return entry['s'] * factor, entry['f'] * factor
+
+    def counts(self, method, namespace=None, offer_type=None, now=None):
+        """(successes, failures) from the most specific level with enough evidence"""
+        now = now or time.time()
+        fallback = (0.0, 0.0)
+        for key in self._keys(method, namespace, offer_type):
+            entry = self.stats.get(key)
+            if not entry:
+                continue
+            s, f = self._decayed(entry, now)
+            if s + f >= MIN_EVIDENCE:
+                return s, f
+            fallback = (s, f)
+        return fallback
+
+    def success_rate(self, method, namespace=None, offer_type=None):
+        """Laplace-smoothed success estimate (0.5 with no data)"""
+        s, f = self.counts(method, namespace, offer_type)
+        return (s + 1) / (s + f + 2)
+
+    def is_broken(self, method, namespace=None, offer_type=None):
+        s, f = self.counts(method, namespace, offer_type)
+        return f >= BROKEN_FAILURES and s / (s + f) < BROKEN_SUCCESS_RATE
+
+    def plan(self, methods, namespace=None, offer_type=None):
+        """Methods to try, best first, known-broken ones dropped (unless probing)
+
+        Ties keep the given order, so the default preference still applies
+        when there is no history.
+        """
+        ranked = sorted(methods, key=lambda m: -self.success_rate(m, namespace, offer_type))
+        usable = [m for m in ranked if not self.is_broken(m, namespace, offer_type)]
+        broken = [m for m in ranked if m not in usable]
+
+        if not usable:
+            return ranked
+        if broken and random.random() < PROBE_RATE:
+            usable.append(broken[0])
+        return usable
+
+    @classmethod
+    def _added(cls, entry, success, now):
+        s, f = cls._decayed(entry, now) if entry else (0.0, 0.0)
+        return {'s': s + (1 if success else 0), 'f': f + (0 if success else 1), 't': now}
+
+    def record(self, method, namespace, offer_type, success, now=None):
+        """Add one outcome at every level"""
+        now = now or time.time()
+        with self.lock:
+            for key in self._keys(method, namespace, offer_type):
+                self.stats[key] = self._added(self.stats.get(key), success, now)
+                self.pending.setdefault(key, []).append((success, now))
@@ -5,8 +5,6 @@ Handles cookie validation, refresh, and automatic updates
 """
 import os
 import sys
-import json
-import shutil
 import time
 from pathlib import Path
 from datetime import datetime, timedelta
@@ -17,49 +15,99 @@ try:
 except ImportError:
     BROWSER_COOKIE_AVAILABLE = False
 
+import cookie_reader
+from accounts import Account, account_id_from_cookies
+from backup_store import CookieBackupStore
+import serialization
+
 class CookieManager:
     """Manage Epic Games cookies with validation and refresh"""
 
-    def __init__(self):
+    def __init__(self, account=None):
         self.base_dir = Path(__file__).parent
-        self.cookies_file = self.base_dir / 'claimer' / 'data' / 'cookies.json'
-        self.cookies_backup_dir = self.base_dir / 'claimer' / 'data' / 'cookies_backup'
+        self.project_dir = self.base_dir.parent
+        self.account = account or Account()
+        self.cookies_file = self.account.cookies_file
+        self.cookies_backup_dir = self.project_dir / 'claimer' / 'data' / 'cookies_backup'
         self.cookies_backup_dir.mkdir(parents=True, exist_ok=True)
+        self.backup_store = CookieBackupStore(self.cookies_backup_dir)
 
         # Browser cookie database paths
         self.browser_paths = {
             'chrome': Path.home() / 'Library/Application Support/Google/Chrome/Default/Cookies',
             'edge': Path.home() / 'Library/Application Support/Microsoft Edge/Default/Cookies',
             'brave': Path.home() / 'Library/Application Support/BraveSoftware/Brave-Browser/Default/Cookies',
+            'firefox': cookie_reader.find_firefox_cookie_db(),
         }
 
     def backup_cookies(self):
-        """Backup current cookies"""
-        if self.cookies_file.exists():
-            backup_name = f"cookies_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            backup_path = self.cookies_backup_dir / backup_name
-            shutil.copy2(self.cookies_file, backup_path)
-            print(f"✅ Backed up cookies to: {backup_path}")
-
-            # Keep only last 10 backups
-            backups = sorted(self.cookies_backup_dir.glob('cookies_*.json'))
-            if len(backups) > 10:
-                for old_backup in backups[:-10]:
-                    old_backup.unlink()
-
-    def extract_from_browser(self, browser='chrome'):
-        """Extract cookies from specified browser using browser-cookie3"""
-        if not BROWSER_COOKIE_AVAILABLE:
-            raise ImportError("browser-cookie3 is required. Install with: pip3 install browser-cookie3")
+        """Backup current cookies (stored once per distinct content)"""
+        cookies = self.load_cookies()
+        if cookies is None:
+            return None
+
+        digest, stored = self.backup_store.backup(self.account.name, cookies)
+        if stored:
+            print(f"✅ Backed up cookies: {digest[:12]}")
+        else:
+            print(f"⏭️  Cookies unchanged since last backup: {digest[:12]}")
+        return digest
+
+    def list_backups(self):
+        """Show backup history for this account"""
+        entries = self.backup_store.manifest(self.account.name)
+        if not entries:
+            print("No backups yet")
+            return
+
+        print(f"Backups for account '{self.account.name}':")
+        for timestamp, digest in entries:
+            when = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+            print(f"   {when}  {digest[:12]}")
+
+    def restore_backup(self, ref=None):
+        """Restore cookies from a point in time ('YYYY-mm-dd HH:MM[:SS]') or a hash prefix"""
+        at = None
+        if ref:
+            try:
+                at = datetime.fromisoformat(ref).timestamp()
+            except ValueError:
+                at = ref.lower()
+
+        cookies = self.backup_store.restore(self.account.name, at)
+        if cookies is None:
+            print(f"❌ No backup found for: {ref or 'latest'}")
+            return False
+
+        self.backup_cookies()
+        self.save_cookies(cookies)
+        return True
+
+    def extract_from_browser(self, browser='chrome', backend='auto'):
+        """Extract cookies from specified browser
 
+        backend: 'native' reads the cookie DB in place with a host-filtered
+        query, 'browser_cookie3' uses the library, 'auto' tries native first.
+        """
         if browser not in self.browser_paths:
             raise ValueError(f"Unsupported browser: {browser}")
 
         db_path = self.browser_paths[browser]
 
-        if not db_path.exists():
+        if not db_path or not db_path.exists():
             raise FileNotFoundError(f"{browser.title()} cookies database not found: {db_path}")
 
+        if backend in ('auto', 'native'):
+            try:
+                return cookie_reader.read_cookies(browser, db_path)
+            except Exception as e:
+                if backend == 'native':
+                    raise Exception(f"Failed to read cookies from {browser}: {e}")
+                print(f"   ⚠️  Native reader failed ({e}), falling back to browser-cookie3")
+
+        if not BROWSER_COOKIE_AVAILABLE:
+            raise ImportError("browser-cookie3 is required. Install with: pip3 install browser-cookie3")
+
         cookies = []
         try:
             # Use browser-cookie3 to extract cookies
@@ -69,6 +117,8 @@ class CookieManager:
                 cj = browser_cookie3.edge(domain_name='epicgames.com')
             elif browser == 'brave':
                 cj = browser_cookie3.brave(domain_name='epicgames.com')
+            elif browser == 'firefox':
+                cj = browser_cookie3.firefox(cookie_file=str(db_path), domain_name='epicgames.com')
             else:
                 raise ValueError(f"Unsupported browser: {browser}")
 
@@ -120,18 +170,14 @@ class CookieManager:
             return None
 
         try:
-            with open(self.cookies_file, 'r') as f:
-                return json.load(f)
+            return serialization.load(self.cookies_file)
         except Exception as e:
             print(f"⚠️  Failed to load cookies: {e}")
             return None
 
     def save_cookies(self, cookies):
         """Save cookies to file"""
-        self.cookies_file.parent.mkdir(parents=True, exist_ok=True)
-
-        with open(self.cookies_file, 'w') as f:
-            json.dump(cookies, f, indent=2)
+        serialization.dump(self.cookies_file, cookies)
 
         print(f"✅ Saved {len(cookies)} cookies to: {self.cookies_file}")
 
@@ -192,19 +238,20 @@ class CookieManager:
 
         return False, "Cookies are fresh"
 
-    def auto_refresh(self):
+    def auto_refresh(self, backend='auto'):
         """Automatically refresh cookies from browser"""
         print("🔄 Auto-refreshing cookies...")
 
         # Backup existing cookies
         if self.cookies_file.exists():
             self.backup_cookies()
+        expected_account_id = account_id_from_cookies(self.load_cookies())
 
         # Try each browser
-        for browser in ['chrome', 'edge', 'brave']:
+        for browser in ['chrome', 'edge', 'brave', 'firefox']:
             try:
                 print(f"\n🔍 Trying {browser.title()}...")
-                cookies = self.extract_from_browser(browser)
+                cookies = self.extract_from_browser(browser, backend)
 
                 if not cookies:
                     print(f"   ⚠️  No Epic Games cookies found in {browser.title()}")
@@ -216,6 +263,12 @@ class CookieManager:
                     print(f"   ⚠️  Invalid cookies: {message}")
                     continue
 
+                # Never overwrite one account's cookies with another's login
+                found_account_id = account_id_from_cookies(cookies)
+                if expected_account_id and found_account_id and found_account_id != expected_account_id:
+                    print(f"   ⚠️  {browser.title()} is logged into a different account, skipping")
+                    continue
+
                 # Save
                 self.save_cookies(cookies)
 
@@ -244,7 +297,7 @@ class CookieManager:
 
         print("\n❌ Failed to extract cookies from any browser")
         print("   Please make sure:")
-        print("   1. You're logged into Epic Games in Chrome/Edge/Brave")
+        print("   1. You're logged into Epic Games in Chrome/Edge/Brave/Firefox")
         print("   2. The browser is completely closed")
         print("   3. You've visited https://store.epicgames.com recently")
 
@@ -313,16 +366,24 @@ class CookieManager:
 
 
 def main():
-    manager = CookieManager()
+    args = sys.argv[1:]
+    account = None
+    if '--account' in args:
+        i = args.index('--account')
+        account = Account(args[i + 1])
+        del args[i:i + 2]
+
+    manager = CookieManager(account)
 
-    if len(sys.argv) < 2:
+    if not args:
         # Default: show info
         manager.info()
     else:
-        command = sys.argv[1].lower()
+        command = args[0].lower()
 
         if command == 'refresh':
-            success = manager.auto_refresh()
+            backend = args[1] if len(args) > 1 else 'auto'
+            success = manager.auto_refresh(backend)
             sys.exit(0 if success else 1)
 
         elif command == 'info':
@@ -331,6 +392,31 @@ def main():
         elif command == 'backup':
             manager.backup_cookies()
 
+        elif command == 'backups':
+            manager.list_backups()
+
+        elif command == 'restore':
+            success = manager.restore_backup(' '.join(args[1:]) or None)
+            sys.exit(0 if success else 1)
+
+        elif command == 'watch':
+            from cookie_watcher import CookieWatcher
+            debounce = float(args[1]) if len(args) > 1 else 5.0
+            CookieWatcher(manager, debounce=debounce).run()
+
+        elif command in ('calendar', 'schedule', 'scheduler'):
+            from credential_scheduler import CredentialScheduler
+            scheduler = CredentialScheduler([account] if account else None)
+            refresh = lambda acc: CookieManager(acc).auto_refresh()
+
+            if command == 'calendar':
+                scheduler.print_calendar()
+            elif command == 'schedule':
+                for acc, ok in scheduler.run_due(refresh):
+                    print(f"{'✅' if ok else '❌'} {acc.name}")
+            else:
+                scheduler.run_forever(refresh)
+
         elif command == 'check':
             need_refresh, reason = manager.check_need_refresh()
             print(f"Need refresh: {need_refresh}")
@@ -338,13 +424,19 @@ def main():
             sys.exit(0 if not need_refresh else 1)
 
         else:
-            print("Usage: python3 cookie_manager.py [command]")
+            print("Usage: python3 cookie_manager.py [--account NAME] [command]")
             print()
             print("Commands:")
             print("  info     - Show cookie status (default)")
-            print("  refresh  - Extract cookies from browser")
+            print("  refresh  - Extract cookies from browser [auto|native|browser_cookie3]")
             print("  backup   - Backup current cookies")
+            print("  backups  - List backups")
+            print("  restore  - Restore a backup [YYYY-mm-dd HH:MM | hash prefix]")
             print("  check    - Check if refresh needed")
+            print("  watch    - Re-extract when browser cookies change [debounce seconds]")
+            print("  calendar - Show the expiry calendar and planned refreshes")
+            print("  schedule - Refresh accounts whose planned refresh is due (cron)")
+            print("  scheduler - Run the refresh schedule as a background loop")
             print()
             print("Examples:")
             print("  python3 cookie_manager.py")
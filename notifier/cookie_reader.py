@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Native Cookie Reader - Read-only SQLite extraction for Epic Games cookies
+- Opens the browser cookie database in place, read-only (WAL included), and
+  falls back to a temp copy of the db and its -wal/-shm only when it is locked
+- Filters on host in SQL so only epicgames.com rows are ever fetched
+- Decrypts only the matching rows (Chromium v10/v11 values)
+"""
+import os
+import sys
+import glob
+import shutil
+import sqlite3
+import hashlib
+import tempfile
+import subprocess
+from pathlib import Path
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+try:
+    from Cryptodome.Cipher import AES
+    AES_AVAILABLE = True
+except ImportError:
+    try:
+        from Crypto.Cipher import AES
+        AES_AVAILABLE = True
+    except ImportError:
+        AES_AVAILABLE = False
+
+EPIC_HOST_PATTERN = '%epicgames.com'
+
+# Seconds between 1601-01-01 (Chromium epoch) and 1970-01-01
+CHROMIUM_EPOCH_OFFSET = 11644473600
+
+# Keychain / keyring service names used by Chromium-based browsers
+SAFE_STORAGE_NAMES = {
+    'chrome': ('Chrome Safe Storage', 'chrome'),
+    'edge': ('Microsoft Edge Safe Storage', 'chromium'),
+    'brave': ('Brave Safe Storage', 'brave'),
+    'chromium': ('Chromium Safe Storage', 'chromium'),
+}
+
+SAME_SITE_NAMES = {0: 'None', 1: 'Lax', 2: 'Strict'}
+
+
+class CookieDecryptError(Exception):
+    """Raised when an encrypted cookie value cannot be decrypted"""
+
+
+@contextmanager
+def open_readonly(db_path):
+    """Read-only connection to a browser database that may be in use
+
+    mode=ro still reads the -wal file, where browsers keep recently committed
+    cookies (a freshly refreshed EPIC_EG1 often lives only there). If the
+    browser holds the database locked, the db and its -wal/-shm are copied
+    to a temp dir and read from there instead.
+    """
+    db_path = Path(db_path).resolve()
+    conn = sqlite3.connect(f"file:{pathname2url(str(db_path))}?mode=ro", uri=True)
+    try:
+        conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+    except sqlite3.OperationalError:
+        conn.close()
+        conn = None
+
+    if conn is not None:
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
+
+    with tempfile.TemporaryDirectory(prefix='cookies-') as tmp:
+        copy = Path(tmp) / db_path.name
+        for suffix in ('', '-wal', '-shm'):
+            source = db_path.with_name(db_path.name + suffix)
+            if source.exists():
+                shutil.copy2(source, copy.with_name(copy.name + suffix))
+        # A normal open of the copy replays its WAL
+        conn = sqlite3.connect(str(copy))
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+class ChromiumDecryptor:
+    """Decrypt Chromium `encrypted_value` blobs (macOS Keychain / Linux v10, v11)"""
+
+    def __init__(self, browser='chrome', password=None):
+        self.browser = browser
+        self._password = password
+        self._keys = {}
+
+    def _safe_storage_password(self):
+        """Fetch the Safe Storage password for this browser"""
+        if self._password is not None:
+            return self._password
+
+        service, application = SAFE_STORAGE_NAMES.get(self.browser, SAFE_STORAGE_NAMES['chrome'])
+
+        if sys.platform == 'darwin':
+            result = subprocess.run(
+                ['security', 'find-generic-password', '-w', '-s', service],
+                capture_output=True, text=True
+            )
+            if result.returncode != 0:
+                raise CookieDecryptError(f"Keychain entry not found: {service}")
+            self._password = result.stdout.strip()
+        elif sys.platform.startswith('linux'):
+            # v11 keys live in the desktop keyring; secret-tool is the least
+            # intrusive way to ask for them without extra Python packages
+            try:
+                result = subprocess.run(
+                    ['secret-tool', 'lookup', 'application', application],
+                    capture_output=True, text=True
+                )
+                self._password = result.stdout.strip() if result.returncode == 0 else ''
+            except FileNotFoundError:
+                self._password = ''
+        else:
+            raise CookieDecryptError(f"Native decryption not supported on {sys.platform}")
+
+        return self._password
+
+    def _key(self, version):
+        """Derive (and cache) the AES key for a given value prefix"""
+        if version in self._keys:
+            return self._keys[version]
+
+        if sys.platform == 'darwin':
+            password, iterations = self._safe_storage_password(), 1003
+        elif version == b'v10':
+            password, iterations = 'peanuts', 1
+        else:
+            password, iterations = self._safe_storage_password(), 1
+
+        key = hashlib.pbkdf2_hmac('sha1', password.encode('utf-8'), b'saltysalt', iterations, 16)
+        self._keys[version] = key
+        return key
+
+    def decrypt(self, encrypted_value, host_key='', db_version=0):
+        """Decrypt a single encrypted_value"""
+        if not AES_AVAILABLE:
+            raise CookieDecryptError("pycryptodome is required. Install with: pip3 install pycryptodome")
+
+        version = bytes(encrypted_value[:3])
+        if version not in (b'v10', b'v11'):
+            raise CookieDecryptError(f"Unsupported cookie encryption: {version!r}")
+
+        cipher = AES.new(self._key(version), AES.MODE_CBC, IV=b' ' * 16)
+        decrypted = cipher.decrypt(bytes(encrypted_value[3:]))
+
+        padding = decrypted[-1]
+        if not 1 <= padding <= 16:
+            raise CookieDecryptError("Bad padding (wrong key?)")
+        decrypted = decrypted[:-padding]
+
+        # Since DB version 24 the plaintext is prefixed with sha256(host_key)
+        if db_version >= 24 and decrypted[:32] == hashlib.sha256(host_key.encode('utf-8')).digest():
+            decrypted = decrypted[32:]
+
+        return decrypted.decode('utf-8')
+
+
+def read_chromium_cookies(db_path, browser='chrome', host_pattern=EPIC_HOST_PATTERN, decryptor=None):
+    """Read cookies matching host_pattern from a Chromium `Cookies` database"""
+    decryptor = decryptor or ChromiumDecryptor(browser)
+
+    with open_readonly(db_path) as conn:
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            db_version = int(row[0]) if row else 0
+        except sqlite3.DatabaseError:
+            db_version = 0
+
+        rows = conn.execute(
+            "SELECT host_key, name, value, encrypted_value, path, expires_utc, "
+            "is_secure, is_httponly, samesite "
+            "FROM cookies WHERE host_key LIKE ?",
+            (host_pattern,)
+        ).fetchall()
+
+    cookies = []
+    for host_key, name, value, encrypted_value, path, expires_utc, is_secure, is_httponly, samesite in rows:
+        if not value and encrypted_value:
+            value = decryptor.decrypt(encrypted_value, host_key, db_version)
+
+        expires = expires_utc / 1_000_000 - CHROMIUM_EPOCH_OFFSET if expires_utc else -1
+
+        cookies.append({
+            'name': name,
+            'value': value or '',
+            'domain': host_key or '.epicgames.com',
+            'path': path or '/',
+            'expires': expires,
+            'httpOnly': bool(is_httponly),
+            'secure': bool(is_secure),
+            'sameSite': SAME_SITE_NAMES.get(samesite, 'None' if is_secure else 'Lax')
+        })
+
+    return cookies
+
+
+def read_firefox_cookies(db_path, host_pattern=EPIC_HOST_PATTERN):
+    """Read cookies matching host_pattern from a Firefox `cookies.sqlite` database"""
+    with open_readonly(db_path) as conn:
+        rows = conn.execute(
+            "SELECT host, name, value, path, expiry, isSecure, isHttpOnly, sameSite "
+            "FROM moz_cookies WHERE host LIKE ?",
+            (host_pattern,)
+        ).fetchall()
+
+    cookies = []
+    for host, name, value, path, expiry, is_secure, is_httponly, samesite in rows:
+        # Recent Firefox versions store expiry in milliseconds
+        if expiry and expiry > 100_000_000_000:
+            expiry = expiry / 1000
+
+        cookies.append({
+            'name': name,
+            'value': value or '',
+            'domain': host or '.epicgames.com',
+            'path': path or '/',
+            'expires': expiry or -1,
+            'httpOnly': bool(is_httponly),
+            'secure': bool(is_secure),
+            'sameSite': SAME_SITE_NAMES.get(samesite, 'None' if is_secure else 'Lax')
+        })
+
+    return cookies
+
+
+def find_firefox_cookie_db():
+    """Locate the most recently used Firefox profile's cookies.sqlite"""
+    if sys.platform == 'darwin':
+        root = Path.home() / 'Library/Application Support/Firefox/Profiles'
+    elif sys.platform.startswith('win'):
+        root = Path(os.getenv('APPDATA', '')) / 'Mozilla/Firefox/Profiles'
+    else:
+        root = Path.home() / '.mozilla/firefox'
+
+    candidates = [Path(p) for p in glob.glob(str(root / '*' / 'cookies.sqlite'))]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda p: p.stat().st_mtime)
+
+
+def read_cookies(browser, db_path, host_pattern=EPIC_HOST_PATTERN):
+    """Read Epic Games cookies from a browser database"""
+    if browser == 'firefox':
+        return read_firefox_cookies(db_path, host_pattern)
+    return read_chromium_cookies(db_path, browser, host_pattern)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Cookie Store - Load cookies.json and write server-refreshed cookies back
+- Remembers the cookies as loaded (the baseline for a three-way merge)
+- Writes only what Epic changed during the run (Set-Cookie updates)
+- Locks the file and replaces it atomically so concurrent runs never clobber each other
+"""
+import os
+import time
+import tempfile
+from pathlib import Path
+from contextlib import contextmanager
+import serialization
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+EPIC_DOMAIN = 'epicgames.com'
+
+
+def cookie_key(cookie):
+    return (cookie.get('domain', '.epicgames.com'), cookie['name'], cookie.get('path', '/'))
+
+
+def cookies_from_jar(jar):
+    """Convert a requests/http.cookiejar jar into the cookies.json format"""
+    cookies = []
+    for c in jar:
+        if not (c.domain or '').endswith(EPIC_DOMAIN):
+            continue
+        cookies.append({
+            'name': c.name,
+            'value': c.value or '',
+            'domain': c.domain,
+            'path': c.path or '/',
+            'expires': c.expires if c.expires else -1,
+            'httpOnly': bool(c.has_nonstandard_attr('HttpOnly')),
+            'secure': bool(c.secure),
+            'sameSite': 'None' if c.secure else 'Lax'
+        })
+    return cookies
+
+
+class CookieStore:
+    """cookies.json with baseline tracking and locked, atomic write-back"""
+
+    def __init__(self, cookies_file):
+        self.cookies_file = Path(cookies_file)
+        self.lock_file = self.cookies_file.with_name(self.cookies_file.name + '.lock')
+        self.baseline = {}
+
+    @contextmanager
+    def locked(self):
+        """Exclusive advisory lock shared by every process using this file"""
+        self.lock_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_file, 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read(self):
+        if not self.cookies_file.exists():
+            return []
+        return serialization.load(self.cookies_file)
+
+    def _write(self, cookies):
+        """Write to a temp file in the same directory, then rename over the original"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cookies_file.parent, prefix='.cookies-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(serialization.dumps(cookies, serialization.PRETTY))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.cookies_file)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    def load(self):
+        """Load cookies and remember them as the baseline for write_back"""
+        with self.locked():
+            cookies = self._read()
+        self.baseline = {cookie_key(c): c for c in cookies}
+        return cookies
+
+    def write_back(self, jar):
+        """Persist cookies Epic refreshed during this run
+
+        Merge rules per cookie, comparing against the baseline we loaded:
+        - unchanged by us: keep whatever is on disk
+        - changed by us, untouched on disk: take ours
+        - changed by both (another process refreshed it too): keep the one
+          that expires later, ours on a tie
+
+        Returns the number of cookies updated on disk.
+        """
+        ours = {cookie_key(c): c for c in cookies_from_jar(jar)}
+
+        # Cookies loaded into the session carry no expiry, so only a
+        # Set-Cookie from Epic gives the jar one of its own
+        changed = {}
+        for key, cookie in ours.items():
+            base = self.baseline.get(key)
+            if not base or base.get('value') != cookie['value']:
+                changed[key] = cookie
+            elif cookie['expires'] != -1 and int(base.get('expires', -1)) != int(cookie['expires']):
+                changed[key] = cookie
+
+        # Cookies Epic expired (Max-Age=0) disappear from the jar
+        removed = [key for key in self.baseline if key not in ours]
+
+        if not changed and not removed:
+            return 0
+
+        with self.locked():
+            on_disk = {cookie_key(c): c for c in self._read()}
+            updated = 0
+
+            for key, cookie in changed.items():
+                base = self.baseline.get(key)
+                current = on_disk.get(key)
+
+                if current and base and current.get('value') != base.get('value'):
+                    if self._expiry(current) > self._expiry(cookie):
+                        continue
+
+                # Keep attributes the jar does not round-trip (httpOnly, sameSite)
+                merged = dict(current or base or cookie)
+                merged['value'] = cookie['value']
+                if cookie['expires'] != -1:
+                    merged['expires'] = cookie['expires']
+                on_disk[key] = merged
+                updated += 1
+
+            now = time.time()
+            for key in removed:
+                current = on_disk.get(key)
+                base = self.baseline[key]
+                expired = 0 < base.get('expires', -1) < now
+                if current and current.get('value') == base.get('value') and expired:
+                    del on_disk[key]
+                    updated += 1
+
+            if updated:
+                self._write(list(on_disk.values()))
+
+        self.baseline = on_disk
+        return updated
+
+    @staticmethod
+    def _expiry(cookie):
+        expires = cookie.get('expires', -1)
+        return float('inf') if expires is None or expires < 0 else expires
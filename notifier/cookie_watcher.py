@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Cookie Watcher - Change-triggered cookie refresh
+- Watches browser cookie databases and claimer/data/cookies.json
+- Uses inotify on Linux, falls back to mtime polling elsewhere
+- Re-extracts only when a browser store actually changed (debounced)
+- Signals running notifier/claimer processes to hot-reload their session;
+  they apply it at their next request, never inside the signal handler
+"""
+import os
+import sys
+import time
+import errno
+import atexit
+import signal
+import struct
+import ctypes
+import threading
+import subprocess
+import ctypes.util
+from pathlib import Path
+
+RELOAD_DIR = Path(__file__).parent.parent / 'claimer' / 'data' / 'reload.d'
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def related_files(path):
+    """A SQLite database plus the journal/WAL files that change with it"""
+    path = Path(path)
+    return [path] + [path.with_name(path.name + suffix) for suffix in ('-journal', '-wal')]
+
+
+class InotifyWatcher:
+    """Linux inotify watcher on the parent directories of the watched files"""
+
+    def __init__(self, paths):
+        libc_name = ctypes.util.find_library('c')
+        if not sys.platform.startswith('linux') or not libc_name:
+            raise OSError("inotify is only available on Linux")
+
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.paths = {Path(p) for p in paths}
+        self.dirs = {}
+        for directory in {p.parent for p in self.paths}:
+            if not directory.exists():
+                continue
+            wd = self.libc.inotify_add_watch(self.fd, str(directory).encode(), WATCH_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed: {directory}")
+            self.dirs[wd] = directory
+
+    def wait(self, timeout):
+        """Return the set of watched paths changed within `timeout` seconds"""
+        import select
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return set()
+            raise
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode(errors='replace')
+            offset += length
+
+            path = self.dirs.get(wd, Path('.')) / name
+            if path in self.paths:
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Portable fallback: compare (mtime, size) of each file every interval"""
+
+    def __init__(self, paths, interval=2.0):
+        self.paths = [Path(p) for p in paths]
+        self.interval = interval
+        self.state = {p: self._stat(p) for p in self.paths}
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = path.stat()
+            return st.st_mtime_ns, st.st_size
+        except FileNotFoundError:
+            return None
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        changed = set()
+        for path in self.paths:
+            current = self._stat(path)
+            if current != self.state[path]:
+                self.state[path] = current
+                changed.add(path)
+        return changed
+
+    def close(self):
+        pass
+
+
+def create_watcher(paths, interval=2.0):
+    """inotify when possible, polling otherwise"""
+    try:
+        return InotifyWatcher(paths)
+    except (OSError, AttributeError):
+        return PollingWatcher(paths, interval)
+
+
+# Set by the SIGHUP handler (a plain flag: nothing else is safe there),
+# applied by reload_if_requested() at the next request
+_reload_requested = False
+_reload_callbacks = []
+_reload_lock = threading.Lock()
+_pid_files = {}
+
+
+def process_start(pid):
+    """Start-time token of a running process (None if it is gone), to tell a reused pid apart"""
+    try:
+        with open(f"/proc/{pid}/stat", 'rb') as f:
+            # Fields after the parenthesized command name; starttime is field 22
+            return f.read().rsplit(b')', 1)[1].split()[19].decode()
+    except FileNotFoundError:
+        return None
+    except OSError:
+        pass
+    try:
+        output = subprocess.run(['ps', '-o', 'lstart=', '-p', str(pid)], capture_output=True,
+                                text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return ' '.join(output.split()) or None
+
+
+def register_reload(callback, name='process'):
+    """Register this process for hot-reload signals from the watcher
+
+    Writes a pid file (pid and process start time) under claimer/data/reload.d,
+    removed at exit. SIGHUP only flags a reload; `callback` runs at the next
+    request (see reload_if_requested), never in the middle of one. Returns
+    False where SIGHUP is not available, or off the main thread (signal
+    handlers can only be set there; the resident service registers once for
+    all its accounts).
+    """
+    if not hasattr(signal, 'SIGHUP') or threading.current_thread() is not threading.main_thread():
+        return False
+
+    with _reload_lock:
+        if callback not in _reload_callbacks:
+            _reload_callbacks.append(callback)
+
+    if name not in _pid_files:
+        RELOAD_DIR.mkdir(parents=True, exist_ok=True)
+        pid_file = _pid_files[name] = RELOAD_DIR / f"{name}-{os.getpid()}.pid"
+        pid_file.write_text(f"{os.getpid()} {process_start(os.getpid()) or ''}".strip())
+        atexit.register(pid_file.unlink, missing_ok=True)
+
+    def request_reload(signum, frame):
+        global _reload_requested
+        _reload_requested = True
+
+    signal.signal(signal.SIGHUP, request_reload)
+    return True
+
+
+def reload_if_requested():
+    """Run the registered reload callbacks if a SIGHUP arrived; called before each request"""
+    global _reload_requested
+    if not _reload_requested:
+        return False
+    with _reload_lock:
+        if not _reload_requested:
+            return False
+        _reload_requested = False
+        callbacks = list(_reload_callbacks)
+    for callback in callbacks:
+        callback()
+    return True
+
+
+def notify_reload():
+    """Send SIGHUP to every registered process; drop stale pid files
+
+    A pid file is only trusted while the pid still belongs to the process
+    that wrote it (same start time); a reused pid is never signalled.
+    """
+    notified = 0
+    if not RELOAD_DIR.exists() or not hasattr(signal, 'SIGHUP'):
+        return notified
+
+    for pid_file in RELOAD_DIR.glob('*.pid'):
+        try:
+            pid, _, started = pid_file.read_text().strip().partition(' ')
+            pid = int(pid)
+        except (ValueError, OSError):
+            pid_file.unlink(missing_ok=True)
+            continue
+        if not started or process_start(pid) != started:
+            pid_file.unlink(missing_ok=True)
+            continue
+        try:
+            os.kill(pid, signal.SIGHUP)
+            notified += 1
+        except ProcessLookupError:
+            pid_file.unlink(missing_ok=True)
+        except PermissionError:
+            pass
+
+    return notified
+
+
+class CookieWatcher:
+    """Re-extract cookies only when a browser cookie store changes"""
+
+    def __init__(self, manager, debounce=5.0, interval=2.0):
+        self.manager = manager
+        self.debounce = debounce
+
+        # Map each watched file back to the browser (None = cookies.json)
+        self.owners = {}
+        for browser, db_path in manager.browser_paths.items():
+            if db_path and Path(db_path).exists():
+                for path in related_files(db_path):
+                    self.owners[path] = browser
+        self.owners[Path(manager.cookies_file)] = None
+
+        self.watcher = create_watcher(self.owners.keys(), interval)
+        self.last_notified = PollingWatcher._stat(Path(manager.cookies_file))
+
+    def _collect(self):
+        """Block for the first change, then keep collecting until quiet for `debounce`"""
+        changed = set()
+        while not changed:
+            changed = self.watcher.wait(60)
+
+        quiet_since = time.monotonic()
+        while time.monotonic() - quiet_since < self.debounce:
+            more = self.watcher.wait(self.debounce)
+            if more:
+                changed |= more
+                quiet_since = time.monotonic()
+        return changed
+
+    def refresh_from(self, browser):
+        """Re-extract from one browser; save only when the cookies differ"""
+        try:
+            cookies = self.manager.extract_from_browser(browser)
+        except Exception as e:
+            print(f"   ❌ Error with {browser.title()}: {e}")
+            return False
+
+        valid, message = self.manager.validate_cookies(cookies)
+        if not valid:
+            print(f"   ⚠️  Invalid cookies from {browser.title()}: {message}")
+            return False
+
+        current = self.manager.load_cookies() or []
+        key = lambda c: (c.get('domain'), c['name'], c.get('path'), c['value'])
+        if sorted(map(key, cookies)) == sorted(map(key, current)):
+            print(f"   ⏭️  {browser.title()} changed but Epic cookies are identical")
+            return False
+
+        self.manager.backup_cookies()
+        self.manager.save_cookies(cookies)
+        return True
+
+    def run(self):
+        watcher_type = type(self.watcher).__name__
+        print(f"👀 Watching {len(self.owners)} files ({watcher_type}, debounce {self.debounce:.0f}s)")
+
+        try:
+            while True:
+                changed = self._collect()
+                browsers = {self.owners[p] for p in changed if self.owners.get(p)}
+                cookies_changed = Path(self.manager.cookies_file) in changed
+
+                for browser in sorted(browsers):
+                    print(f"\n🔄 {browser.title()} cookie store changed, re-extracting...")
+                    if self.refresh_from(browser):
+                        cookies_changed = True
+                        break
+
+                # Our own save shows up as a cookies.json event next round
+                stat = PollingWatcher._stat(Path(self.manager.cookies_file))
+                if cookies_changed and stat != self.last_notified:
+                    self.last_notified = stat
+                    notified = notify_reload()
+                    print(f"   📣 Cookies updated, notified {notified} running process(es)")
+        except KeyboardInterrupt:
+            print("\n👋 Watcher stopped")
+        finally:
+            self.watcher.close()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Credential Scheduler - Refresh cookies ahead of expiry, spread out over time
+- Keeps an expiry calendar of every account's critical cookies
+- Plans each refresh well before the earliest expiry
+- Keeps refreshes apart and out of the window before the weekly promotion rollover
+"""
+import os
+import time
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+from accounts import DATA_DIR, list_accounts
+import serialization
+
+CRITICAL_COOKIES = ('EPIC_SSO', 'EPIC_BEARER_TOKEN', 'EPIC_EG1', 'EPIC_DEVICE')
+
+# Refresh this long before the earliest critical cookie expires
+REFRESH_LEAD = float(os.getenv('COOKIE_REFRESH_LEAD_HOURS', 48)) * 3600
+# Minimum gap between two accounts' refreshes
+REFRESH_SPACING = float(os.getenv('COOKIE_REFRESH_SPACING_MINUTES', 10)) * 60
+# Retry a failed refresh after this long
+RETRY_DELAY = 3600
+
+# Epic rotates free games on Thursdays at 15:00 UTC; keep refreshes out of
+# the hours leading up to it and shortly after
+ROLLOVER_WEEKDAY = 3
+ROLLOVER_HOUR_UTC = int(os.getenv('EPIC_ROLLOVER_HOUR_UTC', 15))
+BLACKOUT_BEFORE = 6 * 3600
+BLACKOUT_AFTER = 2 * 3600
+
+CALENDAR_FILE = DATA_DIR / 'refresh_calendar.json'
+
+
+def next_rollover(after):
+    """Epoch seconds of the first promotion rollover after `after`"""
+    dt = datetime.fromtimestamp(after, timezone.utc)
+    rollover = dt.replace(hour=ROLLOVER_HOUR_UTC, minute=0, second=0, microsecond=0)
+    rollover += timedelta(days=(ROLLOVER_WEEKDAY - dt.weekday()) % 7)
+    if rollover.timestamp() <= after - BLACKOUT_AFTER:
+        rollover += timedelta(days=7)
+    return rollover.timestamp()
+
+
+def avoid_blackout(ts):
+    """Move a refresh that lands near a rollover to before the blackout starts"""
+    rollover = next_rollover(ts)
+    if rollover - BLACKOUT_BEFORE <= ts <= rollover + BLACKOUT_AFTER:
+        return rollover - BLACKOUT_BEFORE
+    return ts
+
+
+def jitter(name, span):
+    """Stable per-account offset in [0, span) so accounts don't line up"""
+    digest = hashlib.sha256(name.encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'big') / 2 ** 32 * span
+
+
+def cookie_expiries(cookies):
+    """{cookie name: expires} for the critical cookies that have an expiry"""
+    expiries = {}
+    for cookie in cookies:
+        if cookie.get('name') in CRITICAL_COOKIES and cookie.get('expires', -1) > 0:
+            expiries[cookie['name']] = cookie['expires']
+    return expiries
+
+
+class CredentialScheduler:
+    """Expiry calendar + spread-out refresh plan for all accounts"""
+
+    def __init__(self, accounts=None, calendar_file=CALENDAR_FILE):
+        self.accounts = accounts
+        self.calendar_file = calendar_file
+        self.state = self._load_state()
+
+    def _load_state(self):
+        """Last refresh attempts per account (for retry backoff)"""
+        if not self.calendar_file.exists():
+            return {}
+        try:
+            return serialization.load(self.calendar_file).get('attempts', {})
+        except Exception:
+            return {}
+
+    def build_calendar(self, now=None):
+        """One entry per account: earliest critical expiry and the planned refresh time"""
+        now = now or time.time()
+        calendar = []
+
+        for account in self.accounts or list_accounts():
+            try:
+                cookies = serialization.load(account.cookies_file)
+            except Exception:
+                cookies = []
+
+            expiries = cookie_expiries(cookies)
+            missing = [name for name in ('EPIC_SSO', 'EPIC_BEARER_TOKEN')
+                       if name not in {c.get('name') for c in cookies}]
+
+            if missing or not expiries:
+                # Nothing to plan against: refresh as soon as possible
+                earliest, cookie_name, refresh_at = now, (missing or ['?'])[0], now
+            else:
+                cookie_name = min(expiries, key=expiries.get)
+                earliest = expiries[cookie_name]
+                refresh_at = earliest - REFRESH_LEAD - jitter(account.name, REFRESH_LEAD / 4)
+
+            # Never hammer the browser for the same account: wait RETRY_DELAY
+            # after any attempt (a successful one may not have moved the expiry)
+            attempt = self.state.get(account.name, {})
+            refresh_at = max(refresh_at, attempt.get('at', 0) + RETRY_DELAY)
+
+            calendar.append({
+                'account': account,
+                'cookie': cookie_name,
+                'expires': earliest,
+                'refresh_at': max(now, avoid_blackout(refresh_at)),
+            })
+
+        last_attempt = max((a.get('at', 0) for a in self.state.values()), default=0)
+        return self.spread(calendar, max(now, last_attempt + REFRESH_SPACING))
+
+    @staticmethod
+    def spread(calendar, now):
+        """Keep at least REFRESH_SPACING between refreshes by moving them earlier
+
+        Walks backwards from the latest so no refresh moves past its own
+        deadline; anything pushed into the past runs now, one slot apart.
+        """
+        calendar.sort(key=lambda e: e['refresh_at'])
+        for i in range(len(calendar) - 2, -1, -1):
+            limit = calendar[i + 1]['refresh_at'] - REFRESH_SPACING
+            if calendar[i]['refresh_at'] > limit:
+                calendar[i]['refresh_at'] = avoid_blackout(limit)
+
+        slot = now
+        for entry in calendar:
+            if entry['refresh_at'] <= now:
+                entry['refresh_at'] = slot
+                slot += REFRESH_SPACING
+        calendar.sort(key=lambda e: e['refresh_at'])
+        return calendar
+
+    def save(self, calendar):
+        """Persist the plan (for `cookie_manager.py calendar`) and attempt history"""
+        self.calendar_file.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            'generated_at': time.time(),
+            'entries': [
+                {
+                    'account': e['account'].name,
+                    'cookie': e['cookie'],
+                    'expires': e['expires'],
+                    'refresh_at': e['refresh_at'],
+                }
+                for e in calendar
+            ],
+            'attempts': self.state,
+        }
+        serialization.dump(self.calendar_file, data)
+
+    def run_due(self, refresh, now=None):
+        """Refresh every account whose slot has come; `refresh(account)` -> bool"""
+        now = now or time.time()
+        calendar = self.build_calendar(now)
+        refreshed = []
+
+        for entry in calendar:
+            # Only the slots due now; later entries wait for their turn
+            if entry['refresh_at'] > now:
+                break
+            account = entry['account']
+            ok = bool(refresh(account))
+            self.state[account.name] = {'at': time.time(), 'ok': ok}
+            refreshed.append((account, ok))
+
+        self.save(self.build_calendar())
+        return refreshed
+
+    def run_forever(self, refresh, max_sleep=3600):
+        """Daemon loop: sleep until the next planned refresh, then run it"""
+        while True:
+            self.run_due(refresh)
+            calendar = self.build_calendar()
+            wait = max_sleep
+            if calendar:
+                wait = min(max_sleep, max(60, calendar[0]['refresh_at'] - time.time()))
+            time.sleep(wait)
+
+    def print_calendar(self):
+        calendar = self.build_calendar()
+        if not calendar:
+            print("No accounts with cookies found")
+            return
+
+        fmt = lambda ts: datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M')
+        print(f"{'Account':<16} {'Cookie':<18} {'Expires':<17} {'Refresh at':<17}")
+        for e in calendar:
+            print(f"{e['account'].name:<16} {e['cookie']:<18} {fmt(e['expires']):<17} {fmt(e['refresh_at']):<17}")
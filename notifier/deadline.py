@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Deadline - Hard upper bound on a run's wall time
+- One Deadline per run, handed down to every HTTP call
+- Each call gets min(its usual timeout, remaining budget)
+- Non-essential stages are shed as the budget runs low:
+  enrichment first, then email formatting, then ownership
+"""
+import os
+import time
+
+RUN_DEADLINE = float(os.getenv('RUN_DEADLINE', 240))
+
+# A call is not started with less than this left
+MIN_CALL_TIMEOUT = 1.0
+
+# Stage -> fraction of the budget that must remain for it to run
+SHED_AT = {
+    'enrichment': 0.5,
+    'email_formatting': 0.3,
+    'ownership': 0.2,
+}
+
+
+class DeadlineExceeded(Exception):
+    """The run's budget is used up"""
+
+
+class Deadline:
+    """Budget for one run; Deadline(None) never expires"""
+
+    def __init__(self, seconds=RUN_DEADLINE):
+        self.budget = seconds
+        self.expires = time.monotonic() + seconds if seconds else None
+
+    @classmethod
+    def from_argv(cls, argv):
+        """--deadline SECONDS (0 disables), else RUN_DEADLINE"""
+        if '--deadline' in argv:
+            return cls(float(argv[argv.index('--deadline') + 1]))
+        return cls()
+
+    def remaining(self):
+        if self.expires is None:
+            return float('inf')
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() < MIN_CALL_TIMEOUT
+
+    def timeout(self, cap):
+        """Timeout for one call: its usual cap, shortened to the remaining budget"""
+        remaining = self.remaining()
+        if remaining < MIN_CALL_TIMEOUT:
+            raise DeadlineExceeded(f"run deadline of {self.budget:g}s exceeded")
+        return min(cap, remaining)
+
+    def allows(self, stage):
+        """Whether an optional stage still fits in the budget"""
+        if self.expires is None:
+            return True
+        return self.remaining() >= self.budget * SHED_AT[stage]
@@ -5,17 +5,21 @@ Uses Epic Games' backend API instead of browser automation
 More stable and less likely to be detected
 """
 import os
-import json
 import time
-import requests
 from datetime import datetime
 from pathlib import Path
 
+from accounts import Account, DEFAULT_ACCOUNT
+from ownership import OwnershipService
+import http_client
+import serialization
+
 class EpicGamesClaimer:
     def __init__(self):
-        self.session = requests.Session()
+        self.session = http_client.new_session()
         self.base_dir = Path(__file__).parent
-        self.cookies_file = self.base_dir / 'claimer' / 'data' / 'cookies.json'
+        self.cookies_file = Account(DEFAULT_ACCOUNT).cookies_file
+        self.ownership = OwnershipService(self.session)
 
         # Epic Games API endpoints
         self.api_endpoints = {
@@ -42,10 +46,10 @@ class EpicGamesClaimer:
             return False
 
         try:
-            with open(self.cookies_file, 'r') as f:
-                cookies = json.load(f)
+            cookies = serialization.load(self.cookies_file)
 
             # Convert cookie format and add to session
+            epic_eg1 = None
             for cookie in cookies:
                 self.session.cookies.set(
                     name=cookie['name'],
@@ -55,7 +59,16 @@ class EpicGamesClaimer:
                     secure=cookie.get('secure', True)
                 )
 
-            print(f"✅ Loaded {len(cookies)} cookies from file")
+                # Extract EPIC_EG1 for Authorization header
+                if cookie['name'] == 'EPIC_EG1':
+                    epic_eg1 = cookie['value']
+
+            # Add Authorization header if EPIC_EG1 token exists (ownership needs it)
+            if epic_eg1:
+                self.session.headers['Authorization'] = f'Bearer {epic_eg1}'
+                print(f"✅ Loaded {len(cookies)} cookies + Authorization token")
+            else:
+                print(f"✅ Loaded {len(cookies)} cookies from file (no EG1 token found)")
 
             # Check for critical authentication cookies
             critical_cookies = ['EPIC_SSO', 'EPIC_BEARER_TOKEN', 'eg-auth']
@@ -88,7 +101,7 @@ class EpicGamesClaimer:
             )
             response.raise_for_status()
 
-            data = response.json()
+            data = serialization.loads(response.content)
 
             # Parse the response to find free games
             free_games = []
@@ -164,10 +177,8 @@ class EpicGamesClaimer:
             return []
 
     def check_ownership(self, namespace, offer_id):
-        """Check if user already owns the game via GraphQL API"""
-        # This would require reverse-engineering the GraphQL query
-        # For now, we'll skip ownership check and attempt to claim all
-        return False
+        """Check if user already owns the game (shared, cached entitlements)"""
+        return self.ownership.is_owned({'namespace': namespace, 'id': offer_id}) is True
 
     def claim_game_api(self, game):
         """
@@ -213,6 +224,10 @@ class EpicGamesClaimer:
         failed = 0
 
         for game in free_games:
+            if self.check_ownership(game['namespace'], game['id']):
+                print(f"\n✅ Already owned: {game['title']}")
+                continue
+
             if self.claim_game_api(game):
                 claimed += 1
             else:
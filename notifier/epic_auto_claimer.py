@@ -5,26 +5,42 @@ Uses reverse-engineered API to automatically claim free games
 """
 import os
 import sys
-import json
 import time
 import random
 import hashlib
-import requests
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 from urllib.parse import urlencode
 
+from cookie_store import CookieStore
+from cookie_watcher import register_reload
+from promotion_snapshot import SnapshotStore
+import claim_journal
+from claim_journal import ClaimJournal
+from rate_limiter import RateLimiter
+from claim_methods import ClaimMethodStats
+from ownership import OwnershipService
+from offer_index import offer_items
+import http_client
+from deadline import Deadline, DeadlineExceeded
+from accounts import Account
+from leases import AccountLease, LeaseLost
+import serialization
+
 class EpicGamesAPI:
     """Epic Games API client with anti-detection measures"""
 
-    def __init__(self, cookies_file='claimer/data/cookies.json'):
+    def __init__(self, cookies_file='claimer/data/cookies.json', account='default'):
         self.base_dir = Path(__file__).parent
-        self.cookies_file = self.base_dir / cookies_file
-        self.session = requests.Session()
+        self.project_dir = self.base_dir.parent
+        self.cookies_file = self.project_dir / cookies_file
+        self.cookie_store = CookieStore(self.cookies_file)
+        self.session = http_client.new_session()
 
         # API endpoints (discovered through network analysis)
         self.endpoints = {
-            'free_games': 'https://store-site-backend-static-ipv4.ak.epicgames.com/freeGamesPromotions',
+            'free_games': http_client.PROMOTIONS_URL,
             'graphql': 'https://graphql.epicgames.com/graphql',
             'library': 'https://library-service.live.use1a.on.epicgames.com/library/api/public/items',
             'order_preview': 'https://payment-website-pci.ol.epicgames.com/purchase/order-preview',
@@ -38,8 +54,31 @@ class EpicGamesAPI:
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36',
         ]
 
+        # Run budget (set by AutoClaimer); every request's timeout comes from it
+        self.deadline = Deadline(None)
+
+        # Bulk, cached ownership shared with the notifier
+        self.ownership = OwnershipService(self.session, account)
+
+        # Write-ahead claim journal (set by AutoClaimer); None disables it
+        self.journal = None
+        # Per-method success memory (set by AutoClaimer); None keeps the fixed order
+        self.method_stats = None
+        # Account lease of the current run (set by AutoClaimer/Orchestrator); checked before every claim step
+        self.lease = None
+
         self._setup_session()
 
+    def _check_lease(self):
+        """Stop before a claim step once another run has taken the account over"""
+        if self.lease:
+            self.lease.check()
+
+    def _record(self, offer_id, step, status, **extra):
+        """Append a step to the claim journal, if one is attached"""
+        if self.journal:
+            self.journal.record(offer_id, step, status, **extra)
+
     def _setup_session(self):
         """Setup session with anti-detection headers"""
         # Rotate user agent
@@ -65,8 +104,7 @@ class EpicGamesAPI:
         if not self.cookies_file.exists():
             raise FileNotFoundError(f"Cookie file not found: {self.cookies_file}")
 
-        with open(self.cookies_file, 'r') as f:
-            cookies = json.load(f)
+        cookies = self.cookie_store.load()
 
         # Add cookies to session
         for cookie in cookies:
@@ -92,10 +130,20 @@ class EpicGamesAPI:
 
         return True
 
+    def reload_cookies(self):
+        """Rebuild session credentials from the cookie file"""
+        self.session.cookies.clear()
+        self.session.headers.pop('Authorization', None)
+        return self.load_cookies()
+
+    def save_cookies(self):
+        """Write cookies Epic refreshed during this session back to the cookie file"""
+        return self.cookie_store.write_back(self.session.cookies)
+
     def random_delay(self, min_sec=1, max_sec=3):
         """Add random delay to mimic human behavior"""
         delay = random.uniform(min_sec, max_sec)
-        time.sleep(delay)
+        time.sleep(min(delay, self.deadline.remaining()))
 
     def get_account_info(self):
         """Get current account information via GraphQL"""
@@ -115,11 +163,11 @@ class EpicGamesAPI:
             response = self.session.post(
                 self.endpoints['graphql'],
                 json={'query': query},
-                timeout=30
+                timeout=self.deadline.timeout(30)
             )
 
             if response.status_code == 200:
-                data = response.json()
+                data = serialization.loads(response.content)
                 user_info = data.get('data', {}).get('Launcher', {}).get('userInfo', {})
                 return user_info
             else:
@@ -135,21 +183,25 @@ class EpicGamesAPI:
         try:
             self.random_delay(0.5, 1.5)
 
-            response = self.session.get(
-                self.endpoints['free_games'],
+            data = http_client.fetch_promotions_json(
+                self.session,
                 params={
                     'locale': 'zh-CN',
                     'country': 'CN',
                     'allowCountries': 'CN'
                 },
-                timeout=30
+                timeout=self.deadline.timeout(30),
+                deadline=self.deadline
             )
+            return self.parse_free_games(data)
 
-            if response.status_code != 200:
-                print(f"❌ Failed to fetch games: HTTP {response.status_code}")
-                return []
+        except Exception as e:
+            print(f"❌ Error fetching free games: {e}")
+            return []
 
-            data = response.json()
+    def parse_free_games(self, data):
+        """Currently free games from a promotions payload"""
+        try:
             elements = data.get('data', {}).get('Catalog', {}).get('searchStore', {}).get('elements', [])
 
             free_games = []
@@ -171,6 +223,8 @@ class EpicGamesAPI:
                 if discount_price != 0:
                     continue
 
+                end_date = promo_offers[0]['promotionalOffers'][0].get('endDate', '')
+
                 # Get correct URL slug - always prefer offerMappings/catalogNs
                 url_slug = None
 
@@ -195,60 +249,21 @@ class EpicGamesAPI:
                     'title': game.get('title'),
                     'description': game.get('description', ''),
                     'offerType': game.get('offerType'),
+                    'items': offer_items(game),
                     'url_slug': url_slug,
+                    'end_date': end_date,
                 })
 
             return free_games
 
         except Exception as e:
-            print(f"❌ Error fetching free games: {e}")
+            print(f"❌ Error parsing free games: {e}")
             return []
 
-    def check_ownership(self, namespace, offer_id):
-        """Check if user already owns the game via GraphQL"""
-        # GraphQL query to check ownership
-        query = """
-        query getOwnedGames($namespace: String!, $offerId: String!) {
-            Catalog {
-                catalogOffer(namespace: $namespace, id: $offerId, locale: "zh-CN") {
-                    id
-                    namespace
-                    title
-                    ownedInformation {
-                        owned
-                        quantity
-                    }
-                }
-            }
-        }
-        """
-
-        try:
-            self.random_delay(0.5, 1.0)
-
-            response = self.session.post(
-                self.endpoints['graphql'],
-                json={
-                    'query': query,
-                    'variables': {
-                        'namespace': namespace,
-                        'offerId': offer_id
-                    }
-                },
-                timeout=30
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                offer = data.get('data', {}).get('Catalog', {}).get('catalogOffer', {})
-                owned_info = offer.get('ownedInformation', {})
-                return owned_info.get('owned', False)
-
-            return None  # Unknown
-
-        except Exception as e:
-            print(f"⚠️  Error checking ownership: {e}")
-            return None
+    def check_ownership(self, namespace, offer_id, offer_type=None, items=None, live=False):
+        """Check if user already owns the game (bulk entitlements, per-offer fallback)"""
+        return self.ownership.is_owned({'namespace': namespace, 'id': offer_id,
+                                        'offerType': offer_type, 'items': items}, live)
 
     def claim_game_graphql(self, namespace, offer_id):
         """
@@ -277,20 +292,25 @@ class EpicGamesAPI:
             }]
         }
 
+        sent = False
         try:
             self.random_delay(1.5, 3.0)  # Longer delay before claim attempt
 
+            timeout = self.deadline.timeout(60)
+            self._check_lease()
+            self._record(offer_id, claim_journal.FREE_ORDER, claim_journal.SENT)
+            sent = True
             response = self.session.post(
                 self.endpoints['graphql'],
                 json={
                     'query': mutation,
                     'variables': variables
                 },
-                timeout=60
+                timeout=timeout
             )
 
             if response.status_code == 200:
-                data = response.json()
+                data = serialization.loads(response.content)
 
                 # Check for errors
                 if 'errors' in data:
@@ -315,69 +335,178 @@ class EpicGamesAPI:
             else:
                 return {'success': False, 'error': f'HTTP {response.status_code}', 'body': response.text}
 
+        except (DeadlineExceeded, LeaseLost):
+            raise
         except Exception as e:
+            if sent:
+                # Timeout/reset after sending: the order may have been placed
+                return {'success': False, 'error': str(e), 'in_doubt': claim_journal.FREE_ORDER}
             return {'success': False, 'error': str(e)}
 
-    def claim_game_order_api(self, namespace, offer_id):
-        """
-        Alternative: Use order API (payment-website-pci)
-        This is a backup method
-        """
+    def _order_payload(self, namespace, offer_id, order_id=None):
+        return {
+            'useDefault': True,
+            'setDefault': False,
+            'namespace': namespace,
+            'country': 'CN',
+            'countryName': 'China',
+            'orderId': order_id or None,
+            'orderComplete': False,
+            'orderError': None,
+            'orderPending': False,
+            'offers': [offer_id],
+            'includeAccountBalance': False
+        }
+
+    def order_preview(self, namespace, offer_id):
+        """Order API step 1: create the order preview"""
+        timeout = self.deadline.timeout(30)
+        self._check_lease()
+        self._record(offer_id, claim_journal.PREVIEW, claim_journal.SENT)
+
+        preview_response = self.session.post(
+            self.endpoints['order_preview'],
+            json=self._order_payload(namespace, offer_id),
+            timeout=timeout
+        )
+
+        if preview_response.status_code != 200:
+            self._record(offer_id, claim_journal.PREVIEW, claim_journal.FAILED,
+                         error=f'HTTP {preview_response.status_code}')
+            return {'success': False, 'error': f'Preview failed: {preview_response.status_code}'}
+
         try:
-            # Step 1: Create order preview
-            self.random_delay(1.0, 2.0)
-
-            preview_payload = {
-                'useDefault': True,
-                'setDefault': False,
-                'namespace': namespace,
-                'country': 'CN',
-                'countryName': 'China',
-                'orderId': None,
-                'orderComplete': False,
-                'orderError': None,
-                'orderPending': False,
-                'offers': [offer_id],
-                'includeAccountBalance': False
-            }
+            order_id = serialization.loads(preview_response.content).get('orderId')
+        except ValueError:
+            order_id = None
 
-            preview_response = self.session.post(
-                self.endpoints['order_preview'],
-                json=preview_payload,
-                timeout=30
-            )
+        self._record(offer_id, claim_journal.PREVIEW, claim_journal.OK, order_id=order_id)
+        return {'success': True, 'order_id': order_id}
 
-            if preview_response.status_code != 200:
-                return {'success': False, 'error': f'Preview failed: {preview_response.status_code}'}
+    def order_confirm(self, namespace, offer_id, order_id=None):
+        """Order API step 2: confirm the previewed order
 
-            # Step 2: Confirm order
-            self.random_delay(1.5, 2.5)
+        The intent is journaled before sending, so an interrupted run knows
+        this confirm may already have been placed.
+        """
+        confirm_payload = self._order_payload(namespace, offer_id, order_id)
+        confirm_payload['orderComplete'] = True
 
-            confirm_payload = preview_payload.copy()
-            confirm_payload['orderComplete'] = True
+        # Out of budget raises here, before the confirm is journaled as sent
+        timeout = self.deadline.timeout(60)
+        self._check_lease()
+        self._record(offer_id, claim_journal.CONFIRM, claim_journal.SENT, order_id=order_id)
 
+        try:
             confirm_response = self.session.post(
                 self.endpoints['order_confirm'],
                 json=confirm_payload,
-                timeout=60
+                timeout=timeout
             )
+        except Exception as e:
+            # No response: the confirm may have landed, so it stays in doubt (never FAILED)
+            return {'success': False, 'error': f'Confirm outcome unknown: {e}', 'in_doubt': claim_journal.CONFIRM}
+
+        if confirm_response.status_code == 200:
+            try:
+                result = serialization.loads(confirm_response.content)
+            except ValueError:
+                result = None
+            self._record(offer_id, claim_journal.CONFIRM, claim_journal.OK,
+                         order_id=result.get('orderId', order_id) if isinstance(result, dict) else order_id)
+            return {
+                'success': True,
+                'method': 'order_api',
+                'data': result
+            }
 
-            if confirm_response.status_code == 200:
-                result = confirm_response.json()
-                return {
-                    'success': True,
-                    'method': 'order_api',
-                    'data': result
-                }
-            else:
-                return {'success': False, 'error': f'Confirm failed: {confirm_response.status_code}'}
+        self._record(offer_id, claim_journal.CONFIRM, claim_journal.FAILED,
+                     error=f'HTTP {confirm_response.status_code}')
+        return {'success': False, 'error': f'Confirm failed: {confirm_response.status_code}'}
 
+    def claim_game_order_api(self, namespace, offer_id, order_id=None):
+        """
+        Alternative: Use order API (payment-website-pci)
+        This is a backup method. Pass order_id to resume at the confirm step.
+        """
+        try:
+            if order_id is None:
+                # Step 1: Create order preview
+                self.random_delay(1.0, 2.0)
+                preview = self.order_preview(namespace, offer_id)
+                if not preview.get('success'):
+                    return preview
+                order_id = preview.get('order_id')
+
+            # Step 2: Confirm order
+            self.random_delay(1.5, 2.5)
+            return self.order_confirm(namespace, offer_id, order_id)
+
+        except (DeadlineExceeded, LeaseLost):
+            raise
         except Exception as e:
+            # Only the preview can get here (order_confirm reports its own in-doubt outcome)
             return {'success': False, 'error': str(e)}
 
+    # Claim methods in default preference order
+    CLAIM_METHODS = {
+        'graphql': 'GraphQL Mutation',
+        'order_api': 'Order API',
+    }
+
+    def prepare_claim(self, game):
+        """Journal and ownership checks that come before any claim request
+
+        Returns (result, resume_order_id, skip_graphql); a non-None result
+        means the game needs no claim request this run.
+        """
+        namespace = game['namespace']
+        offer_id = game['id']
+        journal = self.journal
+
+        if journal and journal.is_done(offer_id):
+            print(f"   ✅ {game['title']}: already claimed in a previous run (journal)")
+            return {'success': True, 'status': 'already_claimed'}, None, False
+
+        in_doubt = journal.in_doubt(offer_id) if journal else None
+        resume_order_id = journal.preview_order_id(offer_id) if journal else None
+        skip_graphql = bool(journal and journal.failed(offer_id, claim_journal.FREE_ORDER))
+
+        # Check if already owned (shed when the run budget is low). An in-doubt
+        # request is only resent on a live answer, never on a cached one
+        if self.deadline.allows('ownership'):
+            owned = self.check_ownership(namespace, offer_id, game.get('offerType'), game.get('items'),
+                                         live=bool(in_doubt))
+            self._record(offer_id, claim_journal.OWNERSHIP, claim_journal.OK, owned=owned)
+        else:
+            owned = None
+        if owned is True:
+            print(f"   ✅ {game['title']}: already owned")
+            self._record(offer_id, claim_journal.DONE, claim_journal.OK, result='already_owned')
+            return {'success': True, 'status': 'already_owned'}, None, False
+        elif owned is False:
+            print(f"   🆕 {game['title']}: not owned, proceeding to claim...")
+        else:
+            print(f"   ❓ {game['title']}: ownership unknown, attempting claim anyway...")
+
+        # An interrupted run may already have placed the order: only retry
+        # once ownership says it did not go through
+        if in_doubt and owned is not False:
+            print(f"   ⏸️  Previous {in_doubt} request has no recorded outcome, not resending")
+            return {'success': False, 'error': f'Outcome of interrupted {in_doubt} unknown', 'in_doubt': in_doubt}, None, False
+
+        if in_doubt:
+            # Ownership says it did not go through: resolve the step before retrying
+            self._record(offer_id, in_doubt, claim_journal.FAILED, error='not owned after interrupted request')
+        if in_doubt == claim_journal.CONFIRM:
+            resume_order_id = None
+
+        return None, resume_order_id, skip_graphql
+
     def claim_game(self, game):
         """
         Main claim function - tries multiple methods
+        Resumes from the claim journal when a previous run was interrupted
         """
         namespace = game['namespace']
         offer_id = game['id']
@@ -387,60 +516,223 @@ class EpicGamesAPI:
         print(f"   Namespace: {namespace}")
         print(f"   Offer ID: {offer_id}")
 
-        # Check if already owned
-        owned = self.check_ownership(namespace, offer_id)
-        if owned is True:
-            print(f"   ✅ Already owned")
-            return {'success': True, 'status': 'already_owned'}
-        elif owned is False:
-            print(f"   🆕 Not owned, proceeding to claim...")
-        else:
-            print(f"   ❓ Ownership unknown, attempting claim anyway...")
+        result, resume_order_id, skip_graphql = self.prepare_claim(game)
+        if result is not None:
+            return result
 
-        # Method 1: Try GraphQL mutation (most likely to work)
-        print(f"   📡 Method 1: GraphQL Mutation...")
-        result = self.claim_game_graphql(namespace, offer_id)
+        if resume_order_id is not None:
+            print(f"   ⏩ Resuming at order confirm (previewed in an interrupted run)")
+            methods = ['order_api']
+        else:
+            methods = list(self.CLAIM_METHODS)
+            if skip_graphql:
+                print(f"   ⏩ GraphQL already failed in the interrupted run, skipping")
+                methods.remove('graphql')
+            if self.method_stats:
+                planned = self.method_stats.plan(methods, namespace, game.get('offerType'))
+                for method in methods:
+                    if method not in planned:
+                        print(f"   ⏭️  Skipping {self.CLAIM_METHODS[method]} (keeps failing for this account)")
+                methods = planned
+
+        for i, method in enumerate(methods, 1):
+            if self.deadline.expired:
+                # Leave the attempt open so the next run resumes where this one stopped
+                print(f"   ⏳ Run deadline reached, leaving the rest for the next run")
+                return {'success': False, 'error': 'Run deadline exceeded'}
+            print(f"   📡 Method {i}: {self.CLAIM_METHODS[method]}...")
+
+            try:
+                if method == 'graphql':
+                    result = self.claim_game_graphql(namespace, offer_id)
+                    if result.get('success'):
+                        self._record(offer_id, claim_journal.FREE_ORDER, claim_journal.OK, order_id=result.get('order_id'))
+                    elif not result.get('in_doubt'):
+                        self._record(offer_id, claim_journal.FREE_ORDER, claim_journal.FAILED, error=result.get('error'))
+                else:
+                    result = self.claim_game_order_api(namespace, offer_id, resume_order_id)
+            except DeadlineExceeded:
+                print(f"   ⏳ Run deadline reached, leaving the rest for the next run")
+                return {'success': False, 'error': 'Run deadline exceeded'}
 
-        if result.get('success'):
-            print(f"   ✅ Claimed successfully via GraphQL!")
-            print(f"      Order ID: {result.get('order_id')}")
-            print(f"      State: {result.get('state')}")
-            return result
+            if result.get('in_doubt'):
+                # Trying another method could claim twice: stop, and let a later run check ownership
+                print(f"   ⏸️  {self.CLAIM_METHODS[method]}: {result.get('error')} - left in doubt, not retrying")
+                return result
 
-        print(f"   ❌ GraphQL method failed: {result.get('error')}")
+            self.record_method_outcome(method, game, result)
 
-        # Method 2: Try Order API (backup)
-        print(f"   📡 Method 2: Order API...")
-        result = self.claim_game_order_api(namespace, offer_id)
+            if result.get('success'):
+                self._record(offer_id, claim_journal.DONE, claim_journal.OK, result='claimed', method=method)
+                self.ownership.record_claim(game)
+                print(f"   ✅ Claimed successfully via {self.CLAIM_METHODS[method]}!")
+                if result.get('order_id'):
+                    print(f"      Order ID: {result.get('order_id')}")
+                    print(f"      State: {result.get('state')}")
+                return result
+
+            print(f"   ❌ {self.CLAIM_METHODS[method]} method failed: {result.get('error')}")
+
+        # All methods failed: close this attempt so the next run starts fresh
+        self._close_failed(offer_id, result.get('error'))
+        return {'success': False, 'error': 'All claim methods failed', 'details': result}
 
-        if result.get('success'):
-            print(f"   ✅ Claimed successfully via Order API!")
-            return result
+    def _close_failed(self, offer_id, error):
+        """Close a failed attempt (DONE FAILED), unless a step of it is still in doubt"""
+        if self.journal and self.journal.in_doubt(offer_id):
+            return False
+        self._record(offer_id, claim_journal.DONE, claim_journal.FAILED, error=error)
+        return True
 
-        print(f"   ❌ Order API method failed: {result.get('error')}")
+    def record_method_outcome(self, method, game, result):
+        """Feed a claim outcome into the per-method success memory"""
+        if self.method_stats:
+            self.method_stats.record(method, game['namespace'], game.get('offerType'), bool(result.get('success')))
 
-        # Both methods failed
-        return {'success': False, 'error': 'All claim methods failed', 'details': result}
+    def claim_games_pipelined(self, games, limiter=None, max_workers=4):
+        """
+        Two-phase order API claiming overlapped across games
+        - Previews for every pending offer go out at once (paced by the limiter)
+        - Each confirm is sent as soon as its own preview returns
+        Returns ({offer_id: result}, metrics)
+        """
+        limiter = limiter or RateLimiter(rate=1.0, burst=2)
+        preview = limiter.wrap(self.order_preview)
+        confirm = limiter.wrap(self.order_confirm)
+
+        start = time.monotonic()
+        results = {}
+        claim_times = []
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            prepared = list(executor.map(limiter.wrap(self.prepare_claim), games))
+
+            in_flight = {}
+            for game, (result, resume_order_id, _) in zip(games, prepared):
+                if result is not None:
+                    results[game['id']] = result
+                elif resume_order_id is not None:
+                    future = executor.submit(confirm, game['namespace'], game['id'], resume_order_id)
+                    in_flight[future] = ('confirm', game)
+                else:
+                    future = executor.submit(preview, game['namespace'], game['id'])
+                    in_flight[future] = ('preview', game)
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    phase, game = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except DeadlineExceeded:
+                        # Not sent: leave the attempt open for the next run
+                        results[game['id']] = {'success': False, 'error': 'Run deadline exceeded'}
+                        continue
+                    except LeaseLost:
+                        # Another run owns the account now: send nothing more
+                        for pending in in_flight:
+                            pending.cancel()
+                        raise
+                    except Exception as e:
+                        result = {'success': False, 'error': str(e)}
+
+                    if result.get('in_doubt'):
+                        # Attempt stays open; a later run resolves it through ownership
+                        print(f"   ⏸️  {game['title']}: {result.get('error')} - left in doubt")
+                        results[game['id']] = result
+                        continue
+
+                    if phase == 'preview' and result.get('success'):
+                        future = executor.submit(confirm, game['namespace'], game['id'], result.get('order_id'))
+                        in_flight[future] = ('confirm', game)
+                        continue
+
+                    self.record_method_outcome('order_api', game, result)
+                    if result.get('success'):
+                        claim_times.append(time.monotonic() - start)
+                        self.ownership.record_claim(game)
+                        self._record(game['id'], claim_journal.DONE, claim_journal.OK,
+                                     result='claimed', method='order_api')
+                        print(f"   ✅ {game['title']}: claimed successfully via Order API!")
+                    else:
+                        self._close_failed(game['id'], result.get('error'))
+                        print(f"   ❌ {game['title']}: {phase} failed: {result.get('error')}")
+                    results[game['id']] = result
+
+        elapsed = time.monotonic() - start
+        metrics = {
+            'claimed': len(claim_times),
+            'elapsed': elapsed,
+            'time_to_last_claim': max(claim_times) if claim_times else None,
+            'throughput_per_min': len(claim_times) / elapsed * 60 if elapsed else 0,
+        }
+        return results, metrics
 
 
 class AutoClaimer:
     """Main auto-claimer orchestrator"""
 
-    def __init__(self):
-        self.api = EpicGamesAPI()
+    def __init__(self, account='default'):
+        self.account = Account(account)
+        self.api = EpicGamesAPI(self.account.cookies_file, account)
+        self.api.journal = ClaimJournal(account)
+        self.api.method_stats = ClaimMethodStats(account)
         self.log_file = Path(__file__).parent / 'auto_claim.log'
+        self.snapshots = SnapshotStore('auto_claimer' if account == 'default' else f'auto_claimer-{account}')
 
     def log(self, message):
         """Log message to console and file"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         log_msg = f"[{timestamp}] {message}"
+        if self.account.name != 'default':
+            log_msg = f"[{timestamp}] [{self.account.name}] {message}"
         print(log_msg)
 
         with open(self.log_file, 'a', encoding='utf-8') as f:
             f.write(log_msg + '\n')
 
-    def run(self):
-        """Main execution flow"""
+    def reload_cookies(self):
+        """Hot-reload cookies after the cookie watcher signals a change"""
+        self.log("🔄 Cookies changed on disk, reloading session...")
+        try:
+            self.api.reload_cookies()
+        except Exception as e:
+            self.log(f"⚠️  Failed to reload cookies: {e}")
+
+    def save_session_cookies(self):
+        """Persist Set-Cookie updates so tokens stay fresh between runs"""
+        try:
+            updated = self.api.save_cookies()
+            if updated:
+                self.log(f"💾 Saved {updated} refreshed cookie(s) back to {self.api.cookies_file.name}")
+        except Exception as e:
+            self.log(f"⚠️  Failed to write back cookies: {e}")
+
+    def run(self, force=False, pipeline=False, deadline=None):
+        """Main execution flow, bounded by the run deadline"""
+        self.api.deadline = deadline or Deadline()
+        self.api.ownership.deadline = self.api.deadline
+        self.log(f"⏳ Run deadline: {self.api.deadline.budget:g}s" if self.api.deadline.budget else "⏳ No run deadline")
+
+        # Another run (cron, manual, another node) already working on this account
+        lease = AccountLease(self.account.name, 'auto_claimer')
+        if not lease.acquire():
+            self.log(f"⏭️  Account busy: {lease.describe_blocker()}, skipping this run")
+            return True
+
+        self.api.lease = lease
+        try:
+            return self._run(force, pipeline)
+        except LeaseLost as e:
+            self.log(f"🛑 {e}: another run took over this account, stopping")
+            return False
+        finally:
+            self.api.lease = None
+            self.save_session_cookies()
+            http_client.tracker.save()
+            lease.release()
+
+    def _run(self, force=False, pipeline=False):
         self.log("=" * 70)
         self.log("Epic Games Auto Claimer - Full API Implementation")
         self.log("=" * 70)
@@ -454,13 +746,18 @@ class AutoClaimer:
             self.log("   Please run: python3 extract_cookies.py")
             return False
 
-        # Step 2: Verify account
+        register_reload(self.reload_cookies, 'auto_claimer')
+
+        # Step 2: Verify account (optional: first thing shed when the budget is low)
         self.log("\n📋 Step 2: Verifying account...")
-        account = self.api.get_account_info()
-        if account:
-            self.log(f"✅ Logged in as: {account.get('displayName')} ({account.get('email')})")
+        if self.api.deadline.allows('enrichment'):
+            account = self.api.get_account_info()
+            if account:
+                self.log(f"✅ Logged in as: {account.get('displayName')} ({account.get('email')})")
+            else:
+                self.log("⚠️  Could not verify account (may still work)")
         else:
-            self.log("⚠️  Could not verify account (may still work)")
+            self.log("⏳ Run budget low, skipping account verification")
 
         # Step 3: Get free games
         self.log("\n📋 Step 3: Fetching free games...")
@@ -474,36 +771,96 @@ class AutoClaimer:
         for game in games:
             self.log(f"   • {game['title']}")
 
+        # Only claim offers that are new or changed since the last run
+        all_games = games
+        delta = self.snapshots.diff(games)
+        if delta.is_empty() and not force:
+            self.log("\n✅ Promotions unchanged since last run, nothing to claim")
+            return True
+        if not force:
+            games = [g for g in games if g['id'] in delta.changed_ids]
+            self.log(f"🔀 Promotion changes since last run: {delta} ({len(games)} to claim)")
+            if not games:
+                # Only removals (a promotion ended): nothing to claim is not a failure
+                self.snapshots.commit(all_games)
+                self.log("\n✅ No new games to claim")
+                return True
+
+        results = self.claim(games, all_games, pipeline)
+
+        # Return success if any games were claimed
+        return len(results['claimed']) > 0 or len(results['already_owned']) > 0
+
+    def claim(self, games, all_games, pipeline=False):
+        """Claim `games`, commit the snapshot of `all_games` (minus failures), log a summary
+
+        Returns {'claimed': [titles], 'already_owned': [titles], 'failed': [{id, title, error}],
+        'claimed_ids': [offer ids], 'already_owned_ids': [offer ids]}; titles are for display,
+        two offers can share one.
+        """
         # Step 4: Claim each game
         self.log("\n📋 Step 4: Claiming games...")
 
         results = {
             'claimed': [],
             'already_owned': [],
-            'failed': []
+            'failed': [],
+            'claimed_ids': [],
+            'already_owned_ids': []
         }
 
-        for i, game in enumerate(games, 1):
-            self.log(f"\n[{i}/{len(games)}] Processing: {game['title']}")
+        start = time.monotonic()
+        claim_times = []
 
-            result = self.api.claim_game(game)
+        if pipeline:
+            self.log(f"   🚀 Pipelined mode: previews for {len(games)} game(s) in flight at once")
+            outcomes, metrics = self.api.claim_games_pipelined(games)
+        else:
+            outcomes = {}
+            for i, game in enumerate(games, 1):
+                if self.api.deadline.expired:
+                    self.log(f"\n⏳ Run deadline reached, {len(games) - i + 1} game(s) left for the next run")
+                    break
+                self.log(f"\n[{i}/{len(games)}] Processing: {game['title']}")
+
+                outcomes[game['id']] = self.api.claim_game(game)
+                if outcomes[game['id']].get('success') and not outcomes[game['id']].get('status'):
+                    claim_times.append(time.monotonic() - start)
+
+                # Anti-detection: random delay between games
+                if i < len(games):
+                    delay = random.uniform(3, 6)
+                    self.log(f"   ⏱️  Waiting {delay:.1f}s before next game...")
+                    time.sleep(min(delay, self.api.deadline.remaining()))
+
+            elapsed = time.monotonic() - start
+            metrics = {
+                'claimed': len(claim_times),
+                'elapsed': elapsed,
+                'time_to_last_claim': max(claim_times) if claim_times else None,
+                'throughput_per_min': len(claim_times) / elapsed * 60 if elapsed else 0,
+            }
 
+        for game in games:
+            result = outcomes.get(game['id'], {'success': False, 'error': 'Not attempted'})
             if result.get('success'):
-                if result.get('status') == 'already_owned':
+                if result.get('status') in ('already_owned', 'already_claimed'):
                     results['already_owned'].append(game['title'])
+                    results['already_owned_ids'].append(game['id'])
                 else:
                     results['claimed'].append(game['title'])
+                    results['claimed_ids'].append(game['id'])
             else:
                 results['failed'].append({
+                    'id': game['id'],
                     'title': game['title'],
                     'error': result.get('error')
                 })
 
-            # Anti-detection: random delay between games
-            if i < len(games):
-                delay = random.uniform(3, 6)
-                self.log(f"   ⏱️  Waiting {delay:.1f}s before next game...")
-                time.sleep(delay)
+        # Failed offers stay out of the snapshot so the next run retries them
+        self.snapshots.commit(all_games, {item['id'] for item in results['failed']})
+        self.api.journal.maybe_compact()
+        self.api.method_stats.save()
 
         # Step 5: Summary
         self.log("\n" + "=" * 70)
@@ -513,6 +870,15 @@ class AutoClaimer:
         for title in results['claimed']:
             self.log(f"   • {title}")
 
+        if metrics['claimed']:
+            self.log(f"⏱️  {metrics['claimed']} claim(s) in {metrics['elapsed']:.1f}s "
+                     f"({metrics['throughput_per_min']:.1f}/min), "
+                     f"last claim after {metrics['time_to_last_claim']:.1f}s")
+
+        fetch_stats = http_client.run_metrics().describe()
+        if fetch_stats:
+            self.log(f"📈 Promotions fetch: {fetch_stats}")
+
         if results['already_owned']:
             self.log(f"\n📦 Already owned: {len(results['already_owned'])}")
             for title in results['already_owned']:
@@ -525,13 +891,17 @@ class AutoClaimer:
 
         self.log("\n" + "=" * 70)
 
-        # Return success if any games were claimed
-        return len(results['claimed']) > 0 or len(results['already_owned']) > 0
+        return results
 
 
 def main():
-    claimer = AutoClaimer()
-    success = claimer.run()
+    account = 'default'
+    if '--account' in sys.argv:
+        account = sys.argv[sys.argv.index('--account') + 1]
+
+    claimer = AutoClaimer(account)
+    success = claimer.run(force='--force' in sys.argv, pipeline='--pipeline' in sys.argv,
+                          deadline=Deadline.from_argv(sys.argv))
     sys.exit(0 if success else 1)
 
 
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Fleet Runner - Claim for many accounts on one box
+- Accounts are sharded across a process pool (stable hash of the name)
+- Each worker process keeps one pooled HTTP adapter with per-host limits,
+  shared by all the accounts it runs
+- A worker whose shard is empty steals from the tail of the longest shard
+- A failed account is retried on a different worker; succeeded accounts
+  are never re-run
+- A worker that dies (OOM kill, segfault) has its in-flight account retried
+  or failed and its shard handed to the live workers
+- Reports per-shard throughput
+
+Usage:
+  python3 fleet.py [--workers N] [--attempts N] [--deadline SECONDS] [account ...]
+"""
+import os
+import sys
+import time
+import zlib
+import queue
+import multiprocessing
+
+from accounts import list_accounts
+
+MAX_ATTEMPTS = 2
+IDLE_POLL = 0.1
+
+
+def claim_account(name, deadline=None):
+    """Default job: one AutoClaimer run for one account"""
+    import http_client
+    from deadline import Deadline
+    from epic_auto_claimer import AutoClaimer
+
+    claimer = AutoClaimer(name)
+    http_client.use_shared_pool(claimer.api.session)
+    return claimer.run(deadline=Deadline(deadline) if deadline is not None else None)
+
+
+def shard_of(name, workers):
+    return zlib.crc32(name.encode('utf-8')) % workers
+
+
+def _next_account(worker_id, shards, lock, in_flight=None, job_no=0):
+    """(account, stolen) from this worker's shard, else stolen from the longest one
+
+    Shard entries are (account, workers that already failed it); a worker
+    never steals a retry of an account it failed itself. The pick is recorded
+    in `in_flight` under the same lock, so a worker dying right after it
+    cannot lose the account.
+    """
+    with lock:
+        own = shards[worker_id]
+        if len(own):
+            name, stolen = own.pop(0)[0], False
+        else:
+            name, stolen = None, False
+            for victim in sorted(range(len(shards)), key=lambda i: -len(shards[i])):
+                entries = list(shards[victim])
+                for index in range(len(entries) - 1, -1, -1):
+                    if worker_id not in entries[index][1]:
+                        name, stolen = shards[victim].pop(index)[0], True
+                        break
+                if name is not None:
+                    break
+        if name is not None and in_flight is not None:
+            in_flight[worker_id] = (name, job_no)
+    return name, stolen
+
+
+def _worker(worker_id, shards, lock, results, stop, job, job_args, in_flight=None):
+    job_no = 0
+    while not stop.is_set():
+        job_no += 1
+        name, stolen = _next_account(worker_id, shards, lock, in_flight, job_no)
+        if name is None:
+            time.sleep(IDLE_POLL)
+            continue
+
+        start = time.monotonic()
+        try:
+            ok, error = bool(job(name, *job_args)), None
+        except Exception as e:
+            ok, error = False, f"{type(e).__name__}: {e}"
+        results.put((name, worker_id, ok, time.monotonic() - start, stolen, error, job_no))
+
+
+class Fleet:
+    """Process pool over accounts with work stealing and cross-worker retries"""
+
+    def __init__(self, workers=None, attempts=MAX_ATTEMPTS, job=claim_account, job_args=()):
+        self.workers = workers or os.cpu_count() or 1
+        self.attempts = attempts
+        self.job = job
+        self.job_args = job_args
+
+    def run(self, accounts):
+        """{'succeeded', 'failed', 'shards', 'elapsed'} for one pass over `accounts`"""
+        accounts = list(dict.fromkeys(accounts))
+        workers = max(1, min(self.workers, len(accounts)))
+
+        manager = multiprocessing.Manager()
+        shards = [manager.list() for _ in range(workers)]
+        for name in accounts:
+            shards[shard_of(name, workers)].append((name, ()))
+        lock = manager.Lock()
+        results = manager.Queue()
+        stop = manager.Event()
+        # worker id -> (account, job number) it is running
+        in_flight = manager.dict()
+
+        processes = [
+            multiprocessing.Process(target=_worker,
+                                    args=(i, shards, lock, results, stop, self.job, self.job_args, in_flight))
+            for i in range(workers)
+        ]
+        start = time.monotonic()
+        for process in processes:
+            process.start()
+
+        tried_on = {name: set() for name in accounts}
+        succeeded, failed = {}, {}
+        shard_stats = [{'accounts': 0, 'busy': 0.0, 'stolen': 0, 'failures': 0} for _ in range(workers)]
+        finished_jobs = set()
+        dead = set()
+
+        def alive(i):
+            return i not in dead
+
+        def record(name, worker_id, ok, elapsed, stolen, error):
+            stats = shard_stats[worker_id]
+            stats['accounts'] += 1
+            stats['busy'] += elapsed
+            stats['stolen'] += stolen
+            tried_on[name].add(worker_id)
+
+            if ok:
+                succeeded[name] = worker_id
+                return
+
+            stats['failures'] += 1
+            others = [i for i in range(workers) if i not in tried_on[name] and alive(i)]
+            if len(tried_on[name]) < self.attempts and others:
+                # Retry on the least loaded worker that has not tried it yet
+                with lock:
+                    target = min(others, key=lambda i: len(shards[i]))
+                    shards[target].insert(0, (name, tuple(tried_on[name])))
+            else:
+                failed[name] = error or 'run failed'
+
+        def handle_deaths():
+            for i, process in enumerate(processes):
+                if i in dead or process.is_alive():
+                    continue
+                dead.add(i)
+                reason = f"worker {i} died (exit code {process.exitcode})"
+                job = in_flight.get(i)
+                if job and (i, job[1]) not in finished_jobs:
+                    record(job[0], i, False, 0.0, False, reason)
+                # Hand its queued accounts to live workers that may run them
+                with lock:
+                    orphans = list(shards[i])
+                    del shards[i][:]
+                    for name, excluded in orphans:
+                        targets = [w for w in range(workers) if alive(w) and w not in excluded]
+                        if targets:
+                            shards[min(targets, key=lambda w: len(shards[w]))].append((name, excluded))
+                        else:
+                            failed[name] = reason
+
+        try:
+            while len(succeeded) + len(failed) < len(accounts):
+                try:
+                    name, worker_id, ok, elapsed, stolen, error, job_no = results.get(timeout=1)
+                except queue.Empty:
+                    # Results already queued are in; now account for workers that died
+                    handle_deaths()
+                    if len(dead) == workers and len(succeeded) + len(failed) < len(accounts):
+                        raise RuntimeError("all fleet workers exited")
+                    continue
+
+                finished_jobs.add((worker_id, job_no))
+                record(name, worker_id, ok, elapsed, stolen, error)
+        finally:
+            stop.set()
+            for process in processes:
+                process.join()
+            manager.shutdown()
+
+        elapsed = time.monotonic() - start
+        for stats in shard_stats:
+            stats['per_min'] = stats['accounts'] / elapsed * 60 if elapsed else 0
+
+        return {'succeeded': succeeded, 'failed': failed, 'shards': shard_stats, 'elapsed': elapsed}
+
+
+def print_report(report):
+    print(f"\n📊 Fleet run: {len(report['succeeded'])} succeeded, {len(report['failed'])} failed "
+          f"in {report['elapsed']:.1f}s")
+    for i, stats in enumerate(report['shards']):
+        print(f"   shard {i}: {stats['accounts']} run(s), {stats['per_min']:.1f}/min, "
+              f"busy {stats['busy']:.1f}s, {stats['stolen']} stolen, {stats['failures']} failure(s)")
+    for name, error in report['failed'].items():
+        print(f"   ❌ {name}: {error}")
+
+
+def main():
+    args = sys.argv[1:]
+    options = {}
+    for flag in ('--workers', '--attempts', '--deadline'):
+        if flag in args:
+            i = args.index(flag)
+            options[flag] = args[i + 1]
+            del args[i:i + 2]
+
+    names = args or [account.name for account in list_accounts()]
+    if not names:
+        print("❌ No accounts found (claimer/data/cookies.json or claimer/data/accounts/*/cookies.json)")
+        sys.exit(1)
+
+    deadline = float(options['--deadline']) if '--deadline' in options else None
+    fleet = Fleet(
+        workers=int(options['--workers']) if '--workers' in options else None,
+        attempts=int(options.get('--attempts', MAX_ATTEMPTS)),
+        job_args=(deadline,),
+    )
+    print(f"🚀 Running {len(names)} account(s) on {min(fleet.workers, len(names))} worker(s)")
+    report = fleet.run(names)
+    print_report(report)
+    sys.exit(0 if not report['failed'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+HTTP/2 Session - requests.Session look-alike on an async httpx HTTP/2 client
+- One event loop thread per process drives every session's AsyncClient
+- Calls from many threads (pipelined claims, hedged GETs, ownership checks)
+  become concurrent streams on one multiplexed connection per host instead
+  of one connection each
+- Same surface the API classes use: get/post(json=, params=, timeout=,
+  stream=), headers, a requests cookie jar, status_code/content/text/
+  raise_for_status/iter_content on responses
+- Experimental: needs `pip install httpx[http2]` and both HTTP_BACKEND=http2
+  and HTTP2_EXPERIMENTAL=1; run benchmarks/smoke_http2.py first
+"""
+import asyncio
+import threading
+
+from requests.cookies import RequestsCookieJar
+
+from cookie_watcher import reload_if_requested
+
+try:
+    import httpx
+    import h2  # noqa: F401  (httpx only negotiates HTTP/2 when h2 is installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def event_loop():
+    """The process-wide loop all HTTP2Sessions run on (started on first use)"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='http2-loop', daemon=True).start()
+        return _loop
+
+
+def _run(coro):
+    return asyncio.run_coroutine_threadsafe(coro, event_loop()).result()
+
+
+async def _next_chunk(chunks):
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+class HTTP2Response:
+    """Blocking view of an httpx response"""
+
+    def __init__(self, response, streamed=False):
+        self.raw = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+        self.http_version = response.http_version
+        self.streamed = streamed
+        self._content = None
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = b''.join(self.iter_content()) if self.streamed else self.raw.content
+        return self._content
+
+    @property
+    def text(self):
+        return self.content.decode(self.raw.encoding or 'utf-8', errors='replace')
+
+    def raise_for_status(self):
+        self.raw.raise_for_status()
+
+    def close(self):
+        """Release an unread streamed response's stream"""
+        if self.streamed:
+            self.streamed = False
+            _run(self.raw.aclose())
+
+    def iter_content(self, chunk_size=None):
+        """Body chunks as they arrive (only once for a streamed response)"""
+        if not self.streamed:
+            yield self.content
+            return
+        chunks = self.raw.aiter_bytes(chunk_size)
+        try:
+            while True:
+                chunk = _run(_next_chunk(chunks))
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            self.streamed = False
+            _run(self.raw.aclose())
+
+
+class HTTP2Session:
+    """Drop-in for requests.Session backed by httpx.AsyncClient(http2=True)
+
+    `http1=False` forces HTTP/2 with prior knowledge (h2c), e.g. against the
+    local mock server; otherwise HTTP/2 is negotiated over TLS (ALPN).
+    """
+
+    def __init__(self, http1=True):
+        self.cookies = RequestsCookieJar()
+        # Per-host pacing hook (set by http_client.use_shared_pool)
+        self.host_limiter = None
+        self.client = _run(self._open(http1))
+        self.headers = self.client.headers
+
+    async def _open(self, http1):
+        # httpx wraps this jar rather than copying it: Set-Cookie updates land in self.cookies
+        return httpx.AsyncClient(http1=http1, http2=True, cookies=self.cookies)
+
+    def request(self, method, url, params=None, json=None, data=None, headers=None,
+                timeout=None, stream=False):
+        reload_if_requested()
+        if self.host_limiter:
+            self.host_limiter(httpx.URL(url).host).acquire()
+        request = self.client.build_request(method, url, params=params, json=json, data=data,
+                                            headers=headers, timeout=timeout)
+        return HTTP2Response(_run(self.client.send(request, stream=stream)), streamed=stream)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        _run(self.client.aclose())
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+HTTP Client - Hedged GETs across Epic endpoint mirrors
+- The primary gets a head start of its own p95 latency (from recent history)
+- If it has not answered by then, the same request goes to the next mirror
+  and whichever response arrives first wins
+- Errors fail over to the next mirror immediately
+- Per-run metrics: hedge rate and tail latency with vs. without hedging
+- An optional run Deadline bounds the whole hedged call, not just each socket
+- A process-wide pooled adapter with per-host rate limits, shared by every
+  account session in a fleet worker
+- Single-flight: identical concurrent GETs share one upstream request and its
+  parsed result (threads in a process, and processes via a short-lived
+  file cache under a lock)
+- Parsed promotions are published to the shared snapshot cache
+  (snapshot_cache.py) and served from it while fresh, without a request
+- new_session(): requests (HTTP/1.1) by default, or a multiplexed HTTP/2
+  session with HTTP_BACKEND=http2 and HTTP2_EXPERIMENTAL=1 (see http2_session.py)
+"""
+import os
+import time
+import atexit
+import hashlib
+import threading
+from urllib.parse import urlparse
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process coalescing
+    fcntl = None
+
+from accounts import DATA_DIR
+from deadline import Deadline, DeadlineExceeded
+from rate_limiter import RateLimiter
+from cookie_watcher import reload_if_requested
+import streaming_json
+import snapshot_cache
+import serialization
+
+PROMOTIONS_URL = 'https://store-site-backend-static-ipv4.ak.epicgames.com/freeGamesPromotions'
+PROMOTIONS_MIRRORS = [
+    url.strip() for url in os.getenv(
+        'PROMOTIONS_MIRRORS',
+        'https://store-site-backend-static.ak.epicgames.com/freeGamesPromotions'
+    ).split(',') if url.strip()
+]
+
+LATENCY_FILE = DATA_DIR / 'latency.json'
+LATENCY_WINDOW = 50
+# Hedge delay before there is enough history, and its floor
+DEFAULT_HEDGE_DELAY = 2.0
+MIN_HEDGE_DELAY = 0.3
+MIN_SAMPLES = 5
+
+# Per-host request rate for pooled sessions (requests/second, burst)
+HOST_RATE = float(os.getenv('HOST_RATE', 2.0))
+HOST_BURST = int(os.getenv('HOST_BURST', 4))
+POOL_SIZE = 20
+
+# Cross-process coalescing: a parsed result is reused by other processes this long
+FLIGHT_DIR = DATA_DIR / 'flight'
+FLIGHT_TTL = float(os.getenv('FLIGHT_TTL', 30))
+
+# 'requests' (HTTP/1.1, one connection per concurrent call) or 'http2'; the
+# HTTP/2 backend is experimental and also needs HTTP2_EXPERIMENTAL=1
+HTTP_BACKEND = os.getenv('HTTP_BACKEND', 'requests').lower()
+HTTP2_EXPERIMENTAL = os.getenv('HTTP2_EXPERIMENTAL', '') == '1'
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class LatencyTracker:
+    """Recent latencies per URL, persisted so the threshold survives between runs
+
+    Samples are kept in memory and saved once per run (save()), merged into
+    the file under a lock so concurrent processes add to each other's history.
+    """
+
+    def __init__(self, latency_file=LATENCY_FILE, window=LATENCY_WINDOW):
+        self.latency_file = latency_file
+        self.lock_file = latency_file.with_suffix('.lock')
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = self._load()
+        # url -> samples recorded since the last save
+        self.pending = {}
+
+    def _load(self):
+        try:
+            return serialization.load(self.latency_file)
+        except Exception:
+            return {}
+
+    @contextmanager
+    def _file_lock(self):
+        self.lock_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_file, 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def record(self, url, seconds):
+        with self.lock:
+            sample = round(seconds, 3)
+            self.pending.setdefault(url, []).append(sample)
+            samples = self.samples.setdefault(url, [])
+            samples.append(sample)
+            del samples[:-self.window]
+
+    def save(self):
+        """Merge this process's new samples into the file (other writers' samples are kept)"""
+        with self.lock:
+            if not self.pending:
+                return
+            try:
+                with self._file_lock():
+                    samples = self._load()
+                    for url, new in self.pending.items():
+                        merged = samples.setdefault(url, []) + new
+                        samples[url] = merged[-self.window:]
+                    serialization.dump(self.latency_file, samples)
+            except OSError:
+                return
+            self.samples = samples
+            self.pending = {}
+
+    def hedge_delay(self, url):
+        """How long the primary gets before a hedge is sent (its p95)"""
+        samples = self.samples.get(url, [])
+        if len(samples) < MIN_SAMPLES:
+            return DEFAULT_HEDGE_DELAY
+        return max(MIN_HEDGE_DELAY, percentile(samples, 95))
+
+
+class HedgeMetrics:
+    """What hedging did during this run"""
+
+    def __init__(self):
+        self.requests = []
+        self.coalesced = 0
+        self.reused = 0
+        self.cached = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        entry = {'latency': None, 'primary': None, 'hedged': False, 'winner': None}
+        with self.lock:
+            self.requests.append(entry)
+        return entry
+
+    def summary(self):
+        """{requests, hedge_rate, alternate_wins, p95, p95_primary}
+
+        p95_primary is the tail the primary alone would have had; a primary
+        still running counts with the time it had taken so far (a lower bound).
+        """
+        with self.lock:
+            done = [r for r in self.requests if r['latency'] is not None]
+        if not done:
+            return None
+        return {
+            'requests': len(done),
+            'hedge_rate': sum(r['hedged'] for r in done) / len(done),
+            'alternate_wins': sum(r['winner'] != 0 for r in done),
+            'p95': percentile([r['latency'] for r in done], 95),
+            'p95_primary': percentile([r['primary'] or r['latency'] for r in done], 95),
+        }
+
+    def describe(self):
+        s = self.summary()
+        parts = []
+        if s:
+            parts.append(f"{s['requests']} request(s), hedge rate {s['hedge_rate']:.0%}, "
+                         f"{s['alternate_wins']} won by a mirror, "
+                         f"p95 {s['p95']:.2f}s (primary alone ≥ {s['p95_primary']:.2f}s)")
+        if self.coalesced or self.reused:
+            parts.append(f"{self.coalesced} coalesced, {self.reused} reused from the shared cache")
+        if self.cached:
+            parts.append(f"{self.cached} served from the snapshot cache (no request)")
+        return '; '.join(parts) or None
+
+
+tracker = LatencyTracker()
+# Runs save at their end; this catches anything else that made requests
+atexit.register(tracker.save)
+# Per thread, so concurrent runs in one process (the service) count separately
+_metrics = threading.local()
+
+
+def run_metrics():
+    """This thread's HedgeMetrics for the current run"""
+    metrics = getattr(_metrics, 'value', None)
+    if metrics is None:
+        metrics = _metrics.value = HedgeMetrics()
+    return metrics
+
+
+def reset_run_metrics():
+    """Start counting a new run on this thread"""
+    _metrics.value = HedgeMetrics()
+    return _metrics.value
+
+
+def hedged_get(session, urls, params=None, timeout=30, deadline=None, stream=False):
+    """GET the first of `urls` to answer successfully (hedging after the primary's p95)
+
+    `session` is anything with a requests-style get() (a Session or the
+    requests module). Raises the last error if every URL fails, or
+    DeadlineExceeded when the run budget runs out first.
+    """
+    deadline = deadline or Deadline(None)
+    primary = urls[0]
+    delay = tracker.hedge_delay(primary)
+    entry = run_metrics().start()
+    start = time.monotonic()
+
+    def timed_get(url):
+        sent = time.monotonic()
+        try:
+            response = session.get(url, params=params, timeout=deadline.timeout(timeout), stream=stream)
+            try:
+                response.raise_for_status()
+            except Exception:
+                response.close()
+                raise
+            return response
+        finally:
+            # Failures and timeouts count too: they are the tail the hedge is for
+            tracker.record(url, time.monotonic() - sent)
+
+    def primary_done(future):
+        entry['primary'] = time.monotonic() - start
+
+    executor = ThreadPoolExecutor(max_workers=len(urls))
+    futures = {}
+    pending = list(enumerate(urls))
+
+    def launch():
+        index, url = pending.pop(0)
+        future = executor.submit(timed_get, url)
+        if index == 0:
+            future.add_done_callback(primary_done)
+        futures[future] = index
+
+    error = None
+    try:
+        launch()
+        while futures:
+            wait_for = min(delay if pending else float('inf'), deadline.remaining())
+            done, _ = wait(futures, timeout=None if wait_for == float('inf') else wait_for,
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                if deadline.expired or not pending:
+                    raise DeadlineExceeded(f"run deadline of {deadline.budget:g}s exceeded")
+                entry['hedged'] = True
+                launch()
+                continue
+
+            for future in done:
+                index = futures.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    error = e
+                    if pending:
+                        entry['hedged'] = True
+                        launch()
+                    continue
+
+                entry['latency'] = time.monotonic() - start
+                entry['winner'] = index
+                return response
+
+        raise error
+    finally:
+        # Losing requests finish in the background (and feed the tracker); their
+        # responses are closed so a streamed one gives its connection back to the pool
+        for future in futures:
+            future.add_done_callback(_close_response)
+        executor.shutdown(wait=False)
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution and its result"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+
+        if not leader:
+            metrics = run_metrics()
+            with metrics.lock:
+                metrics.coalesced += 1
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call['done'].set()
+
+
+flights = SingleFlight()
+
+
+def shared_result(key, fn, ttl=FLIGHT_TTL, deadline=None):
+    """fn()'s JSON result, computed by one process at a time and reused for `ttl` seconds"""
+    if fcntl is None or not ttl:
+        return fn()
+
+    deadline = deadline or Deadline(None)
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+    FLIGHT_DIR.mkdir(parents=True, exist_ok=True)
+    data_path = FLIGHT_DIR / f"{digest}.json"
+
+    with open(FLIGHT_DIR / f"{digest}.lock", 'a') as lock:
+        # Whoever holds the lock is fetching; wait for it (within the run budget)
+        while True:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if deadline.expired:
+                    raise DeadlineExceeded(f"run deadline of {deadline.budget:g}s exceeded")
+                time.sleep(0.05)
+        try:
+            if data_path.exists() and time.time() - data_path.stat().st_mtime < ttl:
+                try:
+                    result = serialization.load(data_path)
+                    metrics = run_metrics()
+                    with metrics.lock:
+                        metrics.reused += 1
+                    return result
+                except ValueError:
+                    pass
+
+            result = fn()
+            serialization.dump(data_path, result, pretty=False)
+            return result
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def fetch_promotions(session, params, timeout=30, deadline=None, stream=False):
+    """The freeGamesPromotions response, hedged across the configured mirrors"""
+    return hedged_get(session, [PROMOTIONS_URL] + PROMOTIONS_MIRRORS, params=params,
+                      timeout=timeout, deadline=deadline, stream=stream)
+
+
+def fetch_promotions_json(session, params, timeout=30, deadline=None):
+    """Parsed freeGamesPromotions payload, coalesced per (locale, country, ...)
+
+    Served from the snapshot cache while it is fresh. Otherwise the body is
+    stream-decoded, each element projected to the fields the parsers read
+    (streaming_json.ELEMENT_FIELDS), and the result published to the cache.
+    Callers must treat the result as read-only: concurrent callers get the
+    same object.
+    """
+    key = PROMOTIONS_URL + '?' + '&'.join(f"{k}={v}" for k, v in sorted(params.items()))
+
+    def fetch():
+        payload = streaming_json.promotions_payload(streaming_json.response_chunks(
+            fetch_promotions(session, params, timeout, deadline, stream=True)))
+        try:
+            snapshot_cache.publish(key, payload)
+        except OSError:
+            pass
+        return payload
+
+    def cached_or_fetch():
+        payload = snapshot_cache.read(key)
+        if payload is not None:
+            metrics = run_metrics()
+            with metrics.lock:
+                metrics.cached += 1
+            return payload
+        return shared_result(key, fetch, deadline=deadline)
+
+    return flights.do(key, cached_or_fetch)
+
+
+class HostLimitedAdapter(HTTPAdapter):
+    """Connection-pooling adapter that paces requests per host"""
+
+    def __init__(self, rate=HOST_RATE, burst=HOST_BURST, **kwargs):
+        self.rate = rate
+        self.burst = burst
+        self.limiters = {}
+        self.limiters_lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def limiter(self, host):
+        with self.limiters_lock:
+            if host not in self.limiters:
+                self.limiters[host] = RateLimiter(self.rate, self.burst)
+            return self.limiters[host]
+
+    def send(self, request, **kwargs):
+        self.limiter(urlparse(request.url).hostname).acquire()
+        return super().send(request, **kwargs)
+
+
+_adapter = None
+
+
+def shared_adapter():
+    """This process's pooled adapter (created on first use)"""
+    global _adapter
+    if _adapter is None:
+        _adapter = HostLimitedAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    return _adapter
+
+
+def use_shared_pool(session):
+    """Route a session through the process-wide pool and host limits"""
+    adapter = shared_adapter()
+    if not hasattr(session, 'mount'):
+        # HTTP/2 sessions already share one connection per host; only pace them
+        session.host_limiter = adapter.limiter
+        return session
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+_warned_http2 = False
+
+
+class Session(requests.Session):
+    """requests.Session that applies a pending cookie reload (SIGHUP) before each request"""
+
+    def request(self, *args, **kwargs):
+        reload_if_requested()
+        return super().request(*args, **kwargs)
+
+
+def new_session(backend=None):
+    """A session for the API classes: Session, or HTTP2Session when asked for, enabled and installed"""
+    global _warned_http2
+    if (backend or HTTP_BACKEND) == 'http2':
+        import http2_session
+        if not HTTP2_EXPERIMENTAL:
+            warning = "HTTP_BACKEND=http2 is experimental, set HTTP2_EXPERIMENTAL=1 to use it"
+        elif not http2_session.HTTP2_AVAILABLE:
+            warning = "HTTP_BACKEND=http2 needs httpx[http2] (pip install 'httpx[http2]')"
+        else:
+            return http2_session.HTTP2Session()
+        if not _warned_http2:
+            print(f"⚠️  {warning}, using requests")
+            _warned_http2 = True
+    return Session()
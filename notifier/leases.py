@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Account Leases - Only one run works on an account at a time
+- Leases live in a SQLite table next to the accounts (claimer/data/leases.db),
+  so every process and every node sharing that directory sees them
+- A lease expires unless its holder heartbeats it; a crashed run blocks an
+  account for at most LEASE_TTL seconds
+- Re-entrant within one thread (the notifier and claimer can share a run);
+  other threads of the same process wait like any other holder, so the
+  threaded service gets the same exclusion as separate processes
+- A holder whose heartbeat finds the lease taken over is told through
+  `lost`/`check()` and must stop before its next claim step
+"""
+import os
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+
+from accounts import DATA_DIR
+
+LEASE_DB = DATA_DIR / 'leases.db'
+LEASE_TTL = float(os.getenv('LEASE_TTL', 90))
+# How long to wait for a busy account before skipping it (0 = skip at once)
+LEASE_WAIT = float(os.getenv('LEASE_WAIT', 0))
+POLL_INTERVAL = 1.0
+
+# One holder id per process
+HOLDER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaseLost(Exception):
+    """The lease expired and another run took the account over"""
+
+
+class LeaseStore:
+    """SQLite-backed lease table"""
+
+    def __init__(self, db_file=LEASE_DB):
+        self.db_file = db_file
+
+    def _connect(self):
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_file), timeout=10, isolation_level=None)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            " account TEXT PRIMARY KEY, holder TEXT NOT NULL, purpose TEXT,"
+            " acquired REAL NOT NULL, expires REAL NOT NULL)"
+        )
+        return conn
+
+    def try_acquire(self, account, holder, purpose, ttl):
+        """(True, None) if taken or already ours, else (False, current row)"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT holder, purpose, expires FROM leases WHERE account = ?", (account,)
+            ).fetchone()
+            if row and row[0] != holder and row[2] > now:
+                conn.execute("ROLLBACK")
+                return False, {'holder': row[0], 'purpose': row[1], 'expires': row[2]}
+
+            conn.execute(
+                "INSERT OR REPLACE INTO leases (account, holder, purpose, acquired, expires)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (account, holder, purpose, now, now + ttl)
+            )
+            conn.execute("COMMIT")
+            return True, None
+        finally:
+            conn.close()
+
+    def renew(self, account, holder, ttl):
+        """Extend our lease; False if it was lost (expired and taken over)"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE leases SET expires = ? WHERE account = ? AND holder = ?",
+                (time.time() + ttl, account, holder)
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def release(self, account, holder):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM leases WHERE account = ? AND holder = ?", (account, holder))
+        finally:
+            conn.close()
+
+    def active(self):
+        """[(account, holder, purpose, seconds left)] for unexpired leases"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT account, holder, purpose, expires FROM leases WHERE expires > ? ORDER BY account",
+                (now,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [(account, holder, purpose, expires - now) for account, holder, purpose, expires in rows]
+
+
+# account -> {count, thread, purpose, stop, lost} for leases this process holds
+_held = {}
+_held_lock = threading.Lock()
+
+
+class AccountLease:
+    """Lease on one account for the duration of a run
+
+        lease = AccountLease('default', 'notifier')
+        if not lease.acquire():
+            return  # someone else is working on it
+        try: ...
+        finally: lease.release()
+    """
+
+    def __init__(self, account, purpose, ttl=LEASE_TTL, store=None):
+        self.account = account
+        self.purpose = purpose
+        self.ttl = ttl
+        self.store = store or LeaseStore()
+        self.held = False
+        self.blocker = None
+        self._entry = None
+
+    def _try_acquire(self):
+        """One attempt: True if taken (or re-entered by this thread)"""
+        thread = threading.current_thread()
+        with _held_lock:
+            entry = _held.get(self.account)
+            if entry is not None:
+                if entry['thread'] == thread.ident:
+                    entry['count'] += 1
+                    self._entry = entry
+                    return True
+                # Held by another thread of this process
+                self.blocker = {'holder': f"{HOLDER} ({entry['thread_name']})", 'purpose': entry['purpose'],
+                                'expires': time.time() + self.ttl}
+                return False
+
+            ok, self.blocker = self.store.try_acquire(self.account, HOLDER, self.purpose, self.ttl)
+            if not ok:
+                return False
+            self._entry = _held[self.account] = {
+                'count': 1, 'thread': thread.ident, 'thread_name': thread.name, 'purpose': self.purpose,
+                'stop': threading.Event(), 'lost': False,
+            }
+        threading.Thread(target=self._heartbeat, args=(self._entry,), daemon=True).start()
+        return True
+
+    def acquire(self, wait=LEASE_WAIT):
+        """Take the lease, waiting up to `wait` seconds; False if another run holds it"""
+        give_up = time.monotonic() + wait
+        while not self._try_acquire():
+            if time.monotonic() >= give_up:
+                return False
+            time.sleep(min(POLL_INTERVAL, max(0.0, give_up - time.monotonic())))
+        self.held = True
+        return True
+
+    def _heartbeat(self, entry):
+        while not entry['stop'].wait(self.ttl / 3):
+            if not self.store.renew(self.account, HOLDER, self.ttl):
+                entry['lost'] = True
+                return
+
+    @property
+    def lost(self):
+        """Whether the heartbeat found the lease taken over since it was acquired"""
+        return bool(self._entry and self._entry['lost'])
+
+    def check(self):
+        """Raise LeaseLost if another run has taken the account over"""
+        if self.lost:
+            raise LeaseLost(f"lease on {self.account} was lost")
+
+    def release(self):
+        if not self.held:
+            return
+        self.held = False
+        with _held_lock:
+            entry = self._entry
+            entry['count'] -= 1
+            if entry['count']:
+                return
+            if _held.get(self.account) is entry:
+                del _held[self.account]
+        entry['stop'].set()
+        if not entry['lost']:
+            self.store.release(self.account, HOLDER)
+
+    def describe_blocker(self):
+        if not self.blocker:
+            return "another run"
+        left = max(0, self.blocker['expires'] - time.time())
+        return f"{self.blocker['purpose']} ({self.blocker['holder']}, expires in {left:.0f}s)"
+
+
+def main():
+    leases = LeaseStore().active()
+    if not leases:
+        print("No active leases")
+    for account, holder, purpose, left in leases:
+        print(f"🔒 {account}: {purpose} by {holder} ({left:.0f}s left)")
+
+
+if __name__ == '__main__':
+    main()
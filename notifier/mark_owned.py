@@ -2,35 +2,61 @@
 """
 Mark Game as Owned Tool
 Run this after manually claiming games to prevent future notifications
+- No arguments: interactive menu over the current free games
+- With arguments: bulk marking, matched against the promotion archive
+  through the title index (no API calls)
+
+Usage:
+  python3 mark_owned.py [--id OFFER_ID] [--namespace NS] [--title "fuzzy title"] [--file titles.txt]
+                        [--account NAME | --all-accounts] [--dry-run]
+  (--id/--namespace/--title/--file/--account can be repeated)
 """
-import json
 import sys
-from pathlib import Path
+import time
+
+from accounts import Account, DEFAULT_ACCOUNT, list_accounts
+from leases import AccountLease, LEASE_WAIT
+import snapshot_cache
+import serialization
+
+BULK_OPTIONS = ('--id', '--namespace', '--title', '--file', '--account')
 
-def load_owned_games():
+def owned_games_file(account=DEFAULT_ACCOUNT):
+    """The list the notifier and orchestrator read for this account"""
+    return Account(account).owned_games_file
+
+def load_owned_games(account=DEFAULT_ACCOUNT):
     """Load owned games list"""
-    owned_file = Path(__file__).parent / 'owned_games.json'
+    owned_file = owned_games_file(account)
     if owned_file.exists():
-        with open(owned_file, 'r') as f:
-            return json.load(f)
+        return serialization.load(owned_file)
     return []
 
-def save_owned_games(owned_list):
+def save_owned_games(owned_list, account=DEFAULT_ACCOUNT):
     """Save owned games list"""
-    owned_file = Path(__file__).parent / 'owned_games.json'
-    with open(owned_file, 'w') as f:
-        json.dump(owned_list, f, indent=2)
+    serialization.dump(owned_games_file(account), owned_list)
+
+def update_owned_games(update, account=DEFAULT_ACCOUNT):
+    """Apply update(owned list) -> new list under the account lease; the saved list, or None if busy"""
+    lease = AccountLease(account, 'mark_owned')
+    if not lease.acquire(wait=max(LEASE_WAIT, 30)):
+        print(f"❌ Account busy: {lease.describe_blocker()}, try again later")
+        return None
+    try:
+        owned = update(load_owned_games(account))
+        save_owned_games(owned, account)
+        return owned
+    finally:
+        lease.release()
 
 def get_current_free_games():
-    """Get current free games from API"""
-    import requests
+    """Current free games: the shared snapshot cache if fresh, else the API"""
     try:
-        response = requests.get(
-            'https://store-site-backend-static-ipv4.ak.epicgames.com/freeGamesPromotions',
-            params={'locale': 'zh-CN', 'country': 'CN'},
-            timeout=30
-        )
-        data = response.json()
+        data = snapshot_cache.latest()
+        if data is None:
+            import requests
+            import http_client
+            data = http_client.fetch_promotions_json(requests, params={'locale': 'zh-CN', 'country': 'CN'})
         elements = data['data']['Catalog']['searchStore']['elements']
 
         free_games = []
@@ -61,13 +87,126 @@ def get_current_free_games():
         print(f"Error fetching games: {e}")
         return []
 
+def parse_bulk_args(args):
+    """{option: [values]} plus the --all-accounts/--dry-run flags"""
+    options = {flag: [] for flag in BULK_OPTIONS}
+    flags = {'--all-accounts': False, '--dry-run': False}
+    i = 0
+    while i < len(args):
+        if args[i] in flags:
+            flags[args[i]] = True
+            i += 1
+        elif args[i] in options and i + 1 < len(args):
+            options[args[i]].append(args[i + 1])
+            i += 2
+        else:
+            raise ValueError(f"unexpected argument: {args[i]}")
+    return options, flags
+
+def read_titles(path):
+    """One title per line; blank lines and # comments skipped"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+def resolve(index, ids=(), namespaces=(), titles=()):
+    """({offer id: title}, [(query, how, entry)], [(query, candidates)]) against the title index"""
+    offers = {}
+    matched = []
+    unmatched = []
+    for offer_id in ids:
+        entry = index.get(offer_id)
+        # An explicit id is trusted even if the archive has never seen it
+        offers[offer_id] = entry['title'] if entry else offer_id
+        matched.append((offer_id, 'id' if entry else 'id (not archived)', entry or {'id': offer_id, 'title': offer_id}))
+    for namespace in namespaces:
+        entries = index.namespace(namespace)
+        if not entries:
+            unmatched.append((f"namespace {namespace}", []))
+        for entry in entries:
+            offers[entry['id']] = entry['title']
+            matched.append((namespace, 'namespace', entry))
+    for title in titles:
+        entries, how = index.match(title)
+        if not entries:
+            unmatched.append((title, how))
+            continue
+        for entry in entries:
+            offers[entry['id']] = entry['title']
+            matched.append((title, how, entry))
+    return offers, matched, unmatched
+
+def mark_many(offer_ids, accounts, dry_run=False):
+    """{account: (newly marked, already marked)}; None for an account that stayed busy"""
+    results = {}
+    for account in accounts:
+        lease = AccountLease(account, 'mark_owned')
+        if not lease.acquire(wait=max(LEASE_WAIT, 30)):
+            print(f"❌ {account}: busy ({lease.describe_blocker()}), skipped")
+            results[account] = None
+            continue
+        try:
+            owned = load_owned_games(account)
+            seen = set(owned)
+            new = [offer_id for offer_id in offer_ids if offer_id not in seen]
+            if new and not dry_run:
+                save_owned_games(owned + new, account)
+            results[account] = (len(new), len(offer_ids) - len(new))
+        finally:
+            lease.release()
+    return results
+
+def run_bulk(args):
+    from title_index import TitleIndex
+
+    try:
+        options, flags = parse_bulk_args(args)
+        titles = options['--title'] + [t for path in options['--file'] for t in read_titles(path)]
+    except (ValueError, OSError) as e:
+        print(f"❌ {e}")
+        print(__doc__.strip().split('Usage:')[1])
+        return False
+
+    if flags['--all-accounts']:
+        accounts = [account.name for account in list_accounts()] or [DEFAULT_ACCOUNT]
+    else:
+        accounts = options['--account'] or [DEFAULT_ACCOUNT]
+
+    start = time.perf_counter()
+    index = TitleIndex.load()
+    loaded = time.perf_counter()
+    offers, matched, unmatched = resolve(index, options['--id'], options['--namespace'], titles)
+    resolved = time.perf_counter()
+    results = mark_many(list(offers), accounts, flags['--dry-run'])
+    done = time.perf_counter()
+
+    for query, how, entry in matched:
+        print(f"   ✅ {query} → {entry['title']} ({entry['id']}, {how})")
+    for query, candidates in unmatched:
+        hint = f" - did you mean: {', '.join(c['title'] for c in candidates[:3])}?" if candidates else ''
+        print(f"   ❓ No match for {query}{hint}")
+
+    verb = 'Would mark' if flags['--dry-run'] else 'Marked'
+    for account, result in results.items():
+        if result is not None:
+            print(f"📝 {account}: {verb} {result[0]} new, {result[1]} already marked")
+    print(f"⏱️  Index {(loaded - start) * 1000:.1f}ms ({len(index.entries)} offers), "
+          f"matching {(resolved - loaded) * 1000:.1f}ms, marking {(done - resolved) * 1000:.1f}ms")
+    return not unmatched and None not in results.values()
+
 def main():
+    if len(sys.argv) > 1:
+        sys.exit(0 if run_bulk(sys.argv[1:]) else 1)
+
     print("=" * 60)
     print("Mark Game as Owned")
     print("=" * 60)
 
-    # Get current free games
-    print("\nFetching current free games...")
+    # The account lease is only taken around each write, never while waiting for input
+    run_menu()
+
+def run_menu():
+    # Get current free games (no network while the shared snapshot is fresh)
+    print("\nLoading current free games...")
     free_games = get_current_free_games()
 
     if not free_games:
@@ -98,24 +237,35 @@ def main():
         if choice == 'q':
             break
         elif choice == 'list':
+            owned = load_owned_games()
             print(f"\nOwned game IDs: {owned}")
         elif choice == 'clear':
-            owned = []
-            save_owned_games(owned)
-            print("✅ Cleared all owned marks")
+            if update_owned_games(lambda current: []) is not None:
+                owned = []
+                print("✅ Cleared all owned marks")
         elif choice == 'all':
-            for game in free_games:
-                if game['id'] not in owned:
-                    owned.append(game['id'])
-            save_owned_games(owned)
-            print(f"✅ Marked {len(free_games)} games as owned")
+            ids = [game['id'] for game in free_games]
+            updated = update_owned_games(lambda current: current + [i for i in ids if i not in set(current)])
+            if updated is not None:
+                owned = updated
+                print(f"✅ Marked {len(free_games)} games as owned")
         elif choice.isdigit():
             idx = int(choice) - 1
             if 0 <= idx < len(free_games):
                 game = free_games[idx]
-                if game['id'] not in owned:
-                    owned.append(game['id'])
-                    save_owned_games(owned)
+                added = []
+
+                def mark(current):
+                    if game['id'] in current:
+                        return current
+                    added.append(game['id'])
+                    return current + [game['id']]
+
+                updated = update_owned_games(mark)
+                if updated is None:
+                    continue
+                owned = updated
+                if added:
                     print(f"✅ Marked '{game['title']}' as owned")
                 else:
                     print(f"⚠️  '{game['title']}' is already marked as owned")
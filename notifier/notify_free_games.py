@@ -7,17 +7,29 @@ Epic Games Free Game Notifier
 """
 import os
 import sys
-import json
 import smtplib
 import requests
 from datetime import datetime
+from contextlib import contextmanager
 from pathlib import Path
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
 
+from accounts import Account, DEFAULT_ACCOUNT
+from cookie_store import CookieStore
+from cookie_watcher import register_reload
+from promotion_snapshot import SnapshotStore
+from promotion_archive import PromotionArchive
+from ownership import OwnershipService
+from offer_index import offer_items
+import http_client
+from deadline import Deadline
+from leases import AccountLease
+import serialization
+
 class FreeGameNotifier:
-    def __init__(self):
+    def __init__(self, account=DEFAULT_ACCOUNT):
         self.base_dir = Path(__file__).parent
         self.project_dir = self.base_dir.parent
         load_dotenv(self.project_dir / '.env')
@@ -25,7 +37,8 @@ class FreeGameNotifier:
         self.db_file = self.project_dir / 'claimer' / 'data' / 'epic-games.json'
         self.log_file = self.base_dir / 'notifier.log'
         self.cookies_file = self.project_dir / 'claimer' / 'data' / 'cookies.json'
-        self.owned_games_file = self.base_dir / 'owned_games.json'
+        # Games marked owned with mark_owned.py --account
+        self.owned_games_file = Account(account).owned_games_file
 
         # Email config from .env
         self.smtp_config = {
@@ -38,6 +51,18 @@ class FreeGameNotifier:
 
         # Session for API requests
         self.session = None
+        self.cookie_store = CookieStore(self.cookies_file)
+
+        # Last processed promotion set; unchanged promotions skip all stages
+        self.snapshots = SnapshotStore('notifier')
+        self.current_games = None
+        self.failed_ids = set()
+
+        # Run budget; every request's timeout comes from it
+        self.deadline = Deadline(None)
+
+        # Warm SMTP connection (set by the resident service); None connects per email
+        self.smtp = None
 
     def log(self, message):
         """Log message"""
@@ -58,10 +83,9 @@ class FreeGameNotifier:
             return False
 
         try:
-            with open(self.cookies_file, 'r') as f:
-                cookies = json.load(f)
+            cookies = self.cookie_store.load()
 
-            self.session = requests.Session()
+            self.session = http_client.new_session()
 
             # Add cookies to session
             epic_eg1 = None
@@ -99,83 +123,31 @@ class FreeGameNotifier:
             self.log(f"⚠️  Failed to load cookies: {e}")
             return False
 
-    def check_owned_games(self, games_info):
-        """Check which games are already owned using entitlements API"""
-        if not self.session:
-            return {}  # Return empty dict if no session
+    def reload_cookies(self):
+        """Hot-reload cookies after the cookie watcher signals a change"""
+        self.log("🔄 Cookies changed on disk, reloading session...")
+        self.load_cookies()
 
-        owned_status = {}
+    def save_session_cookies(self):
+        """Write cookies Epic refreshed during this run back to cookies.json"""
+        if not self.session:
+            return
 
-        # Get account_id from JWT token
-        import base64
-
-        account_id = None
-        for cookie_name in ['EPIC_EG1']:
-            cookie = self.session.cookies.get(cookie_name)
-            if cookie:
-                # Parse JWT to get account_id
-                parts = cookie.split('~')
-                if len(parts) > 1:
-                    jwt_token = parts[1]
-                    jwt_parts = jwt_token.split('.')
-                    if len(jwt_parts) >= 2:
-                        payload_b64 = jwt_parts[1]
-                        padding = 4 - len(payload_b64) % 4
-                        if padding != 4:
-                            payload_b64 += '=' * padding
-                        try:
-                            payload_json = base64.urlsafe_b64decode(payload_b64)
-                            payload = json.loads(payload_json)
-                            account_id = payload.get('sub')
-                            break
-                        except:
-                            pass
-
-        if not account_id:
-            self.log("⚠️  Could not extract account_id from token")
-            return owned_status
-
-        # Use entitlements API with account_id
         try:
-            url = f'https://entitlement-public-service-prod08.ol.epicgames.com/entitlement/api/account/{account_id}/entitlements'
-
-            # Get all entitlements (up to 5000)
-            response = self.session.get(
-                url,
-                params={'start': 0, 'count': 5000},
-                timeout=10
-            )
-
-            if response.status_code == 200:
-                entitlements = response.json()
-                owned_namespaces = set()
-                owned_catalog_items = set()
-
-                for item in entitlements:
-                    if 'namespace' in item:
-                        owned_namespaces.add(item['namespace'])
-                    if 'catalogItemId' in item:
-                        owned_catalog_items.add(item['catalogItemId'])
-
-                # Check each game - 只看 namespace，因为 catalogItemId 可能不匹配
-                for game in games_info:
-                    game_id = game['id']
-                    namespace = game.get('namespace', '')
-
-                    # 只检查 namespace（最可靠的匹配方式）
-                    is_owned = namespace in owned_namespaces
-                    owned_status[game_id] = is_owned
-
-                self.log(f"✅ Checked entitlements: {len(owned_namespaces)} namespaces, {len(owned_catalog_items)} items, {sum(owned_status.values())} games owned")
-                return owned_status
-            else:
-                self.log(f"⚠️  Entitlements API returned {response.status_code}")
-
+            updated = self.cookie_store.write_back(self.session.cookies)
+            if updated:
+                self.log(f"💾 Saved {updated} refreshed cookie(s) back to {self.cookies_file.name}")
         except Exception as e:
-            self.log(f"⚠️  Entitlements API failed: {e}")
+            self.log(f"⚠️  Failed to write back cookies: {e}")
+
+    def check_owned_games(self, games_info):
+        """Check which games are already owned (shared, cached entitlements)"""
+        if not self.session:
+            return {}  # Return empty dict if no session
 
-        # If API fails, return empty (assume nothing owned)
-        self.log("⚠️  Ownership check failed, treating all games as not owned")
+        owned_status = OwnershipService(self.session, deadline=self.deadline, log=self.log).owned(games_info)
+        if owned_status and all(owned is None for owned in owned_status.values()):
+            self.log("⚠️  Ownership check failed, treating all games as not owned")
         return owned_status
 
     def get_free_games_api(self):
@@ -183,14 +155,20 @@ class FreeGameNotifier:
         self.log("🔍 Fetching free games from Epic Games API...")
 
         try:
-            response = requests.get(
-                'https://store-site-backend-static-ipv4.ak.epicgames.com/freeGamesPromotions',
+            data = http_client.fetch_promotions_json(
+                requests,
                 params={'locale': 'zh-CN', 'country': 'CN'},
-                timeout=30
+                timeout=self.deadline.timeout(30),
+                deadline=self.deadline
             )
-            response.raise_for_status()
+        except Exception as e:
+            self.log(f"❌ Failed to fetch games: {e}")
+            return []
+        return self.parse_free_games(data)
 
-            data = response.json()
+    def parse_free_games(self, data):
+        """Currently free games from a promotions payload"""
+        try:
             elements = data.get('data', {}).get('Catalog', {}).get('searchStore', {}).get('elements', [])
 
             free_games = []
@@ -212,8 +190,10 @@ class FreeGameNotifier:
                 if discount_price != 0:
                     continue
 
-                # Get end date
-                end_date_str = promo_offers[0]['promotionalOffers'][0].get('endDate', '')
+                # Get promotion window
+                promo = promo_offers[0]['promotionalOffers'][0]
+                start_date_str = promo.get('startDate', '')
+                end_date_str = promo.get('endDate', '')
 
                 title = game.get('title', 'Unknown')
                 description = game.get('description', '')[:200]  # Limit length
@@ -246,17 +226,22 @@ class FreeGameNotifier:
                 free_games.append({
                     'id': game_id,
                     'namespace': game.get('namespace'),  # 添加 namespace 用于所有权检查
+                    'offerType': game.get('offerType'),
+                    'items': offer_items(game),
                     'title': title,
                     'description': description,
                     'url': game_url,
-                    'end_date': end_date_str
+                    'start_date': start_date_str,
+                    'end_date': end_date_str,
+                    'original_price': total_price.get('originalPrice', 0),
+                    'currency': total_price.get('currencyCode', '')
                 })
 
             self.log(f"✅ Found {len(free_games)} free games")
             return free_games
 
         except Exception as e:
-            self.log(f"❌ Failed to fetch games: {e}")
+            self.log(f"❌ Failed to parse games: {e}")
             return []
 
     def load_notified_games(self):
@@ -264,8 +249,7 @@ class FreeGameNotifier:
         notified_file = self.base_dir / 'notified_games.json'
         if notified_file.exists():
             try:
-                with open(notified_file, 'r') as f:
-                    return json.load(f)
+                return serialization.load(notified_file)
             except:
                 return []
         return []
@@ -278,15 +262,13 @@ class FreeGameNotifier:
             notified.append(game_id)
             # Keep only last 50 games
             notified = notified[-50:]
-            with open(notified_file, 'w') as f:
-                json.dump(notified, f)
+            serialization.dump(notified_file, notified)
 
     def load_owned_games(self):
         """Load manually marked owned games"""
         if self.owned_games_file.exists():
             try:
-                with open(self.owned_games_file, 'r') as f:
-                    return json.load(f)
+                return serialization.load(self.owned_games_file)
             except:
                 return []
         return []
@@ -296,8 +278,7 @@ class FreeGameNotifier:
         owned = self.load_owned_games()
         if game_id not in owned:
             owned.append(game_id)
-            with open(self.owned_games_file, 'w') as f:
-                json.dump(owned, f)
+            serialization.dump(self.owned_games_file, owned)
 
     def send_email(self, new_games):
         """Send email notification about new free games"""
@@ -312,80 +293,21 @@ class FreeGameNotifier:
             msg['To'] = self.smtp_config['to']
             msg['Subject'] = f"🎁 {len(new_games)} 款新的 Epic Games 免费游戏！"
 
-            # Create HTML email body
-            html_body = f"""
-            <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; line-height: 1.6; }}
-                    .game {{
-                        border: 1px solid #ddd;
-                        border-radius: 8px;
-                        padding: 15px;
-                        margin: 10px 0;
-                        background: #f9f9f9;
-                    }}
-                    .game-title {{
-                        color: #0078f2;
-                        font-size: 18px;
-                        font-weight: bold;
-                        margin-bottom: 8px;
-                    }}
-                    .game-desc {{ color: #666; margin: 8px 0; }}
-                    .claim-btn {{
-                        display: inline-block;
-                        background: #0078f2;
-                        color: white;
-                        padding: 10px 20px;
-                        text-decoration: none;
-                        border-radius: 5px;
-                        margin-top: 10px;
-                    }}
-                    .footer {{
-                        margin-top: 30px;
-                        padding-top: 20px;
-                        border-top: 1px solid #ddd;
-                        color: #888;
-                        font-size: 12px;
-                    }}
-                </style>
-            </head>
-            <body>
-                <h2>🎮 Epic Games 新的免费游戏</h2>
-                <p>发现 <strong>{len(new_games)}</strong> 款新的免费游戏！</p>
-            """
-
-            for game in new_games:
-                html_body += f"""
-                <div class="game">
-                    <div class="game-title">{game['title']}</div>
-                    <div class="game-desc">{game['description'] or '暂无描述'}</div>
-                    <a href="{game['url']}" class="claim-btn">立即领取</a>
-                </div>
-                """
-
-            html_body += f"""
-                <div class="footer">
-                    <p>💡 请在真实浏览器中打开链接并手动领取游戏。</p>
-                    <p>📅 通知时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-                    <p>🤖 由 Epic Games Free Game Notifier 自动发送</p>
-                </div>
-            </body>
-            </html>
-            """
-
             # Plain text version
             text_body = f"Epic Games 新的免费游戏\n\n发现 {len(new_games)} 款新游戏：\n\n"
             for game in new_games:
                 text_body += f"📦 {game['title']}\n{game['url']}\n\n"
             text_body += f"\n通知时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-
             msg.attach(MIMEText(text_body, 'plain'))
-            msg.attach(MIMEText(html_body, 'html'))
+
+            # The HTML version is shed when the run budget is low
+            if self.deadline.allows('email_formatting'):
+                msg.attach(MIMEText(self.format_email_html(new_games), 'html'))
+            else:
+                self.log("⏳ Run budget low, sending plain-text email only")
 
             # Send email
-            with smtplib.SMTP_SSL(self.smtp_config['host'], self.smtp_config['port']) as server:
-                server.login(self.smtp_config['user'], self.smtp_config['pass'])
+            with self.smtp_connection(self.deadline.timeout(30)) as server:
                 server.send_message(msg)
 
             self.log(f"✅ Email notification sent to {self.smtp_config['to']}")
@@ -395,8 +317,104 @@ class FreeGameNotifier:
             self.log(f"❌ Failed to send email: {e}")
             return False
 
-    def run(self):
-        """Main execution"""
+    def smtp_connection(self, timeout):
+        """Logged-in SMTP connection: the warm one if set, else a new one for this email"""
+        if self.smtp:
+            return self.smtp.connection(timeout)
+        return self._new_smtp_connection(timeout)
+
+    @contextmanager
+    def _new_smtp_connection(self, timeout):
+        with smtplib.SMTP_SSL(self.smtp_config['host'], self.smtp_config['port'], timeout=timeout) as server:
+            server.login(self.smtp_config['user'], self.smtp_config['pass'])
+            yield server
+
+    def format_email_html(self, new_games):
+        """HTML body of the notification email"""
+        html_body = f"""
+        <html>
+        <head>
+            <style>
+                body {{ font-family: Arial, sans-serif; line-height: 1.6; }}
+                .game {{
+                    border: 1px solid #ddd;
+                    border-radius: 8px;
+                    padding: 15px;
+                    margin: 10px 0;
+                    background: #f9f9f9;
+                }}
+                .game-title {{
+                    color: #0078f2;
+                    font-size: 18px;
+                    font-weight: bold;
+                    margin-bottom: 8px;
+                }}
+                .game-desc {{ color: #666; margin: 8px 0; }}
+                .claim-btn {{
+                    display: inline-block;
+                    background: #0078f2;
+                    color: white;
+                    padding: 10px 20px;
+                    text-decoration: none;
+                    border-radius: 5px;
+                    margin-top: 10px;
+                }}
+                .footer {{
+                    margin-top: 30px;
+                    padding-top: 20px;
+                    border-top: 1px solid #ddd;
+                    color: #888;
+                    font-size: 12px;
+                }}
+            </style>
+        </head>
+        <body>
+            <h2>🎮 Epic Games 新的免费游戏</h2>
+            <p>发现 <strong>{len(new_games)}</strong> 款新的免费游戏！</p>
+        """
+
+        for game in new_games:
+            html_body += f"""
+            <div class="game">
+                <div class="game-title">{game['title']}</div>
+                <div class="game-desc">{game['description'] or '暂无描述'}</div>
+                <a href="{game['url']}" class="claim-btn">立即领取</a>
+            </div>
+            """
+
+        html_body += f"""
+            <div class="footer">
+                <p>💡 请在真实浏览器中打开链接并手动领取游戏。</p>
+                <p>📅 通知时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+                <p>🤖 由 Epic Games Free Game Notifier 自动发送</p>
+            </div>
+        </body>
+        </html>
+        """
+
+        return html_body
+
+    def run(self, force=False, deadline=None):
+        """Main execution, bounded by the run deadline"""
+        self.deadline = deadline or Deadline()
+
+        # Another run (cron, manual, another node) already working on this account
+        lease = AccountLease('default', 'notifier')
+        if not lease.acquire():
+            self.log(f"⏭️  Account busy: {lease.describe_blocker()}, skipping this run")
+            return True
+
+        try:
+            success = self._run(force)
+            if success and self.current_games is not None:
+                self.snapshots.commit(self.current_games, self.failed_ids)
+            return success
+        finally:
+            self.save_session_cookies()
+            http_client.tracker.save()
+            lease.release()
+
+    def _run(self, force=False):
         self.log("=" * 70)
         self.log("Epic Games Free Game Notifier")
         self.log("=" * 70)
@@ -408,27 +426,71 @@ class FreeGameNotifier:
             self.log("❌ No games found or API unavailable")
             return False
 
+        fetch_stats = http_client.run_metrics().describe()
+        if fetch_stats:
+            self.log(f"📈 Promotions fetch: {fetch_stats}")
+
+        # Keep a history of every giveaway (never blocks the run; shed first)
+        if self.deadline.allows('enrichment'):
+            try:
+                added = PromotionArchive().append(games, 'CN')
+                if added:
+                    self.log(f"🗄️  Archived {added} new promotion(s)")
+            except Exception as e:
+                self.log(f"⚠️  Failed to archive promotions: {e}")
+        else:
+            self.log("⏳ Run budget low, skipping the promotion archive")
+
+        # Only act on offers that are new or changed since the last run
+        delta = self.snapshots.diff(games)
+        if delta.is_empty() and not force:
+            self.log("✅ Promotions unchanged since last run, nothing to do")
+            return True
+
+        self.current_games = games
+        if not force:
+            games = [g for g in games if g['id'] in delta.changed_ids]
+            self.log(f"🔀 Promotion changes since last run: {delta} ({len(games)} to process)")
+            if not games:
+                return True
+
         # Load cookies for API-based ownership check
         has_cookies = self.load_cookies()
+        register_reload(self.reload_cookies, 'notifier')
 
         # Check which games are already owned via API
-        if has_cookies:
+        owned_status = {}
+        if has_cookies and not self.deadline.allows('ownership'):
+            self.log("⏳ Run budget low, skipping the ownership check")
+        elif has_cookies:
             owned_status = self.check_owned_games(games)
 
-            # Filter out API-owned games
-            api_owned_games = []
-            unowned_games = []
+        self.notify_games(games, owned_status)
+        return True
+
+    def notify_games(self, games, owned_status):
+        """Email the games that are neither owned nor notified before
 
-            for game in games:
-                if owned_status.get(game['id'], False):
-                    api_owned_games.append(game['title'])
-                else:
-                    unowned_games.append(game)
+        Returns the games that were emailed ([] if none, or if sending failed;
+        failures are kept in self.failed_ids so the next run retries them).
+        """
+        # Only this call's failures: a warm service reuses the notifier across runs
+        self.failed_ids = set()
+
+        # Filter out API-owned games
+        api_owned_games = []
+        unowned_games = []
 
-            if api_owned_games:
-                self.log(f"✅ Already owned via API ({len(api_owned_games)}): {', '.join(api_owned_games)}")
+        for game in games:
+            if owned_status.get(game['id'], False):
+                api_owned_games.append(game['title'])
+            else:
+                unowned_games.append(game)
 
-            games = unowned_games  # Only consider API-unowned games
+        if api_owned_games:
+            self.log(f"✅ Already owned via API ({len(api_owned_games)}): {', '.join(api_owned_games)}")
+
+        games = unowned_games  # Only consider API-unowned games
 
         # Also filter out manually marked owned games
         owned_game_ids = self.load_owned_games()
@@ -448,7 +510,7 @@ class FreeGameNotifier:
 
         if not games:
             self.log("✅ All free games are already owned")
-            return True
+            return []
 
         # Check which games are new (not notified before)
         notified = self.load_notified_games()
@@ -459,7 +521,7 @@ class FreeGameNotifier:
             self.log("\n📋 Current free games:")
             for game in games:
                 self.log(f"   📦 {game['title']}")
-            return True
+            return []
 
         # Show new games
         self.log(f"\n🆕 Found {len(new_games)} NEW game(s):")
@@ -468,20 +530,22 @@ class FreeGameNotifier:
             self.log(f"      {game['url']}")
 
         # Send notification
-        if self.send_email(new_games):
+        sent = self.send_email(new_games)
+        if sent:
             # Mark as notified
             for game in new_games:
                 self.save_notified_game(game['id'])
             self.log("\n✅ Notification sent successfully!")
         else:
             self.log("\n⚠️  Failed to send notification")
+            self.failed_ids = {g['id'] for g in new_games}
 
         self.log("\n💡 Please manually claim games in your browser:")
         self.log("   https://store.epicgames.com/zh-CN/free-games")
 
-        return True
+        return new_games if sent else []
 
 if __name__ == '__main__':
     notifier = FreeGameNotifier()
-    success = notifier.run()
+    success = notifier.run(force='--force' in sys.argv, deadline=Deadline.from_argv(sys.argv))
     sys.exit(0 if success else 1)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Offer Index - Which catalog items each offer grants
+- Built from the `items` of the promotions payload (no extra API calls)
+- Cached per offer on disk, so tools that only know an offer id can still
+  decide ownership precisely
+"""
+import threading
+
+from accounts import DATA_DIR
+import serialization
+
+INDEX_FILE = DATA_DIR / 'offer_items.json'
+
+
+def offer_items(element):
+    """Catalog item ids of one promotions payload element"""
+    return sorted({item['id'] for item in element.get('items') or [] if item.get('id')})
+
+
+class OfferIndex:
+    """offer id -> {namespace, items: [catalogItemId]}"""
+
+    def __init__(self, index_file=INDEX_FILE):
+        self.index_file = index_file
+        self.lock = threading.Lock()
+        self._offers = None
+
+    @property
+    def offers(self):
+        if self._offers is None:
+            try:
+                self._offers = serialization.load(self.index_file)
+            except Exception:
+                self._offers = {}
+        return self._offers
+
+    def learn(self, games):
+        """Index parsed games that carry `items`; saves only if something changed"""
+        changed = False
+        with self.lock:
+            for game in games:
+                items = game.get('items')
+                if not game.get('id') or not items:
+                    continue
+                entry = {'namespace': game.get('namespace'), 'items': sorted(items)}
+                if self.offers.get(game['id']) != entry:
+                    self.offers[game['id']] = entry
+                    changed = True
+            if changed:
+                serialization.dump(self.index_file, self.offers)
+        return changed
+
+    def items(self, offer_id):
+        """Catalog item ids for an offer ([] if never seen)"""
+        return self.offers.get(offer_id, {}).get('items', [])
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Orchestrator - One process per cycle: fetch, ownership, claim, notify, alert
+- Promotions are fetched once and parsed for both the claimer and the notifier
+- The stages share one session, lease, run deadline and ownership cache
+- Every stage's outcome goes into a structured RunResult
+  (claimer/data/runs/last_run.json and runs/<account>/last_run.json, plus
+  one line per run in history.jsonl);
+  alerts are built from it instead of scraping claim.log
+- Success alert only when something was claimed; failure alerts at most
+  every 12h (same .last_alert file as alert_mailer.js)
+
+Usage:
+  python3 orchestrator.py [--force] [--pipeline] [--no-claim] [--no-notify] [--no-alert] [--deadline SECONDS]
+"""
+import sys
+import time
+from datetime import datetime
+from contextlib import contextmanager
+from email.mime.text import MIMEText
+
+from accounts import DATA_DIR, PROJECT_DIR
+from deadline import Deadline, DeadlineExceeded
+from leases import AccountLease, LeaseLost
+from cookie_watcher import register_reload
+from promotion_archive import PromotionArchive
+from epic_auto_claimer import AutoClaimer
+from notify_free_games import FreeGameNotifier
+import http_client
+import serialization
+
+RUNS_DIR = DATA_DIR / 'runs'
+ALERT_FILE = PROJECT_DIR / '.last_alert'
+ALERT_INTERVAL = 12 * 3600
+
+PROMOTION_PARAMS = {'locale': 'zh-CN', 'country': 'CN', 'allowCountries': 'CN'}
+
+
+class RunResult:
+    """What one orchestrated cycle did, stage by stage"""
+
+    def __init__(self, account):
+        self.account = account
+        self.started = datetime.now().isoformat(timespec='seconds')
+        self.finished = None
+        self.stages = {}
+        self.games = []
+        self.owned = []
+        self.claimed = []
+        self.already_owned = []
+        self.failed = []
+        self.notified = []
+        self.errors = []
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage; an exception marks it failed instead of aborting the run"""
+        entry = self.stages[name] = {'status': 'ok'}
+        start = time.monotonic()
+        try:
+            yield entry
+        except DeadlineExceeded as e:
+            entry['status'] = 'deadline'
+            self.errors.append(f"{name}: {e}")
+        except Exception as e:
+            entry['status'] = 'failed'
+            entry['error'] = f"{type(e).__name__}: {e}"
+            self.errors.append(f"{name}: {entry['error']}")
+        finally:
+            entry['seconds'] = round(time.monotonic() - start, 3)
+
+    def skip(self, name, reason):
+        self.stages[name] = {'status': 'skipped', 'reason': reason}
+
+    def succeeded(self, name):
+        return self.stages.get(name, {}).get('status') == 'ok'
+
+    @property
+    def ok(self):
+        return not self.errors and not self.failed
+
+    def alert_type(self):
+        """'failure', 'success' (something was claimed) or None"""
+        if not self.ok:
+            return 'failure'
+        if self.claimed:
+            return 'success'
+        return None
+
+    def to_dict(self):
+        return {
+            'account': self.account,
+            'started': self.started,
+            'finished': self.finished,
+            'ok': self.ok,
+            'stages': self.stages,
+            'games': self.games,
+            'owned': self.owned,
+            'claimed': self.claimed,
+            'already_owned': self.already_owned,
+            'failed': self.failed,
+            'notified': self.notified,
+            'errors': self.errors,
+        }
+
+    def describe(self):
+        lines = [f"Run {self.started} - {'OK' if self.ok else 'FAILED'}"]
+        for name, stage in self.stages.items():
+            detail = stage.get('error') or stage.get('reason') or stage.get('detail') or ''
+            took = f" {stage['seconds']:.1f}s" if 'seconds' in stage else ''
+            lines.append(f"  {name:<10} {stage['status']}{took} {detail}".rstrip())
+        lines.append(f"Free games: {', '.join(g['title'] for g in self.games) or '-'}")
+        if self.claimed:
+            lines.append(f"Claimed: {', '.join(self.claimed)}")
+        if self.failed:
+            lines.append("Failed: " + ', '.join(f"{f['title']} ({f['error']})" for f in self.failed))
+        if self.notified:
+            lines.append(f"Notified: {', '.join(self.notified)}")
+        for error in self.errors:
+            lines.append(f"Error: {error}")
+        return '\n'.join(lines)
+
+
+def last_run_file(account, runs_dir=RUNS_DIR):
+    """runs/<account>/last_run.json: the account's latest result, whoever ran since"""
+    return runs_dir / account / 'last_run.json'
+
+
+def save_result(result, runs_dir=RUNS_DIR):
+    serialization.dump(runs_dir / 'last_run.json', result.to_dict(), pretty=True)
+    serialization.dump(last_run_file(result.account, runs_dir), result.to_dict(), pretty=True)
+    with open(runs_dir / 'history.jsonl', 'a', encoding='utf-8') as f:
+        f.write(serialization.dumps(result.to_dict()).decode('utf-8') + '\n')
+
+
+class Orchestrator:
+    """Claimer and notifier as stages of one run for the default account"""
+
+    def __init__(self, account='default'):
+        self.account = account
+        self.claimer = AutoClaimer(account)
+        self.notifier = FreeGameNotifier(account)
+        self.api = self.claimer.api
+        self.log_file = self.notifier.base_dir / 'orchestrator.log'
+
+    def log(self, message):
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        log_msg = f"[{timestamp}] {message}"
+        print(log_msg)
+        try:
+            with open(self.log_file, 'a', encoding='utf-8') as f:
+                f.write(log_msg + '\n')
+        except OSError:
+            pass
+
+    def run(self, force=False, pipeline=False, claim=True, notify=True, alert=True, deadline=None):
+        """One full cycle; returns its RunResult (also saved under claimer/data/runs/)"""
+        result = RunResult(self.account)
+        deadline = deadline or Deadline()
+        http_client.reset_run_metrics()
+        # A long-lived orchestrator (the service) picks up what cron/fleet runs recorded meanwhile
+        self.api.journal.reload()
+        self.api.method_stats.reload()
+        self.api.deadline = self.api.ownership.deadline = deadline
+        self.notifier.deadline = deadline
+
+        lease = AccountLease(self.account, 'orchestrator')
+        if lease.acquire():
+            self.api.lease = lease
+            try:
+                self._run(result, force, pipeline, claim, notify)
+            finally:
+                self.api.lease = None
+                self.claimer.save_session_cookies()
+                http_client.tracker.save()
+                lease.release()
+        else:
+            self.log(f"⏭️  Account busy: {lease.describe_blocker()}, skipping this run")
+            result.skip('run', f"account busy: {lease.describe_blocker()}")
+
+        if alert:
+            with result.stage('alert') as stage:
+                stage['detail'] = self.send_alert(result)
+        result.finished = datetime.now().isoformat(timespec='seconds')
+        save_result(result)
+        return result
+
+    def _run(self, result, force, pipeline, claim, notify):
+        deadline = self.api.deadline
+
+        with result.stage('session'):
+            self.api.load_cookies()
+            register_reload(self.claimer.reload_cookies, 'orchestrator')
+        has_session = result.succeeded('session')
+        if has_session:
+            # The notifier works on the claimer's session: same cookies, pool and write-back
+            self.notifier.session = self.api.session
+
+        with result.stage('fetch') as stage:
+            data = http_client.fetch_promotions_json(self.api.session, PROMOTION_PARAMS,
+                                                     timeout=deadline.timeout(30), deadline=deadline)
+            fetch_stats = http_client.run_metrics().describe()
+            if fetch_stats:
+                stage['detail'] = fetch_stats
+        if not result.succeeded('fetch'):
+            return
+
+        # One payload, parsed for both consumers
+        claim_games = self.api.parse_free_games(data)
+        notify_games = self.notifier.parse_free_games(data)
+        result.games = [{'id': g['id'], 'title': g['title'], 'end_date': g['end_date']} for g in notify_games]
+        if not notify_games:
+            result.errors.append("fetch: no free games found")
+            return
+        self.log(f"🎮 {len(notify_games)} free game(s): {', '.join(g['title'] for g in notify_games)}")
+
+        if deadline.allows('enrichment'):
+            with result.stage('archive') as stage:
+                stage['added'] = PromotionArchive().append(notify_games, 'CN')
+        else:
+            result.skip('archive', 'run budget low')
+
+        owned = {}
+        if not has_session:
+            result.skip('ownership', 'no cookies')
+        elif not deadline.allows('ownership'):
+            result.skip('ownership', 'run budget low')
+        else:
+            with result.stage('ownership'):
+                owned = self.api.ownership.owned(notify_games)
+        result.owned = [g['title'] for g in notify_games if owned.get(g['id'])]
+
+        owned_ids = set()
+        if not claim:
+            result.skip('claim', 'disabled')
+        elif not has_session:
+            result.skip('claim', 'no cookies')
+        else:
+            owned_ids = self._claim(result, claim_games, owned, force, pipeline)
+
+        if self.api.lease.lost:
+            # Another run took the account over: it notifies, not this one
+            result.errors.append(f"lease: {LeaseLost.__name__}, run aborted")
+            return
+
+        if not notify:
+            result.skip('notify', 'disabled')
+        else:
+            status = dict(owned, **{offer_id: True for offer_id in owned_ids})
+            self._notify(result, notify_games, status, force)
+
+    def _claim(self, result, games, owned, force, pipeline):
+        """Claim stage; returns the offer ids it found owned (claimed now or already owned)"""
+        delta = self.claimer.snapshots.diff(games)
+        targets = games if force else [g for g in games if g['id'] in delta.changed_ids]
+        # Already owned per the bulk check or marked by hand: no claim request needed
+        marked = set(self.notifier.load_owned_games())
+        targets = [g for g in targets if not owned.get(g['id']) and g['id'] not in marked]
+        if not targets:
+            if not delta.is_empty():
+                self.claimer.snapshots.commit(games)
+            result.skip('claim', 'nothing new to claim')
+            return set()
+
+        claims = {'claimed_ids': [], 'already_owned_ids': []}
+        with result.stage('claim') as stage:
+            claims = self.claimer.claim(targets, games, pipeline)
+            result.claimed = claims['claimed']
+            result.already_owned = claims['already_owned']
+            result.failed = claims['failed']
+            stage['attempted'] = len(targets)
+        return set(claims['claimed_ids']) | set(claims['already_owned_ids'])
+
+    def _notify(self, result, games, owned, force):
+        delta = self.notifier.snapshots.diff(games)
+        if delta.is_empty() and not force:
+            result.skip('notify', 'promotions unchanged')
+            return
+        targets = games if force else [g for g in games if g['id'] in delta.changed_ids]
+
+        with result.stage('notify'):
+            sent = self.notifier.notify_games(targets, owned)
+            result.notified = [g['title'] for g in sent]
+            if self.notifier.failed_ids:
+                raise RuntimeError("notification email not sent")
+        self.notifier.snapshots.commit(games, self.notifier.failed_ids)
+
+    def send_alert(self, result):
+        """Email a success/failure alert built from the run result; returns the stage status"""
+        kind = result.alert_type()
+        if kind is None:
+            return 'nothing to report'
+
+        if kind == 'failure' and ALERT_FILE.exists():
+            try:
+                last = int(ALERT_FILE.read_text().strip()) / 1000
+            except ValueError:
+                last = 0
+            if time.time() - last < ALERT_INTERVAL:
+                return 'throttled'
+
+        smtp = self.notifier.smtp_config
+        if not smtp['user'] or not smtp['pass']:
+            self.log("⚠️  Email not configured, skipping alert")
+            return 'email not configured'
+
+        if kind == 'success':
+            subject = f"🎁 Claimed {len(result.claimed)} free game(s): {', '.join(result.claimed)}"
+        else:
+            subject = '⚠️ Epic Games Auto-Claimer Alert'
+        msg = MIMEText(result.describe(), 'plain', 'utf-8')
+        msg['From'] = f"Epic Claimer Bot <{smtp['user']}>"
+        msg['To'] = smtp['to']
+        msg['Subject'] = subject
+
+        with self.notifier.smtp_connection(self.api.deadline.timeout(30)) as server:
+            server.send_message(msg)
+
+        if kind == 'failure':
+            # Milliseconds, like alert_mailer.js, so both share one throttle
+            ALERT_FILE.write_text(str(int(time.time() * 1000)))
+        self.log(f"📨 Sent {kind} alert to {smtp['to']}")
+        return 'ok'
+
+
+def main():
+    args = sys.argv[1:]
+    orchestrator = Orchestrator()
+    result = orchestrator.run(
+        force='--force' in args,
+        pipeline='--pipeline' in args,
+        claim='--no-claim' not in args,
+        notify='--no-notify' not in args,
+        alert='--no-alert' not in args,
+        deadline=Deadline.from_argv(args),
+    )
+    orchestrator.log("\n" + result.describe())
+    sys.exit(0 if result.ok else 1)
+
+
+if __name__ == '__main__':
+    main()
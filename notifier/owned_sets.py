@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Owned Sets - Compact ownership sets shared by many accounts in one process
+- Namespace and catalog item ids are interned once per process into small
+  integers, so strings that repeat across accounts are stored once
+- Each account keeps a sorted array('I') of those integers (4 bytes per
+  entry instead of a set slot plus a string)
+- Membership of the current free games is answered for all accounts in one
+  vectorized numpy searchsorted when numpy is installed, bisect otherwise
+"""
+import sys
+import bisect
+import threading
+from array import array
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Id that is never assigned: strings no account owns map to it
+MISSING = 0xFFFFFFFF
+
+
+class Interner:
+    """Process-wide string <-> integer table"""
+
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+        self.lock = threading.Lock()
+
+    def intern(self, string):
+        with self.lock:
+            value = self.ids.get(string)
+            if value is None:
+                value = self.ids[string] = len(self.strings)
+                self.strings.append(string)
+            return value
+
+    def lookup(self, string):
+        """Id of a string, MISSING if it was never interned"""
+        return self.ids.get(string, MISSING)
+
+    def __len__(self):
+        return len(self.strings)
+
+    def nbytes(self):
+        return (sys.getsizeof(self.ids) + sys.getsizeof(self.strings)
+                + sum(sys.getsizeof(s) for s in self.strings))
+
+
+NAMESPACES = Interner()
+ITEMS = Interner()
+
+
+class OwnedSet:
+    """Set of interned strings stored as a sorted array of ids
+
+    Behaves like the set of strings it replaces: `in`, add, update, len and
+    iteration (which yields the strings back).
+    """
+
+    def __init__(self, interner, strings=()):
+        self.interner = interner
+        self.ids = array('I', sorted({interner.intern(s) for s in strings}))
+
+    def __contains__(self, string):
+        value = self.interner.lookup(string)
+        i = bisect.bisect_left(self.ids, value)
+        return i < len(self.ids) and self.ids[i] == value
+
+    def add(self, string):
+        value = self.interner.intern(string)
+        i = bisect.bisect_left(self.ids, value)
+        if i == len(self.ids) or self.ids[i] != value:
+            self.ids.insert(i, value)
+
+    def update(self, strings):
+        for string in strings:
+            self.add(string)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return (self.interner.strings[value] for value in self.ids)
+
+    def nbytes(self):
+        return sys.getsizeof(self.ids)
+
+
+def membership(sets, strings):
+    """rows[i][j] = strings[j] in sets[i], for OwnedSets sharing one interner"""
+    if not sets or not strings:
+        return [[False] * len(strings) for _ in sets]
+    interner = sets[0].interner
+    keys = [interner.lookup(s) for s in strings]
+
+    if NUMPY_AVAILABLE and any(len(owned) for owned in sets):
+        # One sorted array of (row << 32 | id) for all accounts, one searchsorted for every query
+        packed = np.concatenate([
+            (np.uint64(row) << np.uint64(32)) | np.frombuffer(owned.ids, dtype=np.uint32).astype(np.uint64)
+            for row, owned in enumerate(sets) if len(owned)
+        ])
+        queries = ((np.arange(len(sets), dtype=np.uint64)[:, None] << np.uint64(32))
+                   | np.array(keys, dtype=np.uint64)[None, :])
+        found = np.searchsorted(packed, queries)
+        hit = np.take(packed, np.minimum(found, len(packed) - 1)) == queries
+        return hit.tolist()
+
+    rows = []
+    for owned in sets:
+        ids = owned.ids
+        row = []
+        for key in keys:
+            i = bisect.bisect_left(ids, key)
+            row.append(i < len(ids) and ids[i] == key)
+        rows.append(row)
+    return rows
+
+
+def set_nbytes(strings):
+    """Memory of the same strings held as a plain Python set (for comparison)"""
+    return sys.getsizeof(set(strings)) + sum(sys.getsizeof(s) for s in strings)
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Ownership Service - Which free games an account already owns
+- One bulk entitlements fetch per account, shared by the notifier and the claimers
+- Cached in memory and on disk (per account, with a TTL)
+- A successful claim updates the cached entry instead of forcing a refetch
+- Offers with known catalog items are decided exactly (all items owned);
+  otherwise by namespace
+- Per-offer GraphQL lookup only for ambiguous cases (add-ons in an owned
+  namespace without item data, or no entitlements available)
+- Owned namespaces/items are interned OwnedSets, so many accounts in one
+  process stay small; `python3 ownership.py` checks the current free games
+  for every cached account at once and reports memory per account
+"""
+import os
+import sys
+import time
+import threading
+
+from accounts import DATA_DIR, account_id_from_token, list_accounts
+from owned_sets import OwnedSet, NAMESPACES, ITEMS, membership, set_nbytes
+from offer_index import OfferIndex
+from deadline import Deadline
+from streaming_json import iter_items, response_chunks, ENTITLEMENT_FIELDS
+import serialization
+
+OWNERSHIP_DIR = DATA_DIR / 'ownership'
+OWNERSHIP_TTL = int(os.getenv('OWNERSHIP_TTL', 6 * 3600))
+
+ENTITLEMENTS_URL = 'https://entitlement-public-service-prod08.ol.epicgames.com/entitlement/api/account/{account_id}/entitlements'
+GRAPHQL_URL = 'https://graphql.epicgames.com/graphql'
+PAGE_SIZE = 5000
+
+# Offer types whose namespace match is enough to call the game owned
+BASE_OFFER_TYPES = {None, '', 'BASE_GAME', 'BUNDLE', 'OTHERS'}
+
+OWNED_QUERY = """
+query getOwnedGames($namespace: String!, $offerId: String!) {
+    Catalog {
+        catalogOffer(namespace: $namespace, id: $offerId, locale: "zh-CN") {
+            id
+            namespace
+            title
+            ownedInformation {
+                owned
+                quantity
+            }
+        }
+    }
+}
+"""
+
+# Shared across services in one process: account -> entitlements entry
+_memory = {}
+_memory_lock = threading.Lock()
+# account -> lock held while that account's entry is loaded or fetched,
+# so a slow fetch for one account never blocks the others
+_account_locks = {}
+
+
+def _account_lock(account):
+    with _memory_lock:
+        return _account_locks.setdefault(account, threading.Lock())
+
+
+def _load_entry(cache_file):
+    """Entitlements entry from a disk cache file, None if missing or corrupt"""
+    if not cache_file.exists():
+        return None
+    try:
+        data = serialization.load(cache_file)
+        data['namespaces'] = OwnedSet(NAMESPACES, data['namespaces'])
+        data['items'] = OwnedSet(ITEMS, data['items'])
+        return data
+    except Exception:
+        return None
+
+
+def check_offer_graphql(session, namespace, offer_id, timeout=30):
+    """Per-offer ownership via GraphQL: True/False, None if unknown"""
+    response = session.post(
+        GRAPHQL_URL,
+        json={'query': OWNED_QUERY, 'variables': {'namespace': namespace, 'offerId': offer_id}},
+        timeout=timeout
+    )
+    if response.status_code != 200:
+        return None
+    offer = (serialization.loads(response.content).get('data') or {}).get('Catalog', {}).get('catalogOffer') or {}
+    return (offer.get('ownedInformation') or {}).get('owned', False)
+
+
+class OwnershipService:
+    """Bulk, cached ownership lookups for one account's session"""
+
+    def __init__(self, session, account='default', ttl=OWNERSHIP_TTL,
+                 cache_dir=OWNERSHIP_DIR, index=None, deadline=None, log=print):
+        self.session = session
+        self.deadline = deadline or Deadline(None)
+        self.index = index or OfferIndex()
+        self.account = account
+        self.ttl = ttl
+        self.cache_file = cache_dir / f"{account}.json"
+        self.log = log
+
+    def account_id(self):
+        return account_id_from_token(self.session.cookies.get('EPIC_EG1'))
+
+    # ---- cache ----------------------------------------------------------
+
+    def _fresh(self, entry, account_id):
+        return (
+            entry is not None
+            and entry.get('account_id') == account_id
+            and time.time() - entry.get('fetched', 0) < self.ttl
+        )
+
+    def _load_disk(self):
+        return _load_entry(self.cache_file)
+
+    def _save_disk(self, entry):
+        data = dict(entry, namespaces=sorted(entry['namespaces']), items=sorted(entry['items']))
+        serialization.dump(self.cache_file, data)
+
+    def _fetch(self, account_id):
+        """All entitlements, paged; None if the API is unavailable"""
+        url = ENTITLEMENTS_URL.format(account_id=account_id)
+        namespaces, items = set(), set()
+        start = 0
+        while True:
+            response = self.session.get(url, params={'start': start, 'count': PAGE_SIZE},
+                                        timeout=self.deadline.timeout(10), stream=True)
+            if response.status_code != 200:
+                self.log(f"⚠️  Entitlements API returned {response.status_code}")
+                return None
+
+            # Streamed: only namespace/catalogItemId of each entitlement are decoded.
+            # Every record counts toward the page size, malformed ones included,
+            # so one bad record on a full page doesn't end the paging early.
+            count = 0
+            for item in iter_items(response_chunks(response), [], ENTITLEMENT_FIELDS):
+                count += 1
+                try:
+                    item = serialization.validate(item, 'entitlement')
+                except serialization.SchemaError:
+                    continue
+                if 'namespace' in item:
+                    namespaces.add(item['namespace'])
+                if 'catalogItemId' in item:
+                    items.add(item['catalogItemId'])
+            if count < PAGE_SIZE:
+                break
+            start += PAGE_SIZE
+
+        return {'account_id': account_id, 'fetched': time.time(),
+                'namespaces': OwnedSet(NAMESPACES, namespaces), 'items': OwnedSet(ITEMS, items)}
+
+    def entitlements(self, live=False):
+        """Cached entitlements entry ({namespaces, items, ...}), or None if unavailable
+
+        live=True skips both caches and refetches (the result is cached again).
+        """
+        account_id = self.account_id()
+        if not account_id:
+            self.log("⚠️  Could not extract account_id from token")
+            return None
+
+        with _account_lock(self.account):
+            with _memory_lock:
+                entry = _memory.get(self.account)
+            if not live and self._fresh(entry, account_id):
+                return entry
+
+            entry = None if live else self._load_disk()
+            if not self._fresh(entry, account_id):
+                try:
+                    entry = self._fetch(account_id)
+                except Exception as e:
+                    self.log(f"⚠️  Entitlements API failed: {e}")
+                    entry = None
+                if entry is None:
+                    return None
+                self._save_disk(entry)
+                self.log(f"✅ Checked entitlements: {len(entry['namespaces'])} namespaces, {len(entry['items'])} items")
+
+            with _memory_lock:
+                _memory[self.account] = entry
+            return entry
+
+    def record_claim(self, game):
+        """A claim went through: mark it owned in the cache (memory and disk)"""
+        with _account_lock(self.account):
+            with _memory_lock:
+                entry = _memory.get(self.account)
+            entry = entry or self._load_disk()
+            if entry is None:
+                return
+            entry['namespaces'].add(game['namespace'])
+            entry['items'].update(game.get('items') or self.index.items(game['id']))
+            with _memory_lock:
+                _memory[self.account] = entry
+            self._save_disk(entry)
+
+    def invalidate(self):
+        """Forget the cached entitlements; the next lookup refetches"""
+        with _account_lock(self.account):
+            with _memory_lock:
+                _memory.pop(self.account, None)
+            if self.cache_file.exists():
+                self.cache_file.unlink()
+
+    # ---- lookups --------------------------------------------------------
+
+    def _from_entry(self, entry, game):
+        """True/False from the bulk entitlements, None when ambiguous"""
+        if entry is None:
+            return None
+        items = game.get('items') or self.index.items(game['id'])
+        if items:
+            return all(item in entry['items'] for item in items)
+        if game.get('namespace') not in entry['namespaces']:
+            return False
+        # Owning something in the namespace proves the base game, not an add-on
+        if game.get('offerType') in BASE_OFFER_TYPES:
+            return True
+        return None
+
+    def _check_offer(self, game):
+        try:
+            return check_offer_graphql(self.session, game['namespace'], game['id'],
+                                       timeout=self.deadline.timeout(30))
+        except Exception as e:
+            self.log(f"⚠️  Error checking ownership: {e}")
+            return None
+
+    def is_owned(self, game, live=False):
+        """True/False, or None if even the per-offer fallback could not tell
+
+        live=True asks Epic instead of the caches (a cached "not owned" may
+        predate a claim whose outcome is unknown).
+        """
+        self.index.learn([game])
+        owned = self._from_entry(self.entitlements(live), game)
+        return owned if owned is not None else self._check_offer(game)
+
+    def owned(self, games):
+        """{offer id: True/False/None} with one bulk fetch for the whole list"""
+        self.index.learn(games)
+        entry = self.entitlements()
+        status = {}
+        for game in games:
+            owned = self._from_entry(entry, game)
+            status[game['id']] = owned if owned is not None else self._check_offer(game)
+        return status
+
+
+# ---- many accounts ----------------------------------------------------------
+
+def cached_entries(accounts, ttl=OWNERSHIP_TTL, cache_dir=OWNERSHIP_DIR):
+    """{account: entry} from memory or the disk cache (no network); stale or missing ones are left out"""
+    entries = {}
+    with _memory_lock:
+        for account in accounts:
+            entry = _memory.get(account)
+            if entry is None:
+                entry = _load_entry(cache_dir / f"{account}.json")
+                if entry is not None:
+                    _memory[account] = entry
+            if entry is not None and time.time() - entry.get('fetched', 0) < ttl:
+                entries[account] = entry
+    return entries
+
+
+def owned_across(entries, games, index=None):
+    """{account: {offer id: True/False/None}} for all accounts at once
+
+    Same rules as OwnershipService._from_entry, but the namespace and item
+    lookups for every account and game are one membership() call each.
+    """
+    index = index or OfferIndex()
+    accounts = list(entries)
+    game_items = [game.get('items') or index.items(game['id']) for game in games]
+    namespaces = [game.get('namespace') for game in games]
+    items = sorted({item for items in game_items for item in items})
+
+    ns_rows = membership([entries[a]['namespaces'] for a in accounts], namespaces)
+    item_rows = membership([entries[a]['items'] for a in accounts], items)
+    column = {item: j for j, item in enumerate(items)}
+
+    status = {}
+    for account, ns_row, item_row in zip(accounts, ns_rows, item_rows):
+        decided = status[account] = {}
+        for g, game in enumerate(games):
+            if game_items[g]:
+                decided[game['id']] = all(item_row[column[item]] for item in game_items[g])
+            elif not ns_row[g]:
+                decided[game['id']] = False
+            else:
+                decided[game['id']] = True if game.get('offerType') in BASE_OFFER_TYPES else None
+    return status
+
+
+def memory_report(entries):
+    """{account: (bytes as OwnedSets, bytes as plain string sets)} plus the shared intern tables"""
+    report = {}
+    for account, entry in entries.items():
+        compact = entry['namespaces'].nbytes() + entry['items'].nbytes()
+        plain = set_nbytes(list(entry['namespaces'])) + set_nbytes(list(entry['items']))
+        report[account] = (compact, plain)
+    return report, NAMESPACES.nbytes() + ITEMS.nbytes()
+
+
+def main():
+    from promotion_snapshot import SnapshotStore
+
+    names = sys.argv[1:] or [account.name for account in list_accounts()]
+    entries = cached_entries(names)
+    if not entries:
+        print("❌ No fresh cached entitlements (run the notifier or claimer first)")
+        sys.exit(1)
+
+    _, offers = SnapshotStore('notifier').load()
+    games = [dict(offer, id=offer_id) for offer_id, offer in offers.items()]
+    start = time.perf_counter()
+    status = owned_across(entries, games)
+    elapsed = time.perf_counter() - start
+
+    print(f"🎮 {len(games)} free game(s) x {len(entries)} account(s) in {elapsed * 1000:.1f}ms")
+    for account, decided in status.items():
+        for game in games:
+            owned = decided[game['id']]
+            mark = '✅ owned' if owned else ('❓ unknown' if owned is None else '⬜ not owned')
+            print(f"   {account}: {mark} - {game.get('title') or game['id']}")
+
+    report, shared = memory_report(entries)
+    print(f"\n💾 Memory (shared intern tables: {shared / 1024:.1f} KB)")
+    for account, (compact, plain) in report.items():
+        print(f"   {account}: {compact / 1024:.1f} KB (as string sets: {plain / 1024:.1f} KB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Promotion Archive - Every free game Epic has ever given away, per region
+- Append-only columnar store: one fixed-width array file per column
+- Strings (offer ids, namespaces, titles, regions) interned into a string table,
+  with a sorted hash index (strings.idx) for lookups by value
+- Appends are serialized across processes with an flock on the archive
+- Queries memory-map the columns instead of loading rows into Python objects
+  (vectorized with numpy when it is installed)
+
+Usage:
+  python3 promotion_archive.py recent [weeks] [--region CN]
+  python3 promotion_archive.py repeats [--region CN]
+  python3 promotion_archive.py stats [--region CN]
+"""
+import os
+import sys
+import mmap
+import time
+import struct
+import bisect
+import hashlib
+from array import array
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from accounts import DATA_DIR
+import serialization
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+ARCHIVE_DIR = DATA_DIR / 'archive'
+
+# column name -> array typecode (all little-endian, fixed width)
+COLUMNS = {
+    'offer': 'I',
+    'namespace': 'I',
+    'title': 'I',
+    'region': 'I',
+    'currency': 'I',
+    'start': 'q',
+    'end': 'q',
+    'price': 'q',
+}
+
+NUMPY_TYPES = {'I': '<u4', 'q': '<i8', 'Q': '<u8'}
+
+
+def string_hash(value):
+    """64-bit key of a string in strings.idx"""
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def parse_timestamp(value):
+    """Epic ISO date ('2026-02-19T16:00:00.000Z') -> epoch seconds, 0 if missing"""
+    if not value:
+        return 0
+    try:
+        return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp())
+    except ValueError:
+        return 0
+
+
+class ColumnFile:
+    """A read-only memory map of one column, trimmed to the committed row count"""
+
+    def __init__(self, path, typecode, rows):
+        self.typecode = typecode
+        self._file = None
+        self._mmap = None
+        self._views = []
+        self.values = memoryview(b'').cast(typecode)
+
+        if rows and path.exists() and path.stat().st_size:
+            self._file = open(path, 'rb')
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            raw = memoryview(self._mmap)
+            # Cast only the committed rows: a torn tail from a crashed append
+            # need not be a whole number of items
+            itemsize = self.values.itemsize
+            committed = raw[:min(rows, len(raw) // itemsize) * itemsize]
+            self.values = committed.cast(typecode)
+            self._views = [self.values, committed, raw]
+
+    def numpy(self):
+        if self._mmap is None:
+            return np.zeros(0, dtype=NUMPY_TYPES[self.typecode])
+        return np.frombuffer(self._mmap, dtype=NUMPY_TYPES[self.typecode], count=len(self.values))
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # A numpy array still references the map; it closes when collected
+                pass
+            self._file.close()
+
+
+class PromotionArchive:
+    """Columnar, append-only archive of parsed promotions"""
+
+    def __init__(self, archive_dir=ARCHIVE_DIR):
+        self.dir = Path(archive_dir)
+        self.meta_file = self.dir / 'meta.json'
+        self.strings_data = self.dir / 'strings.dat'
+        self.strings_offsets = self.dir / 'strings.off'
+        self.strings_index = self.dir / 'strings.idx'
+        self.lock_file = self.dir / 'archive.lock'
+        self._string_cache = {}
+
+    # ---- metadata -------------------------------------------------------
+
+    def _meta(self):
+        if not self.meta_file.exists():
+            return {'rows': 0, 'strings': 0}
+        return serialization.load(self.meta_file)
+
+    def _save_meta(self, meta):
+        tmp = self.meta_file.with_suffix('.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(serialization.dumps(meta))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.meta_file)
+
+    def __len__(self):
+        return self._meta()['rows']
+
+    @contextmanager
+    def locked(self):
+        """Exclusive advisory lock held by every process appending to this archive"""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_file, 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    # ---- string table ---------------------------------------------------
+
+    def _load_strings(self, count):
+        """All interned strings (write path only; queries resolve lazily)"""
+        if not count:
+            return []
+        offsets = array('Q')
+        with open(self.strings_offsets, 'rb') as f:
+            offsets.fromfile(f, count + 1)
+        data = self.strings_data.read_bytes()
+        return [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(count)]
+
+    def strings(self, string_ids):
+        """{id: string} for a batch of ids, reading just their offsets and bytes"""
+        missing = sorted(set(string_ids) - self._string_cache.keys())
+        if missing:
+            with open(self.strings_offsets, 'rb') as offsets, open(self.strings_data, 'rb') as data:
+                for string_id in missing:
+                    offsets.seek(string_id * 8)
+                    start, end = struct.unpack('<QQ', offsets.read(16))
+                    data.seek(start)
+                    self._string_cache[string_id] = data.read(end - start).decode('utf-8')
+        return {string_id: self._string_cache[string_id] for string_id in string_ids}
+
+    def string(self, string_id):
+        """Resolve one string id"""
+        return self.strings([string_id])[string_id]
+
+    def string_id(self, value):
+        """Id of an existing string, or None (binary search of strings.idx)"""
+        count = self._meta()['strings']
+        if not count:
+            return None
+        try:
+            with open(self.strings_index, 'rb') as f:
+                pairs = array('Q')
+                pairs.frombytes(f.read())
+        except OSError:
+            pairs = array('Q')
+        if len(pairs) != 2 * count:
+            # Archive written before the index existed (the next append adds it)
+            try:
+                return self._load_strings(count).index(value)
+            except ValueError:
+                return None
+
+        key = string_hash(value)
+        hashes = pairs[0::2]
+        i = bisect.bisect_left(hashes, key)
+        while i < count and hashes[i] == key:
+            if self.string(pairs[2 * i + 1]) == value:
+                return pairs[2 * i + 1]
+            i += 1
+        return None
+
+    def _write_index(self, index):
+        """strings.idx: (hash, id) pairs sorted by hash, replaced atomically"""
+        pairs = array('Q')
+        for key, string_id in sorted((string_hash(value), string_id) for value, string_id in index.items()):
+            pairs.extend((key, string_id))
+        serialization.atomic_write(self.strings_index, pairs.tobytes())
+
+    # ---- write path -----------------------------------------------------
+
+    def append(self, games, region):
+        """Append promotions not archived yet; returns the number of new rows
+
+        A row is identified by (offer, region, start). Column files are
+        appended first and meta.json (the committed row count) last, so a
+        crash mid-append leaves a tail that readers ignore and the next
+        append overwrites. Concurrent appends (notifier, orchestrator,
+        service) take turns under the archive lock.
+        """
+        with self.locked():
+            return self._append(games, region)
+
+    def _append(self, games, region):
+        meta = self._meta()
+        rows = meta['rows']
+
+        strings = self._load_strings(meta['strings'])
+        index = {s: i for i, s in enumerate(strings)}
+        new_strings = []
+
+        def intern(value):
+            value = value or ''
+            if value not in index:
+                index[value] = len(index)
+                new_strings.append(value)
+            return index[value]
+
+        existing = set()
+        if rows:
+            cols = self.open_columns('offer', 'region', 'start')
+            existing = set(zip(cols['offer'].values, cols['region'].values, cols['start'].values))
+            for col in cols.values():
+                col.close()
+
+        new_rows = {name: array(code) for name, code in COLUMNS.items()}
+        for game in games:
+            if not game.get('id'):
+                continue
+            start = parse_timestamp(game.get('start_date'))
+            record = {
+                'offer': intern(game['id']),
+                'namespace': intern(game.get('namespace')),
+                'title': intern(game.get('title')),
+                'region': intern(region),
+                'currency': intern(game.get('currency')),
+                'start': start,
+                'end': parse_timestamp(game.get('end_date')),
+                'price': int(game.get('original_price') or 0),
+            }
+            key = (record['offer'], record['region'], start)
+            if key in existing:
+                continue
+            existing.add(key)
+            for name, value in record.items():
+                new_rows[name].append(value)
+
+        added = len(new_rows['offer'])
+        if not added:
+            return 0
+
+        if new_strings:
+            self._append_strings(meta['strings'], new_strings)
+        if new_strings or not self.strings_index.exists() or self.strings_index.stat().st_size != 16 * len(index):
+            self._write_index(index)
+
+        for name, values in new_rows.items():
+            path = self.dir / f"{name}.col"
+            with open(path, 'r+b' if path.exists() else 'wb') as f:
+                f.seek(rows * values.itemsize)
+                f.truncate()
+                values.tofile(f)
+
+        meta.update(rows=rows + added, strings=meta['strings'] + len(new_strings))
+        self._save_meta(meta)
+        return added
+
+    def _append_strings(self, count, new_strings):
+        """strings.off always holds count + 1 offsets, starting with 0"""
+        end = 0
+        if count:
+            with open(self.strings_offsets, 'rb') as f:
+                f.seek(count * 8)
+                end, = struct.unpack('<Q', f.read(8))
+
+        new_offsets = array('Q', [] if count else [0])
+        with open(self.strings_data, 'r+b' if self.strings_data.exists() else 'wb') as f:
+            f.seek(end)
+            f.truncate()
+            for value in new_strings:
+                data = value.encode('utf-8')
+                f.write(data)
+                end += len(data)
+                new_offsets.append(end)
+
+        with open(self.strings_offsets, 'r+b' if self.strings_offsets.exists() else 'wb') as f:
+            f.seek((count + 1) * 8 if count else 0)
+            f.truncate()
+            new_offsets.tofile(f)
+
+    # ---- read path ------------------------------------------------------
+
+    def open_columns(self, *names):
+        rows = self._meta()['rows']
+        return {name: ColumnFile(self.dir / f"{name}.col", COLUMNS[name], rows) for name in names}
+
+    def _select(self, mask_fn, *names, region=None):
+        """Row indexes matching mask_fn(columns), optionally for one region"""
+        names = set(names) | ({'region'} if region else set())
+        cols = self.open_columns(*names)
+        region_id = self.string_id(region) if region else None
+        if region and region_id is None:
+            for col in cols.values():
+                col.close()
+            return cols, []
+
+        if NUMPY_AVAILABLE:
+            arrays = {name: col.numpy() for name, col in cols.items()}
+            mask = mask_fn(arrays)
+            if region:
+                mask &= arrays['region'] == region_id
+            selected = np.nonzero(mask)[0].tolist()
+        else:
+            values = {name: col.values for name, col in cols.items()}
+            selected = [
+                i for i in range(len(next(iter(values.values()))))
+                if mask_fn({name: v[i] for name, v in values.items()})
+                and (not region or values['region'][i] == region_id)
+            ]
+        return cols, selected
+
+    def recent(self, weeks, region=None, now=None):
+        """Games that were free at any point in the last `weeks` weeks"""
+        now = now or time.time()
+        since = now - weeks * 7 * 86400
+        cols, rows = self._select(lambda c: (c['end'] >= since) & (c['start'] <= now),
+                                  'offer', 'title', 'start', 'end', region=region)
+        result = [
+            {
+                'title': self.string(cols['title'].values[i]),
+                'offer_id': self.string(cols['offer'].values[i]),
+                'start': cols['start'].values[i],
+                'end': cols['end'].values[i],
+            }
+            for i in rows
+        ]
+        for col in cols.values():
+            col.close()
+        return sorted(result, key=lambda r: r['start'], reverse=True)
+
+    def repeats(self, region=None):
+        """Namespaces given away more than once: [(title, times)]
+
+        A giveaway is one start time; the same one archived for several
+        regions counts once.
+        """
+        cols, rows = self._select(lambda c: c['namespace'] == c['namespace'],
+                                  'namespace', 'title', 'start', region=region)
+        starts = {}
+        titles = {}
+        for i in rows:
+            ns = cols['namespace'].values[i]
+            starts.setdefault(ns, set()).add(cols['start'].values[i])
+            titles[ns] = cols['title'].values[i]
+        for col in cols.values():
+            col.close()
+
+        repeated = [(self.string(titles[ns]), len(s)) for ns, s in starts.items() if len(s) > 1]
+        return sorted(repeated, key=lambda r: (-r[1], r[0]))
+
+    def offers(self):
+        """Distinct archived offers: [(offer id, namespace, title)], latest title per offer"""
+        if not len(self):
+            return []
+        cols = self.open_columns('offer', 'namespace', 'title')
+        latest = {}
+        for offer, namespace, title in zip(cols['offer'].values, cols['namespace'].values, cols['title'].values):
+            latest[offer] = (namespace, title)
+        for col in cols.values():
+            col.close()
+        # Only the strings these offers use, not the whole table
+        strings = self.strings({i for offer, pair in latest.items() for i in (offer, *pair)})
+        return [(strings[offer], strings[ns], strings[title]) for offer, (ns, title) in latest.items()]
+
+    def stats(self, region=None):
+        """Totals and average giveaway length (days)"""
+        cols, rows = self._select(lambda c: (c['end'] > c['start']) & (c['start'] > 0),
+                                  'offer', 'start', 'end', region=region)
+        if NUMPY_AVAILABLE and rows:
+            start, end = cols['start'].numpy()[rows], cols['end'].numpy()[rows]
+            total_length = int((end - start).sum())
+            offers = len(np.unique(cols['offer'].numpy()[rows]))
+        else:
+            total_length = sum(cols['end'].values[i] - cols['start'].values[i] for i in rows)
+            offers = len({cols['offer'].values[i] for i in rows})
+        for col in cols.values():
+            col.close()
+
+        return {
+            'giveaways': len(rows),
+            'distinct_offers': offers,
+            'average_days': total_length / len(rows) / 86400 if rows else 0,
+        }
+
+
+def main():
+    args = sys.argv[1:]
+    region = None
+    if '--region' in args:
+        i = args.index('--region')
+        region = args[i + 1].upper()
+        del args[i:i + 2]
+
+    archive = PromotionArchive()
+    command = args[0] if args else 'stats'
+    fmt = lambda ts: datetime.fromtimestamp(ts).strftime('%Y-%m-%d')
+
+    if command == 'recent':
+        weeks = float(args[1]) if len(args) > 1 else 4
+        games = archive.recent(weeks, region)
+        print(f"Free in the last {weeks:g} week(s): {len(games)}")
+        for game in games:
+            print(f"   {fmt(game['start'])} → {fmt(game['end'])}  {game['title']}")
+
+    elif command == 'repeats':
+        repeated = archive.repeats(region)
+        print(f"Repeat giveaways: {len(repeated)}")
+        for title, times in repeated:
+            print(f"   {times}x  {title}")
+
+    elif command == 'stats':
+        stats = archive.stats(region)
+        print(f"Archived giveaways: {stats['giveaways']} ({stats['distinct_offers']} distinct offers)")
+        print(f"Average giveaway length: {stats['average_days']:.1f} days")
+
+    else:
+        print(__doc__.strip().split('Usage:')[1])
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
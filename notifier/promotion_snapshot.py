@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Promotion Snapshot - Detect what changed since the last run
+- Normalizes the free-game list into {offer id: (namespace, title, end date)}
+- Stable content hash for the whole set
+- O(n) delta against the last committed snapshot: added, removed, end date changed
+"""
+import os
+import json
+import hashlib
+import tempfile
+from pathlib import Path
+
+from accounts import DATA_DIR
+import serialization
+
+SNAPSHOT_DIR = DATA_DIR / 'snapshots'
+
+
+def normalize(games):
+    """{offer id: {namespace, title, end_date}} - the fields that define a promotion"""
+    return {
+        game['id']: {
+            'namespace': game.get('namespace'),
+            'title': game.get('title'),
+            'end_date': game.get('end_date', ''),
+        }
+        for game in games
+        if game.get('id')
+    }
+
+
+def content_hash(normalized):
+    data = json.dumps(normalized, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+class Delta:
+    """Difference between two normalized promotion sets"""
+
+    def __init__(self, added, removed, changed):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+
+    @property
+    def changed_ids(self):
+        """Offers that need work this run (new or with a new end date)"""
+        return set(self.added) | set(self.changed)
+
+    def is_empty(self):
+        return not (self.added or self.removed or self.changed)
+
+    def __str__(self):
+        return f"+{len(self.added)} -{len(self.removed)} ~{len(self.changed)}"
+
+
+def diff(previous, current):
+    """O(n) delta between two normalized sets"""
+    added = [offer_id for offer_id in current if offer_id not in previous]
+    removed = [offer_id for offer_id in previous if offer_id not in current]
+    changed = [
+        offer_id for offer_id, promo in current.items()
+        if offer_id in previous and previous[offer_id]['end_date'] != promo['end_date']
+    ]
+    return Delta(added, removed, changed)
+
+
+class SnapshotStore:
+    """Last processed promotion set for one consumer (e.g. 'notifier')"""
+
+    def __init__(self, consumer, snapshot_dir=SNAPSHOT_DIR):
+        self.path = Path(snapshot_dir) / f"{consumer}.json"
+
+    def load(self):
+        """(hash, normalized set) of the last committed snapshot"""
+        if not self.path.exists():
+            return None, {}
+        try:
+            data = serialization.load(self.path)
+            return data.get('hash'), data.get('offers', {})
+        except Exception:
+            return None, {}
+
+    def diff(self, games):
+        """Delta between the current games and the last committed snapshot"""
+        current = normalize(games)
+        last_hash, previous = self.load()
+        if last_hash and last_hash == content_hash(current):
+            return Delta([], [], [])
+        return diff(previous, current)
+
+    def commit(self, games, exclude_ids=()):
+        """Record games as processed; excluded (failed) offers show up as added next run"""
+        exclude_ids = set(exclude_ids)
+        offers = {k: v for k, v in normalize(games).items() if k not in exclude_ids}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix='.snapshot-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(serialization.dumps({'hash': content_hash(offers), 'offers': offers}))
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter - Token bucket shared by worker threads
+"""
+import time
+import threading
+
+
+class RateLimiter:
+    """Allow `rate` requests per second on average, bursts of up to `burst`"""
+
+    def __init__(self, rate=1.0, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def wrap(self, func):
+        """func, but taking a token before every call"""
+        def limited(*args, **kwargs):
+            self.acquire()
+            return func(*args, **kwargs)
+        return limited
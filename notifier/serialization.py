@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Serialization - One JSON layer for state files and API bodies
+- orjson or msgspec when installed, stdlib json otherwise (JSON_BACKEND
+  forces one: orjson / msgspec / json)
+- Compact output by default; JSON_PRETTY=1 indents state files for reading
+- Typed schemas for promotion elements and entitlements: with msgspec,
+  decoding and validation are one step; otherwise a light type check
+- Content hashes (backups, snapshots) keep their own stdlib encoding so
+  existing hashes stay valid
+"""
+import os
+import json
+import tempfile
+from pathlib import Path
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+
+PRETTY = os.getenv('JSON_PRETTY', '') not in ('', '0')
+
+
+def _pick_backend():
+    wanted = os.getenv('JSON_BACKEND', '').lower()
+    if wanted == 'orjson' and ORJSON_AVAILABLE:
+        return 'orjson'
+    if wanted == 'msgspec' and MSGSPEC_AVAILABLE:
+        return 'msgspec'
+    if wanted == 'json':
+        return 'json'
+    if ORJSON_AVAILABLE:
+        return 'orjson'
+    if MSGSPEC_AVAILABLE:
+        return 'msgspec'
+    return 'json'
+
+
+BACKEND = _pick_backend()
+
+if BACKEND == 'msgspec':
+    _encoder = msgspec.json.Encoder()
+    _decoder = msgspec.json.Decoder()
+
+
+class SchemaError(ValueError):
+    """Decoded data does not have the expected shape"""
+
+
+def dumps(obj, pretty=False):
+    """obj -> UTF-8 JSON bytes"""
+    if BACKEND == 'orjson':
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if BACKEND == 'msgspec':
+        data = _encoder.encode(obj)
+        return msgspec.json.format(data, indent=2) if pretty else data
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    """JSON bytes/str -> object; any decode error is a ValueError"""
+    try:
+        if BACKEND == 'orjson':
+            return orjson.loads(data)
+        if BACKEND == 'msgspec':
+            return _decoder.decode(data.encode('utf-8') if isinstance(data, str) else data)
+        return json.loads(data)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(str(e)) from e
+
+
+def atomic_write(path, data):
+    """Write bytes to `path` via a temp file + rename"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def load(path):
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def dump(path, obj, pretty=None):
+    """Atomically write obj to path"""
+    atomic_write(path, dumps(obj, PRETTY if pretty is None else pretty))
+
+
+# ---- typed schemas ---------------------------------------------------------
+
+NoneType = type(None)
+OPTIONAL_STR = (str, NoneType)
+
+# field -> allowed types; nested dicts are sub-schemas, [schema] is a list of them
+PROMOTION_SCHEMA = {
+    'id': str,
+    'namespace': str,
+    'title': OPTIONAL_STR,
+    'description': OPTIONAL_STR,
+    'offerType': OPTIONAL_STR,
+    'items': [{'id': str, 'namespace': OPTIONAL_STR}],
+    'promotions': (dict, NoneType),
+    'price': {'totalPrice': {'discountPrice': int, 'originalPrice': int, 'currencyCode': OPTIONAL_STR}},
+    'offerMappings': ([{'pageSlug': OPTIONAL_STR}], NoneType),
+    'catalogNs': {'mappings': ([{'pageSlug': OPTIONAL_STR}], NoneType)},
+    'urlSlug': OPTIONAL_STR,
+    'productSlug': OPTIONAL_STR,
+}
+
+ENTITLEMENT_SCHEMA = {
+    'namespace': str,
+    'catalogItemId': OPTIONAL_STR,
+}
+
+
+def _check(value, spec, where):
+    if isinstance(spec, tuple) and any(isinstance(s, (dict, list)) for s in spec):
+        errors = []
+        for option in spec:
+            try:
+                return _check(value, option, where)
+            except SchemaError as e:
+                errors.append(str(e))
+        raise SchemaError('; '.join(errors))
+    if isinstance(spec, dict):
+        if not isinstance(value, dict):
+            raise SchemaError(f"{where}: expected object, got {type(value).__name__}")
+        for key, sub in spec.items():
+            if key in value:
+                _check(value[key], sub, f"{where}.{key}")
+        return value
+    if isinstance(spec, list):
+        if not isinstance(value, list):
+            raise SchemaError(f"{where}: expected array, got {type(value).__name__}")
+        for i, item in enumerate(value):
+            _check(item, spec[0], f"{where}[{i}]")
+        return value
+    if spec is int and isinstance(value, bool) or not isinstance(value, spec):
+        raise SchemaError(f"{where}: unexpected {type(value).__name__}")
+    return value
+
+
+if MSGSPEC_AVAILABLE:
+    class Mapping(msgspec.Struct, omit_defaults=True):
+        pageSlug: str | None = None
+
+    class CatalogNs(msgspec.Struct, omit_defaults=True):
+        mappings: list[Mapping] | None = None
+
+    class Item(msgspec.Struct, omit_defaults=True):
+        id: str
+        namespace: str | None = None
+
+    class TotalPrice(msgspec.Struct, omit_defaults=True):
+        discountPrice: int = -1
+        originalPrice: int = 0
+        currencyCode: str | None = None
+
+    class Price(msgspec.Struct, omit_defaults=True):
+        totalPrice: TotalPrice | None = None
+
+    class PromotionElement(msgspec.Struct, omit_defaults=True):
+        id: str
+        namespace: str
+        title: str | None = None
+        description: str | None = None
+        offerType: str | None = None
+        items: list[Item] = []
+        promotions: dict | None = None
+        price: Price | None = None
+        offerMappings: list[Mapping] | None = None
+        catalogNs: CatalogNs | None = None
+        urlSlug: str | None = None
+        productSlug: str | None = None
+
+    class Entitlement(msgspec.Struct, omit_defaults=True):
+        namespace: str
+        catalogItemId: str | None = None
+
+    STRUCTS = {'promotion': PromotionElement, 'entitlement': Entitlement}
+
+SCHEMAS = {'promotion': PROMOTION_SCHEMA, 'entitlement': ENTITLEMENT_SCHEMA}
+
+
+def validate(obj, schema):
+    """Check an already decoded object against a named schema ('promotion', 'entitlement')"""
+    if MSGSPEC_AVAILABLE:
+        try:
+            return msgspec.to_builtins(msgspec.convert(obj, STRUCTS[schema]))
+        except msgspec.ValidationError as e:
+            raise SchemaError(str(e)) from e
+    return _check(obj, SCHEMAS[schema], schema)
+
+
+def decode_list(data, schema):
+    """JSON array bytes -> validated list of dicts, in one pass when msgspec is available"""
+    if MSGSPEC_AVAILABLE:
+        try:
+            items = msgspec.json.decode(data, type=list[STRUCTS[schema]])
+        except msgspec.ValidationError as e:
+            raise SchemaError(str(e)) from e
+        return msgspec.to_builtins(items)
+    items = loads(data)
+    if not isinstance(items, list):
+        raise SchemaError(f"{schema}: expected array")
+    return [_check(item, SCHEMAS[schema], schema) for item in items]
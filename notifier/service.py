@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Service - Resident process with a small local HTTP API
+- Keeps per-account sessions (pooled connections, loaded cookies), the
+  ownership cache, the title index and a logged-in SMTP connection warm
+  between requests, so an on-demand check skips interpreter startup,
+  imports, cookie loading and TLS handshakes
+- Runs go through the same Orchestrator as cron (same leases, run results
+  and alerts); one run per account at a time
+- Listens on 127.0.0.1 only. Requests must name a local Host, may not
+  come from a foreign Origin, and POSTs must be application/json, so a web
+  page cannot drive the API (CSRF / DNS rebinding); set SERVICE_TOKEN to
+  also require an X-Service-Token header. SIGHUP (cookie watcher) reloads
+  every session
+- /check and /mark wait briefly for a run on the same account (409 if it
+  does not finish)
+
+Endpoints (JSON; POSTs need Content-Type: application/json):
+  GET  /health                     uptime, warm accounts, SMTP state
+  GET  /snapshot                   current free games (snapshot cache, fetched if stale)
+  POST /check?account=NAME         ownership of the current free games
+  POST /run?account=NAME&force=1&pipeline=1&claim=0&notify=0&alert=0&wait=0
+  POST /claim?account=NAME         /run without notifying
+  GET  /runs/last?account=NAME     last run result (this process, else runs/NAME/last_run.json)
+  GET  /search?q=TITLE&limit=5     archived offers by title
+  POST /mark                       {"titles", "ids", "namespaces", "accounts", "dry_run"}
+
+Usage: python3 service.py [--port PORT]   (default SERVICE_PORT, 8765)
+"""
+import os
+import sys
+import time
+import hmac
+import signal
+import smtplib
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from accounts import DEFAULT_ACCOUNT, list_accounts
+from deadline import Deadline
+from cookie_watcher import register_reload
+from ownership import OwnershipService
+from promotion_archive import PromotionArchive
+from title_index import TitleIndex
+from orchestrator import Orchestrator, PROMOTION_PARAMS, last_run_file
+import mark_owned
+import snapshot_cache
+import http_client
+import serialization
+
+SERVICE_HOST = os.getenv('SERVICE_HOST', '127.0.0.1')
+SERVICE_PORT = int(os.getenv('SERVICE_PORT', 8765))
+SERVICE_TOKEN = os.getenv('SERVICE_TOKEN', '')
+# Budget for on-demand checks (runs use RUN_DEADLINE like cron)
+CHECK_DEADLINE = float(os.getenv('CHECK_DEADLINE', 30))
+# How long /check and /mark wait for a run on the same account
+BUSY_WAIT = 5
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '[::1]')
+# Reconnect instead of probing an SMTP connection idle longer than this
+SMTP_IDLE = 240
+
+
+class WarmSMTP:
+    """One logged-in SMTP connection kept open between emails"""
+
+    def __init__(self, config, idle=SMTP_IDLE):
+        self.config = config
+        self.idle = idle
+        self.server = None
+        self.last_used = 0
+        self.sent = 0
+        self.reconnects = 0
+        self.lock = threading.Lock()
+
+    def _alive(self):
+        if self.server is None or time.monotonic() - self.last_used > self.idle:
+            return False
+        try:
+            return self.server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+        self.server = None
+
+    @contextmanager
+    def connection(self, timeout):
+        """The warm connection (reconnected and logged in if it went away), one user at a time"""
+        with self.lock:
+            if not self._alive():
+                self._close()
+                self.server = smtplib.SMTP_SSL(self.config['host'], self.config['port'], timeout=timeout)
+                self.server.login(self.config['user'], self.config['pass'])
+                self.reconnects += 1
+            self.server.sock.settimeout(timeout)
+            try:
+                yield self.server
+                self.sent += 1
+            except (smtplib.SMTPServerDisconnected, OSError):
+                self._close()
+                raise
+            finally:
+                self.last_used = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            self._close()
+
+    def describe(self):
+        state = 'connected' if self.server is not None else 'idle'
+        return {'state': state, 'sent': self.sent, 'connects': self.reconnects}
+
+
+class ServiceError(Exception):
+    """A request the service refuses; carries the HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class WarmService:
+    """Warm orchestrators per account plus the shared caches behind the API"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.orchestrators = {}
+        self.run_locks = {}
+        self.results = {}
+        self.smtp = None
+        self.index = None
+
+    # ---- warm state -----------------------------------------------------
+
+    def check_account(self, account):
+        known = {a.name for a in list_accounts()} | {DEFAULT_ACCOUNT}
+        if account not in known:
+            raise ServiceError(404, f"unknown account: {account}")
+        return account
+
+    def orchestrator(self, account=DEFAULT_ACCOUNT):
+        """The account's Orchestrator, created (and its cookies loaded) on first use"""
+        self.check_account(account)
+        with self.lock:
+            orchestrator = self.orchestrators.get(account)
+            if orchestrator is None:
+                orchestrator = Orchestrator(account)
+                if self.smtp is None:
+                    self.smtp = WarmSMTP(orchestrator.notifier.smtp_config)
+                orchestrator.notifier.smtp = self.smtp
+                try:
+                    orchestrator.api.load_cookies()
+                except (OSError, ValueError) as e:
+                    orchestrator.log(f"⚠️  {account}: no session yet ({e})")
+                self.orchestrators[account] = orchestrator
+            return orchestrator
+
+    def run_lock(self, account):
+        with self.lock:
+            return self.run_locks.setdefault(account, threading.Lock())
+
+    @contextmanager
+    def account_idle(self, account, wait=BUSY_WAIT):
+        """Hold the account's run lock for a short operation; 409 if a run keeps it busy"""
+        run_lock = self.run_lock(account)
+        if not run_lock.acquire(timeout=wait):
+            raise ServiceError(409, f"a run for {account} is in progress")
+        try:
+            yield
+        finally:
+            run_lock.release()
+
+    def reload_cookies(self):
+        """SIGHUP from the cookie watcher: rebuild every warm session"""
+        with self.lock:
+            orchestrators = list(self.orchestrators.values())
+        for orchestrator in orchestrators:
+            orchestrator.claimer.reload_cookies()
+
+    def title_index(self):
+        """Warm title index, rebuilt when the archive has grown"""
+        rows = len(PromotionArchive())
+        with self.lock:
+            if self.index is None or self.index.rows != rows:
+                self.index = TitleIndex.load()
+            return self.index
+
+    # ---- operations -----------------------------------------------------
+
+    def games(self):
+        """(current free games, 'cache' or 'fetched')"""
+        api = self.orchestrator().api
+        payload = snapshot_cache.latest()
+        source = 'cache'
+        if payload is None:
+            deadline = Deadline(CHECK_DEADLINE)
+            payload = http_client.fetch_promotions_json(api.session, PROMOTION_PARAMS,
+                                                        timeout=deadline.timeout(30), deadline=deadline)
+            source = 'fetched'
+        return api.parse_free_games(payload), source
+
+    def snapshot(self):
+        games, source = self.games()
+        return {'source': source, 'games': [
+            {key: game.get(key) for key in ('id', 'namespace', 'title', 'url_slug', 'end_date')}
+            for game in games]}
+
+    def check(self, account):
+        """Ownership of the current free games on the warm session"""
+        orchestrator = self.orchestrator(account)
+        games, source = self.games()
+        with self.account_idle(account):
+            ownership = OwnershipService(orchestrator.api.session, account, index=orchestrator.api.ownership.index,
+                                         deadline=Deadline(CHECK_DEADLINE), log=orchestrator.log)
+            owned = ownership.owned(games)
+        return {'account': account, 'source': source, 'games': [
+            {'id': game['id'], 'title': game['title'], 'owned': owned.get(game['id'])} for game in games]}
+
+    def run(self, account, wait=True, **options):
+        """Orchestrated run for the account; its result dict, or {'started': True} if not waiting"""
+        orchestrator = self.orchestrator(account)
+        if account != DEFAULT_ACCOUNT:
+            # The notifier tracks and emails for the default account only
+            options['notify'] = False
+        run_lock = self.run_lock(account)
+        if not run_lock.acquire(blocking=False):
+            raise ServiceError(409, f"a run for {account} is already in progress")
+
+        def execute():
+            try:
+                result = orchestrator.run(**options)
+                self.results[account] = result.to_dict()
+                orchestrator.log(f"🛰️  Service run for {account}: {'OK' if result.ok else 'FAILED'}")
+            finally:
+                run_lock.release()
+
+        if not wait:
+            threading.Thread(target=execute, name=f"run-{account}", daemon=True).start()
+            return {'account': account, 'started': True}
+        execute()
+        return self.results[account]
+
+    def last_run(self, account):
+        self.check_account(account)
+        if account in self.results:
+            return self.results[account]
+        try:
+            result = serialization.load(last_run_file(account))
+        except (OSError, ValueError):
+            result = None
+        if not result:
+            raise ServiceError(404, f"no run recorded for {account}")
+        return result
+
+    def search(self, query, limit=5):
+        index = self.title_index()
+        return {'offers': len(index.entries), 'matches': [
+            dict(entry, score=score) for score, entry in index.fuzzy(query, limit)]}
+
+    def mark(self, body):
+        """Bulk mark_owned against the warm title index"""
+        accounts = [self.check_account(account) for account in body.get('accounts') or [DEFAULT_ACCOUNT]]
+        offers, matched, unmatched = mark_owned.resolve(
+            self.title_index(), body.get('ids') or (), body.get('namespaces') or (), body.get('titles') or ())
+        results = {}
+        for account in accounts:
+            with self.account_idle(account):
+                results.update(mark_owned.mark_many(list(offers), [account], bool(body.get('dry_run'))))
+        return {
+            'matched': [{'query': query, 'how': how, 'id': entry['id'], 'title': entry['title']}
+                        for query, how, entry in matched],
+            'unmatched': [{'query': query, 'candidates': [c['title'] for c in candidates[:3]]}
+                          for query, candidates in unmatched],
+            'accounts': {account: (None if result is None else {'new': result[0], 'already': result[1]})
+                         for account, result in results.items()},
+        }
+
+    def health(self):
+        with self.lock:
+            accounts = sorted(self.orchestrators)
+        return {
+            'uptime': round(time.time() - self.started, 1),
+            'accounts': accounts,
+            'running': sorted(a for a, run_lock in list(self.run_locks.items()) if run_lock.locked()),
+            'smtp': self.smtp.describe() if self.smtp else None,
+            'title_index': len(self.index.entries) if self.index else None,
+        }
+
+    def close(self):
+        if self.smtp:
+            self.smtp.close()
+        for orchestrator in self.orchestrators.values():
+            orchestrator.claimer.save_session_cookies()
+
+
+def _flag(query, name, default):
+    value = query.get(name)
+    return default if value is None else value not in ('0', 'false', 'no', '')
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Routes requests to the WarmService on the server"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        data = serialization.dumps(body)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _check_origin(self, method):
+        """Refuse anything a browser page could send: foreign Host/Origin, non-JSON POSTs"""
+        port = self.server.server_address[1]
+        local = {f"{host}:{port}" for host in (*LOCAL_HOSTS, SERVICE_HOST)}
+        if self.headers.get('Host', '') not in local:
+            raise ServiceError(403, "Host must be a local address")
+        origin = self.headers.get('Origin')
+        if origin is not None and origin not in {f"http://{host}" for host in local}:
+            raise ServiceError(403, f"cross-origin request refused: {origin}")
+        if method == 'POST':
+            content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+            if content_type != 'application/json':
+                raise ServiceError(415, "POST requests need Content-Type: application/json")
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            body = serialization.loads(self.rfile.read(length))
+        except ValueError as e:
+            raise ServiceError(400, f"invalid JSON body: {e}")
+        if not isinstance(body, dict):
+            raise ServiceError(400, "JSON body must be an object")
+        return body
+
+    def _route(self, method, body):
+        service = self.server.service
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        account = query.get('account', DEFAULT_ACCOUNT)
+
+        if method == 'GET':
+            if url.path == '/health':
+                return service.health()
+            if url.path == '/snapshot':
+                return service.snapshot()
+            if url.path == '/runs/last':
+                return service.last_run(account)
+            if url.path == '/search':
+                if not query.get('q'):
+                    raise ServiceError(400, "missing q")
+                return service.search(query['q'], int(query.get('limit', 5)))
+        elif method == 'POST':
+            if url.path == '/check':
+                return service.check(account)
+            if url.path in ('/run', '/claim'):
+                return service.run(
+                    account,
+                    wait=_flag(query, 'wait', True),
+                    force=_flag(query, 'force', False),
+                    pipeline=_flag(query, 'pipeline', False),
+                    claim=_flag(query, 'claim', True),
+                    notify=url.path == '/run' and _flag(query, 'notify', True),
+                    alert=_flag(query, 'alert', True),
+                )
+            if url.path == '/mark':
+                return service.mark(body)
+        raise ServiceError(404, f"no route for {method} {url.path}")
+
+    def _handle(self, method):
+        start = time.perf_counter()
+        try:
+            self._check_origin(method)
+            body = self._body() if method == 'POST' else {}
+            token = self.headers.get('X-Service-Token', '')
+            if SERVICE_TOKEN and not hmac.compare_digest(token, SERVICE_TOKEN):
+                raise ServiceError(401, "missing or wrong X-Service-Token")
+            status, body = 200, dict(self._route(method, body))
+        except ServiceError as e:
+            status, body = e.status, {'error': str(e)}
+            # The request body may be unread
+            self.close_connection = True
+        except Exception as e:
+            status, body = 500, {'error': f"{type(e).__name__}: {e}"}
+        body['ms'] = round((time.perf_counter() - start) * 1000, 2)
+        self._send(status, body)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+
+def serve(port=SERVICE_PORT, host=SERVICE_HOST, service=None):
+    """Bound server with its WarmService; call serve_forever() on it"""
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.service = service or WarmService()
+    return server
+
+
+def main():
+    args = sys.argv[1:]
+    port = int(args[args.index('--port') + 1]) if '--port' in args else SERVICE_PORT
+
+    server = serve(port)
+    service = server.service
+    # Warm up before the first request: default session, title index
+    service.orchestrator()
+    service.title_index()
+    # Signal handlers can only be installed here, on the main thread
+    register_reload(service.reload_cookies, 'service')
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    print(f"🛰️  Service listening on http://{SERVICE_HOST}:{port}"
+          f"{' (token required)' if SERVICE_TOKEN else ''}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down")
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Snapshot Cache - The last fetched promotions, shared by every local tool
+- Whoever fetches promotions publishes the parsed payload to
+  claimer/data/promotions/<key>.cache; everyone else reads it with no
+  network I/O while it is fresh
+- One file per request key: a fixed header (magic, format, generation,
+  written, expires, body length) followed by the JSON body
+- Published by writing a temp file and renaming it over the old one, so a
+  reader's memory map always sees one complete version
+- Fresh until PROMOTIONS_CACHE_TTL (default 1h) or the next promotion
+  boundary (earliest end of a current offer / start of an upcoming one),
+  whichever comes first; PROMOTIONS_CACHE_TTL=0 disables the cache
+
+Usage: python3 snapshot_cache.py   (show cached snapshots)
+"""
+import os
+import mmap
+import time
+import struct
+import hashlib
+import threading
+from datetime import datetime
+
+from accounts import DATA_DIR
+import serialization
+
+CACHE_DIR = DATA_DIR / 'promotions'
+CACHE_TTL = float(os.getenv('PROMOTIONS_CACHE_TTL', 3600))
+
+MAGIC = b'EPSC'
+FORMAT = 1
+# magic, format, generation, written, expires, body length
+HEADER = struct.Struct('<4sIQddQ')
+
+# path -> (inode, generation, payload): decode each published version once per process
+_decoded = {}
+_decoded_lock = threading.Lock()
+
+
+def cache_path(key, cache_dir=CACHE_DIR):
+    return cache_dir / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]}.cache"
+
+
+def _timestamp(value):
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def next_boundary(payload, now=None):
+    """Earliest future end of a current promotion or start of an upcoming one"""
+    now = now or time.time()
+    boundaries = []
+    elements = payload.get('data', {}).get('Catalog', {}).get('searchStore', {}).get('elements', [])
+    for element in elements:
+        promotions = element.get('promotions') or {}
+        for group, field in (('promotionalOffers', 'endDate'), ('upcomingPromotionalOffers', 'startDate')):
+            for offers in promotions.get(group) or []:
+                for offer in offers.get('promotionalOffers') or []:
+                    moment = _timestamp(offer.get(field))
+                    if moment and moment > now:
+                        boundaries.append(moment)
+    return min(boundaries) if boundaries else None
+
+
+def read_header(path):
+    """(generation, written, expires, body length) without reading the body, None if absent/invalid"""
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read(HEADER.size)
+    except OSError:
+        return None
+    if len(raw) < HEADER.size:
+        return None
+    magic, fmt, generation, written, expires, length = HEADER.unpack(raw)
+    if magic != MAGIC or fmt != FORMAT:
+        return None
+    return generation, written, expires, length
+
+
+def publish(key, payload, ttl=CACHE_TTL, cache_dir=CACHE_DIR):
+    """Atomically replace the snapshot for `key`; returns its generation (None if disabled)"""
+    if not ttl:
+        return None
+    path = cache_path(key, cache_dir)
+    header = read_header(path)
+    generation = (header[0] if header else 0) + 1
+
+    now = time.time()
+    expires = now + ttl
+    boundary = next_boundary(payload, now)
+    if boundary:
+        expires = min(expires, boundary)
+
+    body = serialization.dumps(payload)
+    serialization.atomic_write(path, HEADER.pack(MAGIC, FORMAT, generation, now, expires, len(body)) + body)
+    return generation
+
+
+def _load(path, now):
+    """Payload of a fresh snapshot file, decoded at most once per generation"""
+    try:
+        with open(path, 'rb') as f:
+            inode = os.fstat(f.fileno()).st_ino
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                magic, fmt, generation, written, expires, length = HEADER.unpack_from(view)
+                if magic != MAGIC or fmt != FORMAT or expires <= now:
+                    return None
+                with _decoded_lock:
+                    cached = _decoded.get(path)
+                    if cached and cached[:2] == (inode, generation):
+                        return cached[2]
+                payload = serialization.loads(view[HEADER.size:HEADER.size + length])
+    except (OSError, ValueError):
+        return None
+
+    with _decoded_lock:
+        _decoded[path] = (inode, generation, payload)
+    return payload
+
+
+def read(key, cache_dir=CACHE_DIR):
+    """Cached payload for `key` while it is fresh, else None (never touches the network)"""
+    if not CACHE_TTL:
+        return None
+    return _load(cache_path(key, cache_dir), time.time())
+
+
+def latest(cache_dir=CACHE_DIR):
+    """Most recently published fresh payload for any key, or None"""
+    if not CACHE_TTL or not cache_dir.exists():
+        return None
+    now = time.time()
+    candidates = []
+    for path in cache_dir.glob('*.cache'):
+        header = read_header(path)
+        if header and header[2] > now:
+            candidates.append((header[1], path))
+    for _, path in sorted(candidates, reverse=True):
+        payload = _load(path, now)
+        if payload is not None:
+            return payload
+    return None
+
+
+def main():
+    paths = sorted(CACHE_DIR.glob('*.cache')) if CACHE_DIR.exists() else []
+    if not paths:
+        print("No cached promotions snapshots")
+    now = time.time()
+    fmt = lambda ts: datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+    for path in paths:
+        header = read_header(path)
+        if not header:
+            print(f"⚠️  {path.name}: unreadable")
+            continue
+        generation, written, expires, length = header
+        state = '✅ fresh' if expires > now else '⌛ stale'
+        print(f"{state} {path.name}: generation {generation}, {length / 1024:.1f} KB, "
+              f"written {fmt(written)}, fresh until {fmt(expires)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Streaming JSON - Decode only the fields we use from large Epic responses
+- Walks to one array (e.g. data.Catalog.searchStore.elements) while the body
+  is still streaming, and yields its items one at a time
+- Each item is projected down to the fields the parsers read before the
+  next one is decoded
+- Uses ijson when installed, else a stdlib scanner built on raw_decode
+- Items can be checked against a serialization schema; malformed ones are
+  skipped instead of failing the whole response
+"""
+import json
+import codecs
+
+import serialization
+
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
+CHUNK_SIZE = 64 * 1024
+
+PROMOTIONS_PATH = ['data', 'Catalog', 'searchStore', 'elements']
+
+# Fields of a promotions element used by the notifier/claimer parsers
+ELEMENT_FIELDS = {
+    'id': True,
+    'namespace': True,
+    'title': True,
+    'description': True,
+    'offerType': True,
+    'items': {'id': True, 'namespace': True},
+    'promotions': True,
+    'price': {'totalPrice': {'discountPrice': True, 'originalPrice': True, 'currencyCode': True}},
+    'offerMappings': {'pageSlug': True},
+    'catalogNs': {'mappings': {'pageSlug': True}},
+    'urlSlug': True,
+    'productSlug': True,
+}
+
+ENTITLEMENT_FIELDS = {'namespace': True, 'catalogItemId': True}
+
+
+def project(value, fields):
+    """Keep only `fields` (nested dict, True = whole value); lists are projected item-wise"""
+    if fields is True:
+        return value
+    if isinstance(value, list):
+        return [project(item, fields) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {key: project(value[key], sub) for key, sub in fields.items() if key in value}
+
+
+class _Scanner:
+    """Pull-based JSON scanner over text chunks (stdlib only)"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _more(self):
+        if self.eof:
+            return False
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.eof = True
+            chunk = self.text_decoder.decode(b'', final=True)
+        elif isinstance(chunk, bytes):
+            chunk = self.text_decoder.decode(chunk)
+        # Drop what has been consumed so the buffer only holds the current value
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._more():
+                raise ValueError("unexpected end of JSON")
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos}, got {self.buf[self.pos]!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._more()
+
+    def descend(self, path):
+        """Move to the first item of the array at `path`; False if the path is missing"""
+        for key in path:
+            if self.peek() != '{':
+                return False
+            self.pos += 1
+            while True:
+                if self.peek() == '}':
+                    return False
+                name = self.value()
+                self.expect(':')
+                if name == key:
+                    break
+                self.value()
+                if self.peek() == ',':
+                    self.pos += 1
+        if self.peek() != '[':
+            return False
+        self.pos += 1
+        return True
+
+    def items(self):
+        if self.peek() == ']':
+            return
+        while True:
+            yield self.value()
+            separator = self.peek()
+            self.pos += 1
+            if separator == ']':
+                return
+
+
+class _ChunkFile:
+    """File-like read() over an iterator of byte chunks (for ijson)"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buf = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buf) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buf += chunk
+        if size < 0:
+            data, self.buf = self.buf, b''
+        else:
+            data, self.buf = self.buf[:size], self.buf[size:]
+        return data
+
+
+def _raw_items(chunks, path):
+    if IJSON_AVAILABLE:
+        prefix = '.'.join(path + ['item'])
+        yield from ijson.items(_ChunkFile(chunks), prefix, use_float=True)
+        return
+
+    scanner = _Scanner(chunks)
+    if not scanner.descend(path):
+        return
+    yield from scanner.items()
+
+
+def iter_items(chunks, path, fields, schema=None):
+    """Projected items of the array at `path` ([] = top-level array), decoded incrementally
+
+    With `schema` ('promotion', 'entitlement'), items that do not match are skipped.
+    """
+    for item in _raw_items(chunks, path):
+        item = project(item, fields)
+        if schema:
+            try:
+                item = serialization.validate(item, schema)
+            except serialization.SchemaError:
+                continue
+        yield item
+
+
+def response_chunks(response):
+    return response.iter_content(chunk_size=CHUNK_SIZE)
+
+
+def promotions_payload(chunks):
+    """The promotions payload with only the parsed fields, in the original shape"""
+    elements = list(iter_items(chunks, PROMOTIONS_PATH, ELEMENT_FIELDS, 'promotion'))
+    return {'data': {'Catalog': {'searchStore': {'elements': elements}}}}
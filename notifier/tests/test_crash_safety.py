@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Crash-safety rules: claim journal replay, cookie write-back merges, leases
+- These are what stop duplicate orders and lost tokens, so they are checked
+  against the real modules on temporary files (no network; the in-doubt
+  claim tests need requests and python-dotenv and are skipped without them)
+
+Usage: python3 -m pytest -q tests  (or python3 -m unittest discover tests)
+"""
+import sys
+import time
+import tempfile
+import unittest
+import http.cookiejar
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from claim_journal import ClaimJournal, FREE_ORDER, PREVIEW, CONFIRM, DONE, SENT, OK, FAILED
+from cookie_store import CookieStore
+from leases import AccountLease, LeaseStore, LeaseLost
+import serialization
+
+try:
+    import epic_auto_claimer
+    from deadline import Deadline
+    CLAIMER_AVAILABLE = True
+except ImportError:  # requests / python-dotenv not installed
+    CLAIMER_AVAILABLE = False
+
+
+class TempDirTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+
+class ClaimJournalReplayTest(TempDirTest):
+    """A restarted run (a fresh journal on the same file) resumes where the crash left off"""
+
+    def replayed(self, journal):
+        return ClaimJournal('default', journal.path.parent)
+
+    def test_done_offer_is_skipped_after_replay(self):
+        journal = ClaimJournal('default', self.dir)
+        journal.record('o1', PREVIEW, OK, order_id='ord1')
+        journal.record('o1', CONFIRM, SENT)
+        journal.record('o1', CONFIRM, OK)
+        journal.record('o1', DONE, OK)
+
+        replayed = self.replayed(journal)
+        self.assertTrue(replayed.is_done('o1'))
+        self.assertEqual(replayed.attempt('o1'), {})
+        self.assertIsNone(replayed.in_doubt('o1'))
+        self.assertIsNone(replayed.preview_order_id('o1'))
+
+    def test_sent_confirm_stays_in_doubt(self):
+        journal = ClaimJournal('default', self.dir)
+        journal.record('o1', PREVIEW, OK, order_id='ord1')
+        journal.record('o1', CONFIRM, SENT)
+
+        replayed = self.replayed(journal)
+        self.assertFalse(replayed.is_done('o1'))
+        self.assertEqual(replayed.in_doubt('o1'), CONFIRM)
+
+    def test_sent_free_order_stays_in_doubt(self):
+        journal = ClaimJournal('default', self.dir)
+        journal.record('o1', FREE_ORDER, SENT)
+        self.assertEqual(self.replayed(journal).in_doubt('o1'), FREE_ORDER)
+
+    def test_preview_order_id_is_reused_until_confirmed(self):
+        journal = ClaimJournal('default', self.dir)
+        journal.record('o1', PREVIEW, OK, order_id='ord1')
+        self.assertEqual(self.replayed(journal).preview_order_id('o1'), 'ord1')
+
+        # A failed confirm keeps the preview for the retry
+        journal.record('o1', CONFIRM, FAILED, error='timeout')
+        self.assertEqual(self.replayed(journal).preview_order_id('o1'), 'ord1')
+
+        journal.record('o1', CONFIRM, OK)
+        self.assertIsNone(self.replayed(journal).preview_order_id('o1'))
+
+    def test_failed_done_starts_a_new_attempt(self):
+        journal = ClaimJournal('default', self.dir)
+        journal.record('o1', PREVIEW, OK, order_id='ord1')
+        journal.record('o1', DONE, FAILED, error='rejected')
+
+        replayed = self.replayed(journal)
+        self.assertFalse(replayed.is_done('o1'))
+        self.assertIsNone(replayed.preview_order_id('o1'))
+
+    def test_torn_last_line_is_ignored(self):
+        journal = ClaimJournal('default', self.dir)
+        journal.record('o1', CONFIRM, SENT)
+        with open(journal.path, 'a', encoding='utf-8') as f:
+            f.write('{"ts": 1, "offer_id": "o1", "st')
+
+        self.assertEqual(self.replayed(journal).in_doubt('o1'), CONFIRM)
+
+    def test_compact_keeps_the_state(self):
+        journal = ClaimJournal('default', self.dir)
+        journal.record('o1', PREVIEW, OK, order_id='ord1')
+        journal.record('o1', CONFIRM, SENT)
+        journal.record('o2', DONE, OK)
+        journal.compact()
+
+        replayed = self.replayed(journal)
+        self.assertEqual(replayed.in_doubt('o1'), CONFIRM)
+        self.assertEqual(replayed.preview_order_id('o1'), 'ord1')
+        self.assertTrue(replayed.is_done('o2'))
+
+
+@unittest.skipUnless(CLAIMER_AVAILABLE, "needs requests and python-dotenv")
+class InDoubtClaimTest(TempDirTest):
+    """An interrupted confirm is never resent unless a live ownership check says it failed"""
+
+    GAME = {'id': 'o1', 'namespace': 'ns', 'title': 'Game', 'offerType': 'BASE_GAME', 'items': []}
+
+    def api(self, owned):
+        api = epic_auto_claimer.EpicGamesAPI.__new__(epic_auto_claimer.EpicGamesAPI)
+        api.journal = ClaimJournal('default', self.dir)
+        api.deadline = Deadline(None)
+        api.checks = []
+
+        def check_ownership(namespace, offer_id, offer_type=None, items=None, live=False):
+            api.checks.append(live)
+            return owned
+        api.check_ownership = check_ownership
+        return api
+
+    def interrupted(self, api):
+        api.journal.record('o1', PREVIEW, OK, order_id='ord1')
+        api.journal.record('o1', CONFIRM, SENT)
+
+    def test_unknown_ownership_does_not_resend(self):
+        api = self.api(owned=None)
+        self.interrupted(api)
+        result, resume_order_id, _ = api.prepare_claim(self.GAME)
+        self.assertEqual(result['in_doubt'], CONFIRM)
+        self.assertFalse(result['success'])
+        self.assertEqual(api.checks, [True])
+        self.assertEqual(api.journal.in_doubt('o1'), CONFIRM)
+
+    def test_owned_closes_the_claim(self):
+        api = self.api(owned=True)
+        self.interrupted(api)
+        result, _, _ = api.prepare_claim(self.GAME)
+        self.assertEqual(result['status'], 'already_owned')
+        self.assertTrue(api.journal.is_done('o1'))
+
+    def test_live_not_owned_retries_with_a_fresh_preview(self):
+        api = self.api(owned=False)
+        self.interrupted(api)
+        result, resume_order_id, _ = api.prepare_claim(self.GAME)
+        self.assertIsNone(result)
+        self.assertIsNone(resume_order_id)
+        self.assertIsNone(api.journal.in_doubt('o1'))
+
+
+def jar(*cookies):
+    """A cookie jar holding (name, value, expires) cookies on .epicgames.com"""
+    result = http.cookiejar.CookieJar()
+    for name, value, expires in cookies:
+        result.set_cookie(http.cookiejar.Cookie(
+            0, name, value, None, False, '.epicgames.com', True, True, '/', True,
+            True, expires, False, None, None, {}))
+    return result
+
+
+class CookieWriteBackTest(TempDirTest):
+    """Two runs loaded the same cookies.json and both write back"""
+
+    def setUp(self):
+        super().setUp()
+        self.cookies_file = self.dir / 'cookies.json'
+        serialization.dump(self.cookies_file, [
+            {'name': 'EPIC_EG1', 'value': 'old', 'domain': '.epicgames.com', 'path': '/',
+             'expires': 1000, 'httpOnly': True},
+            {'name': 'EPIC_SSO', 'value': 'sso', 'domain': '.epicgames.com', 'path': '/', 'expires': 1000},
+        ])
+        self.first, self.second = CookieStore(self.cookies_file), CookieStore(self.cookies_file)
+        self.first.load()
+        self.second.load()
+
+    def on_disk(self):
+        return {c['name']: c for c in serialization.load(self.cookies_file)}
+
+    def test_refresh_survives_a_writer_that_did_not_change_it(self):
+        self.first.write_back(jar(('EPIC_EG1', 'new', None), ('EPIC_SSO', 'sso', None)))
+        self.second.write_back(jar(('EPIC_EG1', 'old', None), ('EPIC_SSO', 'sso2', None)))
+
+        cookies = self.on_disk()
+        self.assertEqual(cookies['EPIC_EG1']['value'], 'new')
+        self.assertEqual(cookies['EPIC_SSO']['value'], 'sso2')
+        # Attributes the jar does not round-trip are kept
+        self.assertTrue(cookies['EPIC_EG1']['httpOnly'])
+
+    def test_both_refreshed_keeps_the_later_expiry(self):
+        self.first.write_back(jar(('EPIC_EG1', 'first', 5000), ('EPIC_SSO', 'sso', None)))
+        self.second.write_back(jar(('EPIC_EG1', 'second', 3000), ('EPIC_SSO', 'sso', None)))
+        self.assertEqual(self.on_disk()['EPIC_EG1']['value'], 'first')
+
+        self.second.load()
+        self.first.load()
+        self.first.write_back(jar(('EPIC_EG1', 'first2', 6000), ('EPIC_SSO', 'sso', None)))
+        self.second.write_back(jar(('EPIC_EG1', 'second2', 7000), ('EPIC_SSO', 'sso', None)))
+        cookies = self.on_disk()
+        self.assertEqual(cookies['EPIC_EG1']['value'], 'second2')
+        self.assertEqual(cookies['EPIC_EG1']['expires'], 7000)
+
+    def test_unchanged_jar_writes_nothing(self):
+        before = self.cookies_file.stat().st_mtime_ns
+        self.assertEqual(self.first.write_back(jar(('EPIC_EG1', 'old', None), ('EPIC_SSO', 'sso', None))), 0)
+        self.assertEqual(self.cookies_file.stat().st_mtime_ns, before)
+
+
+class LeaseTest(TempDirTest):
+    """Exclusion, expiry of a crashed holder, heartbeats and takeover detection"""
+
+    def setUp(self):
+        super().setUp()
+        self.store = LeaseStore(self.dir / 'leases.db')
+
+    def test_expired_lease_can_be_taken_over(self):
+        ok, _ = self.store.try_acquire('acct', 'crashed-run', 'claimer', 0.2)
+        self.assertTrue(ok)
+        ok, blocker = self.store.try_acquire('acct', 'other-run', 'claimer', 10)
+        self.assertFalse(ok)
+        self.assertEqual(blocker['holder'], 'crashed-run')
+
+        time.sleep(0.3)
+        ok, _ = self.store.try_acquire('acct', 'other-run', 'claimer', 10)
+        self.assertTrue(ok)
+        # The crashed run cannot renew what it lost
+        self.assertFalse(self.store.renew('acct', 'crashed-run', 10))
+
+    def test_heartbeat_keeps_the_lease_past_its_ttl(self):
+        lease = AccountLease('acct', 'claimer', ttl=0.3, store=self.store)
+        self.assertTrue(lease.acquire())
+        try:
+            time.sleep(0.8)
+            ok, _ = self.store.try_acquire('acct', 'other-run', 'claimer', 10)
+            self.assertFalse(ok)
+            self.assertFalse(lease.lost)
+            lease.check()
+        finally:
+            lease.release()
+        ok, _ = self.store.try_acquire('acct', 'other-run', 'claimer', 10)
+        self.assertTrue(ok)
+
+    def test_takeover_is_reported_and_not_released(self):
+        lease = AccountLease('acct', 'claimer', ttl=0.3, store=self.store)
+        self.assertTrue(lease.acquire())
+        try:
+            # Another node takes the account over (e.g. after a long pause)
+            conn = self.store._connect()
+            conn.execute("UPDATE leases SET holder = 'other-run', expires = ? WHERE account = 'acct'",
+                         (time.time() + 60,))
+            conn.close()
+            time.sleep(0.4)
+            self.assertTrue(lease.lost)
+            self.assertRaises(LeaseLost, lease.check)
+        finally:
+            lease.release()
+        # The new holder's lease is left alone
+        self.assertEqual([row[1] for row in self.store.active()], ['other-run'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Title Index - Find archived offers by id, namespace or (fuzzy) title
+- Built from the promotion archive's distinct offers and saved next to it
+  (claimer/data/archive/title_index.json); rebuilt when the archive grows
+- Titles are normalized (NFKC, casefold, punctuation dropped) and indexed
+  two ways: a sorted list for prefix lookups and trigram postings for
+  fuzzy matches scored by Dice similarity
+- Lookups touch only the postings of the query's trigrams, so resolving
+  hundreds of titles takes milliseconds
+
+Usage: python3 title_index.py "query" [limit]
+"""
+import sys
+import bisect
+import unicodedata
+
+from promotion_archive import PromotionArchive, ARCHIVE_DIR
+import serialization
+
+INDEX_FILE = ARCHIVE_DIR / 'title_index.json'
+# Below this Dice score a fuzzy candidate is not considered a match
+MIN_SCORE = 0.5
+# The best fuzzy candidate must beat the runner-up by this much to be picked alone
+MIN_MARGIN = 0.1
+
+
+def normalize(title):
+    """'DEATH STRANDING™: Director's Cut' -> 'death stranding director s cut'"""
+    text = unicodedata.normalize('NFKC', title or '').casefold()
+    text = ''.join(ch if ch.isalnum() else ' ' for ch in text)
+    return ' '.join(text.split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    """Trigram + prefix index over archived offers"""
+
+    def __init__(self, entries, rows=0):
+        self.rows = rows
+        # [{'id', 'namespace', 'title'}]
+        self.entries = entries
+        self.by_id = {entry['id']: i for i, entry in enumerate(entries)}
+        self.by_namespace = {}
+        self.sizes = []
+        self.postings = {}
+        normalized = []
+        for i, entry in enumerate(entries):
+            self.by_namespace.setdefault(entry['namespace'], []).append(i)
+            norm = normalize(entry['title'])
+            normalized.append((norm, i))
+            grams = trigrams(norm)
+            self.sizes.append(len(grams))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(i)
+        self.sorted_titles = sorted(normalized)
+
+    # ---- persistence ------------------------------------------------------
+
+    @classmethod
+    def load(cls, archive=None, index_file=INDEX_FILE):
+        """The saved index if it covers the whole archive, else a freshly built (and saved) one"""
+        archive = archive or PromotionArchive()
+        rows = len(archive)
+        try:
+            data = serialization.load(index_file)
+            if data.get('rows') == rows:
+                return cls(data['entries'], rows)
+        except (OSError, ValueError, KeyError):
+            pass
+
+        entries = [{'id': offer, 'namespace': ns, 'title': title} for offer, ns, title in archive.offers()]
+        index = cls(entries, rows)
+        try:
+            serialization.dump(index_file, {'rows': rows, 'entries': entries})
+        except OSError:
+            pass
+        return index
+
+    # ---- lookups ----------------------------------------------------------
+
+    def get(self, offer_id):
+        i = self.by_id.get(offer_id)
+        return self.entries[i] if i is not None else None
+
+    def namespace(self, namespace):
+        return [self.entries[i] for i in self.by_namespace.get(namespace, [])]
+
+    def prefix(self, query):
+        """Entries whose normalized title starts with the normalized query"""
+        query = normalize(query)
+        if not query:
+            return []
+        start = bisect.bisect_left(self.sorted_titles, (query, -1))
+        found = []
+        for norm, i in self.sorted_titles[start:]:
+            if not norm.startswith(query):
+                break
+            found.append(self.entries[i])
+        return found
+
+    def fuzzy(self, query, limit=5):
+        """[(score, entry)] best first, by trigram Dice similarity"""
+        grams = trigrams(normalize(query))
+        shared = {}
+        for gram in grams:
+            for i in self.postings.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+        scored = sorted(((2 * n / (len(grams) + self.sizes[i]), i) for i, n in shared.items()), reverse=True)
+        return [(round(score, 3), self.entries[i]) for score, i in scored[:limit]]
+
+    def match(self, query):
+        """([entries], how) for the best match of a title, or ([], candidates)
+
+        Every offer with exactly that title matches (re-releases, editions
+        archived under a second id); a prefix matches when the titles it
+        reaches are all the same. Fuzzy search is the fallback.
+        """
+        norm = normalize(query)
+        prefixed = self.prefix(norm)
+        exact = [e for e in prefixed if normalize(e['title']) == norm]
+        if exact:
+            return exact, 'exact'
+        if prefixed and len({normalize(e['title']) for e in prefixed}) == 1:
+            return prefixed, 'prefix'
+
+        candidates = self.fuzzy(query)
+        if candidates and candidates[0][0] >= MIN_SCORE and (
+                len(candidates) == 1 or candidates[0][0] - candidates[1][0] >= MIN_MARGIN):
+            return [candidates[0][1]], f"fuzzy {candidates[0][0]:.2f}"
+        return [], [entry for _, entry in candidates]
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__.strip().split('Usage:')[1])
+        sys.exit(1)
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    index = TitleIndex.load()
+    print(f"🔎 {len(index.entries)} archived offer(s)")
+    for score, entry in index.fuzzy(sys.argv[1], limit):
+        print(f"   {score:.2f}  {entry['title']} ({entry['id']})")
+
+
+if __name__ == '__main__':
+    main()